@@ -0,0 +1,117 @@
+import threading
+
+import chess_engine as ce
+import constants as const
+import opening_book as ob
+import search
+import time_manager as tm
+import transposition_table as tt
+
+
+def copy_chess_board(chess_board):
+    """Copies the position of a chess game through its FEN string, so it can be searched while the original is drawn.
+    The position counts are copied too, so the search sees the repetitions of the moves before it.
+
+    :param chess_board: the chess game to copy
+    :return: a new chess game with the same position, position counts and board backend
+    """
+    copied_board = ce.ChessBoard("player", chess_board.to_fen(), "mailbox" if chess_board.bitboards is None else "bitboard")
+    copied_board.position_counts = dict(chess_board.position_counts)
+
+    return copied_board
+
+
+class AiPlayer:
+    """Class running the AI search on a worker thread, so the game window keeps drawing and handling events.
+
+    The search works on a copy of the position and the main loop polls for its result. When pondering is enabled,
+    the position is also searched while the opponent thinks, which fills the transposition table the next search uses.
+    """
+    def __init__(self, move_time=const.AI_MOVE_TIME, ponder=const.AI_PONDER, book_path=const.BOOK_PATH):
+        """Initializes the AI player.
+
+        :param move_time: the time every move can take in seconds
+        :param ponder: if the AI should search on the opponent's time
+        :param book_path: the path of the opening book file, or None to always search
+        """
+        self.move_time = move_time
+        self.ponder = ponder
+        self.opening_book = ob.get_book(book_path)
+        self.searcher = search.Searcher(transposition_table=tt.TranspositionTable())
+        self.stop_event = threading.Event()
+        self.search_thread = None
+        self.search_result = None
+        self.pondering = False
+
+        self.searcher.stop_event = self.stop_event
+
+    def is_searching(self):
+        """Checks if a move is being searched or waits to be polled.
+
+        :return: if a search for a move was started and its result was not taken yet
+        """
+        return self.search_thread is not None and not self.pondering
+
+    def start_search(self, chess_board):
+        """Starts searching the best move of a position on the worker thread, stopping the pondering if needed.
+
+        :param chess_board: the chess game to find a move for, it is copied and never changed
+        """
+        self.stop()
+
+        self.search_result = None
+        self.search_thread = threading.Thread(target=self.run_search, args=(copy_chess_board(chess_board),), daemon=True)
+        self.search_thread.start()
+
+    def start_pondering(self, chess_board):
+        """Starts searching a position without a time limit until it is stopped, if pondering is enabled.
+
+        :param chess_board: the chess game the opponent is thinking on, it is copied and never changed
+        """
+        if not self.ponder or self.pondering:
+            return
+
+        self.stop()
+
+        self.pondering = True
+        self.search_thread = threading.Thread(target=self.searcher.iterative_deepening,
+                                              args=(copy_chess_board(chess_board), const.AI_MAX_DEPTH), daemon=True)
+        self.search_thread.start()
+
+    def run_search(self, chess_board):
+        """Plays a move of the opening book, or searches a position within the move time, and keeps the result for
+        poll. Runs on the worker thread.
+
+        :param chess_board: the copy of the chess game to search
+        """
+        book_move = self.opening_book.get_move(chess_board) if self.opening_book is not None else None
+
+        if book_move is not None:
+            self.search_result = search.SearchResult(book_move, 0, 0, 0, 0)
+            return
+
+        self.search_result = self.searcher.iterative_deepening(chess_board, const.AI_MAX_DEPTH,
+                                                               tm.TimeManager.from_move_time(self.move_time))
+
+    def poll(self):
+        """Takes the result of the search if it has finished, without waiting for it.
+
+        :return: the search result, or None if no search finished since the last poll
+        """
+        if not self.is_searching() or self.search_thread.is_alive():
+            return None
+
+        self.search_thread.join()
+        self.search_thread = None
+
+        return self.search_result
+
+    def stop(self):
+        """Stops the search or the pondering, if any, and waits for the worker thread to end."""
+        if self.search_thread is not None:
+            self.stop_event.set()
+            self.search_thread.join()
+
+        self.stop_event.clear()
+        self.search_thread = None
+        self.pondering = False
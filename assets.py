@@ -0,0 +1,122 @@
+import os
+import time
+
+import pygame as py
+
+import constants as const
+import format_conversions as fc
+import table_cache
+
+ASSET_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+# Raised whenever the layout of the sprite atlas changes, so the cached atlases are drawn again.
+ATLAS_VERSION = 1
+
+
+def get_asset_path(*parts):
+    """Builds the path of an asset from the names of its folders and file, so it works on every operating system.
+
+    :param parts: the names of the folders inside the images folder and of the file, like ('chess_pieces', 'w_K.png')
+    :return: the absolute path of the asset
+    """
+    return os.path.join(ASSET_DIRECTORY, *parts)
+
+
+class AssetManager:
+    """Class loading the images of the game the first time they are needed.
+
+    The twelve pieces are scaled once into a single sprite atlas, and every piece image is a subsurface of it. The
+    atlas is saved in the cache directory, so the next start loads one image instead of loading and scaling twelve.
+    """
+    def __init__(self, square_dimension=const.SQUARE_DIMENSION):
+        """Initializes the asset manager without loading anything.
+
+        :param square_dimension: the size of a square of the board in pixels, the size the pieces are scaled to
+        """
+        self.square_dimension = square_dimension
+        self.icon = None
+        self.atlas = None
+        self.piece_images = None
+        self.load_reports = []
+
+    def get_icon(self):
+        """Gets the icon of the game window.
+
+        :return: the icon surface
+        """
+        if self.icon is None:
+            start_time = time.perf_counter()
+            self.icon = py.image.load(get_asset_path("chess_icon.png"))
+            self.load_reports.append(("icon", False, time.perf_counter() - start_time))
+
+        return self.icon
+
+    def get_atlas_path(self):
+        """Gets the path of the cached sprite atlas for the current square dimension.
+
+        :return: the path of the atlas image
+        """
+        return os.path.join(table_cache.get_cache_directory(), f"atlas_{self.square_dimension}_v{ATLAS_VERSION}.png")
+
+    def build_atlas(self):
+        """Loads the piece images and scales them into one row of squares, in the order of the pieces.
+
+        :return: the atlas surface
+        """
+        atlas = py.Surface((self.square_dimension * len(fc.Pieces), self.square_dimension), py.SRCALPHA)
+
+        for piece_index, piece in enumerate(fc.Pieces):
+            piece_image = py.image.load(get_asset_path("chess_pieces", piece.name + ".png"))
+            atlas.blit(py.transform.scale(piece_image.convert_alpha(), (self.square_dimension, self.square_dimension)),
+                       (piece_index * self.square_dimension, 0))
+
+        return atlas
+
+    def get_piece_images(self):
+        """Gets the images of the pieces, loading the atlas the first time. The display must be initialized.
+
+        :return: a map containing the chess pieces notated as color_PIECE with their corresponding image
+        """
+        if self.piece_images is not None:
+            return self.piece_images
+
+        start_time = time.perf_counter()
+        atlas_path = self.get_atlas_path()
+        piece_paths = [get_asset_path("chess_pieces", piece.name + ".png") for piece in fc.Pieces]
+
+        cache_hit = os.path.isfile(atlas_path) and \
+            all(os.path.getmtime(atlas_path) >= os.path.getmtime(piece_path) for piece_path in piece_paths)
+
+        if cache_hit:
+            self.atlas = py.image.load(atlas_path).convert_alpha()
+        else:
+            self.atlas = self.build_atlas()
+
+            try:
+                os.makedirs(os.path.dirname(atlas_path), exist_ok=True)
+                py.image.save(self.atlas, atlas_path)
+            except (OSError, py.error):
+                pass
+
+        self.piece_images = {piece.name: self.atlas.subsurface((piece_index * self.square_dimension, 0,
+                                                                self.square_dimension, self.square_dimension))
+                             for piece_index, piece in enumerate(fc.Pieces)}
+
+        self.load_reports.append(("atlas", cache_hit, time.perf_counter() - start_time))
+
+        return self.piece_images
+
+
+def get_startup_report(asset_manager, startup_time):
+    """Describes what the start of the game spent its time on.
+
+    :param asset_manager: the asset manager of the game
+    :param startup_time: the time the whole start took in seconds
+    :return: the report, one line per loaded part
+    """
+    lines = [f"startup {startup_time * 1000:.1f}ms"]
+
+    for name, cache_hit, load_time in table_cache.get_load_reports() + asset_manager.load_reports:
+        lines.append(f"  {name} {'loaded from cache' if cache_hit else 'loaded'} in {load_time * 1000:.2f}ms")
+
+    return "\n".join(lines)
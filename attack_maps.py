@@ -0,0 +1,147 @@
+import constants as const
+import chess_pieces as cp
+
+
+def get_attacks(board, position, piece):
+    """Gets the squares a piece attacks, the sliding pieces stopping at the first piece of every ray.
+
+    :param board: the chess board as a 2D list
+    :param position: a tuple of the coordinates of the piece
+    :param piece: the piece notated as color_PIECE
+    :return: a list of tuples of the coordinates of the attacked squares
+    """
+    piece_type = piece[2]
+
+    if piece_type == "P":
+        return list(cp.PAWN_ATTACKS[piece[0]][position[0]][position[1]])
+
+    if piece_type == "N":
+        return list(cp.KNIGHT_TARGETS[position[0]][position[1]])
+
+    if piece_type == "K":
+        return list(cp.KING_TARGETS[position[0]][position[1]])
+
+    if piece_type == "R":
+        rays = cp.ROOK_RAYS[position[0]][position[1]]
+    elif piece_type == "B":
+        rays = cp.BISHOP_RAYS[position[0]][position[1]]
+    else:
+        rays = cp.QUEEN_RAYS[position[0]][position[1]]
+
+    attacks = []
+
+    for ray in rays:
+        for rank_index, file_index in ray:
+            attacks.append((rank_index, file_index))
+
+            if board[rank_index][file_index] is not None:
+                break
+
+    return attacks
+
+
+class AttackMaps:
+    """Class keeping, for both colors, the number of pieces attacking every square of the board.
+
+    The counts are updated every time a square changes: the attacks of the piece leaving or reaching the square
+    are taken out or added, and so are the ones of the sliding pieces whose rays go through it. A square is then
+    known to be attacked with a single lookup.
+    """
+    def __init__(self, board):
+        """Initializes the attack counts of a position.
+
+        :param board: the chess board as a 2D list
+        """
+        self.counts = {color: [[0] * const.FILES for _ in range(const.RANKS)] for color in ["w", "b"]}
+        self.king_positions = {}
+
+        for rank_index in range(const.RANKS):
+            for file_index in range(const.FILES):
+                piece = board[rank_index][file_index]
+
+                if piece is not None:
+                    self.add_attacks(board, (rank_index, file_index), piece, 1)
+
+                    if piece[2] == "K":
+                        self.king_positions[piece[0]] = rank_index, file_index
+
+    def add_attacks(self, board, position, piece, change):
+        """Adds the attacks of a piece to the counts of its color.
+
+        :param board: the chess board as a 2D list
+        :param position: a tuple of the coordinates of the piece
+        :param piece: the piece notated as color_PIECE
+        :param change: 1 to add the attacks, -1 to take them out
+        """
+        counts = self.counts[piece[0]]
+
+        for rank_index, file_index in get_attacks(board, position, piece):
+            counts[rank_index][file_index] += change
+
+    @staticmethod
+    def get_sliders_through(board, position):
+        """Finds the sliding pieces whose rays reach a square.
+
+        :param board: the chess board as a 2D list
+        :param position: a tuple of the coordinates of the square
+        :return: a list of tuples (position, piece) of the sliding pieces
+        """
+        sliders = []
+
+        for direction in cp.QUEEN_DIRECTIONS:
+            for rank_index, file_index in cp.RAYS[direction][position[0]][position[1]]:
+                piece = board[rank_index][file_index]
+
+                if piece is not None:
+                    if piece[2] in cp.SLIDERS[direction]:
+                        sliders.append(((rank_index, file_index), piece))
+
+                    break
+
+        return sliders
+
+    def set_piece(self, board, position, piece):
+        """Places a piece on the board and updates the counts of every piece whose attacks change.
+
+        :param board: the chess board as a 2D list, which is changed
+        :param position: a tuple of the coordinates of the square
+        :param piece: the piece notated as color_PIECE, or None to empty the square
+        """
+        current_piece = board[position[0]][position[1]]
+        sliders = self.get_sliders_through(board, position)
+
+        for slider_position, slider in sliders:
+            self.add_attacks(board, slider_position, slider, -1)
+
+        if current_piece is not None:
+            self.add_attacks(board, position, current_piece, -1)
+
+        board[position[0]][position[1]] = piece
+
+        for slider_position, slider in sliders:
+            self.add_attacks(board, slider_position, slider, 1)
+
+        if piece is not None:
+            self.add_attacks(board, position, piece, 1)
+
+            if piece[2] == "K":
+                self.king_positions[piece[0]] = position
+
+    def is_square_attacked(self, position, by_color):
+        """Checks if a square is attacked.
+
+        :param position: a tuple of the coordinates of the square
+        :param by_color: the color of the attacking pieces, 'w' or 'b'
+        :return: if the square is attacked or not
+        """
+        return self.counts[by_color][position[0]][position[1]] > 0
+
+    def king_in_check(self, color):
+        """Checks if the king of a color is attacked.
+
+        :param color: the color of the king, 'w' or 'b'
+        :return: if the king is checked or not
+        """
+        king_position = self.king_positions.get(color)
+
+        return king_position is not None and self.is_square_attacked(king_position, "b" if color == "w" else "w")
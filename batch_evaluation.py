@@ -0,0 +1,394 @@
+import argparse
+import itertools
+import operator
+import random
+import sys
+import time
+
+import numpy as np
+
+import chess_engine as ce
+import chess_pieces as cp
+import constants as const
+import evaluation
+import format_conversions as fc
+import move_encoding as me
+
+# The order of the piece planes of a position.
+PLANE_PIECES = ["w_P", "w_N", "w_B", "w_R", "w_Q", "w_K", "b_P", "b_N", "b_B", "b_R", "b_Q", "b_K"]
+PLANE_INDEXES = {piece: plane for plane, piece in enumerate(PLANE_PIECES)}
+
+# The code of every square content, the empty squares having the code past the last plane.
+SQUARE_CODES = {**PLANE_INDEXES, None: len(PLANE_PIECES)}
+
+SQUARES = const.RANKS * const.FILES
+
+# The centipawns every square a piece can move to is worth.
+MOBILITY_WEIGHTS = {'N': 4, 'B': 3, 'R': 2, 'Q': 1}
+
+# The index past the last square, used to pad the square tables. It is always occupied, so nothing moves to it.
+PADDING_SQUARE = SQUARES
+
+# The codes of the squares every character of a FEN piece placement stands for, the digits standing for empty squares.
+FEN_CHARACTER_CODES = {**{fen_piece.name: bytes([SQUARE_CODES[fen_piece.value]]) for fen_piece in fc.FenToPiece},
+                       **{str(count): bytes([SQUARE_CODES[None]]) * count for count in range(1, const.FILES + 1)}}
+
+# The number of ranks the rank code tables keep before they are emptied, like a cache.
+RANK_CODES_LIMIT = 1 << 16
+
+
+class RankCodes(dict):
+    """Map from the ranks of the boards to the codes of their squares as bytes, filled as the ranks are met. A board
+    has few different ranks, so a batch is mostly read rank by rank from the map."""
+    def __init__(self, get_codes):
+        """Initializes the empty map.
+
+        :param get_codes: the function giving the codes of a rank
+        """
+        super().__init__()
+
+        self.get_codes = get_codes
+
+    def __missing__(self, rank):
+        """Gets the codes of a rank that is not in the map yet and keeps them.
+
+        :param rank: the rank, as a key of the map
+        :return: the codes of its squares as bytes
+        """
+        if len(self) >= RANK_CODES_LIMIT:
+            self.clear()
+
+        codes = self[rank] = self.get_codes(rank)
+
+        return codes
+
+
+def get_board_rank_codes(rank):
+    """Gets the codes of the squares of a rank of a 2D board.
+
+    :param rank: a tuple with the pieces of the rank as color_PIECE, or None for the empty squares
+    :return: the codes of its squares as bytes
+    """
+    return bytes(SQUARE_CODES[piece] for piece in rank)
+
+
+def get_fen_rank_codes(fen_rank):
+    """Gets the codes of the squares of a rank of a FEN piece placement.
+
+    :param fen_rank: the rank, like 'rnbqkbnr' or '3p4'
+    :return: the codes of its squares as bytes
+    """
+    if any(character not in FEN_CHARACTER_CODES for character in fen_rank):
+        raise ValueError(f"invalid piece in FEN: {fen_rank}")
+
+    codes = b"".join(FEN_CHARACTER_CODES[character] for character in fen_rank)
+
+    if len(codes) != const.FILES:
+        raise ValueError(f"invalid rank in FEN: {fen_rank}")
+
+    return codes
+
+
+BOARD_RANK_CODES = RankCodes(get_board_rank_codes)
+FEN_RANK_CODES = RankCodes(get_fen_rank_codes)
+
+
+def _build_plane_scores():
+    """Flattens the material and piece-square scores into one row of 64 squares per piece plane.
+
+    :return: an array of shape (12, 64) with the score of every piece on every square for white
+    """
+    return np.array([[score for rank in evaluation.PIECE_SCORES[piece] for score in rank] for piece in PLANE_PIECES],
+                    dtype=np.int32)
+
+
+def _build_ray_squares():
+    """Lists the squares of the rays of every square, padded to the same length.
+
+    :return: an array of shape (64, 8, 7) with the squares of every direction in the order of QUEEN_DIRECTIONS
+    """
+    ray_squares = np.full((SQUARES, len(cp.QUEEN_DIRECTIONS), const.FILES - 1), PADDING_SQUARE, dtype=np.intp)
+
+    for square in range(SQUARES):
+        rank_index, file_index = divmod(square, const.FILES)
+
+        for direction_index, direction in enumerate(cp.QUEEN_DIRECTIONS):
+            for step, position in enumerate(cp.RAYS[direction][rank_index][file_index]):
+                ray_squares[square, direction_index, step] = me.get_square_index(position)
+
+    return ray_squares
+
+
+def _build_knight_squares():
+    """Lists the squares a knight reaches from every square, padded to the same length.
+
+    :return: an array of shape (64, 8)
+    """
+    knight_squares = np.full((SQUARES, len(cp.KNIGHT_DIRECTIONS)), PADDING_SQUARE, dtype=np.intp)
+
+    for square in range(SQUARES):
+        targets = cp.KNIGHT_TARGETS[square // const.FILES][square % const.FILES]
+
+        knight_squares[square, :len(targets)] = [me.get_square_index(target) for target in targets]
+
+    return knight_squares
+
+
+PLANE_SCORES = _build_plane_scores()
+RAY_SQUARES = _build_ray_squares()
+KNIGHT_SQUARES = _build_knight_squares()
+
+# The planes of the pieces counted in the mobility, with their color (0 for white), type, signed weight and the
+# directions of QUEEN_DIRECTIONS they slide in.
+MOBILITY_PLANES = [plane for plane, piece in enumerate(PLANE_PIECES) if piece[2] in MOBILITY_WEIGHTS]
+MOBILITY_PLANE_COLORS = np.array([0 if PLANE_PIECES[plane][0] == "w" else 1 for plane in MOBILITY_PLANES])
+MOBILITY_PLANE_TYPES = np.array([PLANE_PIECES[plane][2] for plane in MOBILITY_PLANES])
+MOBILITY_PLANE_WEIGHTS = np.array([MOBILITY_WEIGHTS[PLANE_PIECES[plane][2]] * (1 if PLANE_PIECES[plane][0] == "w" else -1)
+                                   for plane in MOBILITY_PLANES])
+MOBILITY_PLANE_DIRECTIONS = np.array([[direction in {"B": cp.BISHOP_DIRECTIONS, "R": cp.ROOK_DIRECTIONS}.get(
+    PLANE_PIECES[plane][2], cp.QUEEN_DIRECTIONS) for direction in cp.QUEEN_DIRECTIONS] for plane in MOBILITY_PLANES])
+
+
+def get_planes(positions):
+    """Converts positions into piece planes. The bitboards of the positions having them are unpacked, and the ranks of
+    the other boards and of the FEN strings are read from the rank code tables, without a loop over their squares.
+
+    :param positions: a list of chess games or FEN strings
+    :return: a tuple (planes, white_turn) with the planes as an array of shape (N, 12, 64) holding 1 where a piece is,
+             and white_turn as an array of shape (N,) telling if white is to move
+    """
+    planes = np.empty((len(positions), len(PLANE_PIECES), SQUARES), dtype=np.uint8)
+    plane_codes = np.arange(len(PLANE_PIECES), dtype=np.uint8)[:, np.newaxis]
+    get_piece_masks = operator.itemgetter(*PLANE_PIECES)
+
+    white_turn = []
+    bitboard_indexes = []
+    piece_masks = []
+    fen_indexes = []
+    placements = []
+    board_indexes = []
+    boards = []
+
+    for position_index, position in enumerate(positions):
+        if isinstance(position, str):
+            fen_fields = ce.get_fen_fields(position)
+
+            if fen_fields[0].count("/") != const.RANKS - 1:
+                raise ValueError(f"invalid number of ranks in FEN: {position}")
+
+            white_turn.append(fen_fields[1] == "w")
+            fen_indexes.append(position_index)
+            placements.append(fen_fields[0])
+        elif position.bitboards is not None:
+            white_turn.append(position.white_turn)
+            bitboard_indexes.append(position_index)
+            piece_masks.extend(get_piece_masks(position.bitboards.pieces))
+        else:
+            white_turn.append(position.white_turn)
+            board_indexes.append(position_index)
+            boards.append(position.board)
+
+    if bitboard_indexes:
+        piece_masks = np.array(piece_masks, dtype="<u8").view(np.uint8)
+        planes[bitboard_indexes] = np.unpackbits(piece_masks, bitorder="little").reshape(-1, len(PLANE_PIECES), SQUARES)
+
+    if fen_indexes:
+        square_codes = b"".join(map(FEN_RANK_CODES.__getitem__, "/".join(placements).split("/")))
+        planes[fen_indexes] = np.frombuffer(square_codes, dtype=np.uint8).reshape(-1, 1, SQUARES) == plane_codes
+
+    if board_indexes:
+        square_codes = b"".join(map(BOARD_RANK_CODES.__getitem__, map(tuple, itertools.chain.from_iterable(boards))))
+        planes[board_indexes] = np.frombuffer(square_codes, dtype=np.uint8).reshape(-1, 1, SQUARES) == plane_codes
+
+    return planes, np.array(white_turn, dtype=bool)
+
+
+def get_mobility(planes):
+    """Counts the squares the knights and the sliding pieces can move to, the ones of their own color excepted,
+    without verifying if the moves leave the king in check. Only the squares holding such a piece are looked at, as a
+    flat array of pieces across the whole batch.
+
+    :param planes: an array of shape (N, 12, 64) as returned by get_planes
+    :return: an array of shape (N,) with the mobility score in centipawns for white
+    """
+    padding = np.ones((len(planes), 1), dtype=bool)
+
+    # The occupied squares of each color, flattened with the padding square always occupied, so a square of a position
+    # is at (color * N + position) * 65 + square.
+    own_squares = np.concatenate([np.concatenate([planes[:, :6].any(axis=1), padding], axis=1),
+                                  np.concatenate([planes[:, 6:].any(axis=1), padding], axis=1)]).reshape(-1)
+    occupied = own_squares[:len(own_squares) // 2] | own_squares[len(own_squares) // 2:]
+
+    positions, mobility_planes, squares = np.nonzero(planes[:, MOBILITY_PLANES])
+    position_offsets = positions * (SQUARES + 1)
+    own_offsets = MOBILITY_PLANE_COLORS[mobility_planes] * len(planes) * (SQUARES + 1) + position_offsets
+    moves = np.zeros(len(positions), dtype=np.int32)
+
+    knights = MOBILITY_PLANE_TYPES[mobility_planes] == "N"
+    knight_targets = KNIGHT_SQUARES[squares[knights]]
+    moves[knights] = (~own_squares[own_offsets[knights, np.newaxis] + knight_targets]).sum(axis=-1)
+
+    sliders = ~knights
+    rays = RAY_SQUARES[squares[sliders]]
+
+    # A ray reaches a square when every square before it on the ray is empty.
+    empty = ~occupied[position_offsets[sliders, np.newaxis, np.newaxis] + rays]
+    reached = np.ones_like(empty)
+    np.logical_and.accumulate(empty[..., :-1], axis=-1, out=reached[..., 1:])
+
+    ray_moves = (reached & ~own_squares[own_offsets[sliders, np.newaxis, np.newaxis] + rays]).sum(axis=-1)
+    moves[sliders] = (ray_moves * MOBILITY_PLANE_DIRECTIONS[mobility_planes[sliders]]).sum(axis=-1)
+
+    return np.bincount(positions, moves * MOBILITY_PLANE_WEIGHTS[mobility_planes], len(planes)).astype(np.int32)
+
+
+def evaluate_planes(planes, white_turn, mobility=False):
+    """Evaluates positions with the material and the piece-square tables, like evaluation.evaluate.
+
+    :param planes: an array of shape (N, 12, 64) as returned by get_planes
+    :param white_turn: an array of shape (N,) telling if white is to move
+    :param mobility: if the mobility of the knights and the sliding pieces is added to the scores
+    :return: an array of shape (N,) with the scores in centipawns from the point of view of the player to move
+    """
+    scores = planes.reshape(len(planes), PLANE_SCORES.size).astype(np.int32) @ PLANE_SCORES.reshape(-1)
+
+    if mobility:
+        scores += get_mobility(planes)
+
+    return np.where(white_turn, scores, -scores)
+
+
+def evaluate_batch(positions, mobility=False):
+    """Evaluates many positions at once.
+
+    :param positions: a list of chess games or FEN strings
+    :param mobility: if the mobility of the knights and the sliding pieces is added to the scores
+    :return: an array of shape (N,) with the scores in centipawns from the point of view of the player to move
+    """
+    return evaluate_planes(*get_planes(positions), mobility)
+
+
+def evaluate_mobility(chess_board):
+    """Evaluates the mobility of a single position the same way as get_mobility, square by square.
+
+    :param chess_board: the chess game to evaluate
+    :return: the score in centipawns from the point of view of the player to move
+    """
+    board = chess_board.board
+    rays = {"B": cp.BISHOP_RAYS, "R": cp.ROOK_RAYS, "Q": cp.QUEEN_RAYS}
+    score = 0
+
+    for rank_index in range(const.RANKS):
+        for file_index in range(const.FILES):
+            piece = board[rank_index][file_index]
+
+            if piece is None or piece[2] not in MOBILITY_WEIGHTS:
+                continue
+
+            if piece[2] == "N":
+                moves = cp.step_moves((rank_index, file_index), cp.KNIGHT_TARGETS[rank_index][file_index], board)
+            else:
+                moves = cp.directional_moves((rank_index, file_index), rays[piece[2]][rank_index][file_index], board)
+
+            score += len(moves) * MOBILITY_WEIGHTS[piece[2]] * (1 if piece[0] == "w" else -1)
+
+    return score if chess_board.white_turn else -score
+
+
+def get_random_positions(count, seed=0, max_plies=80):
+    """Plays random games to collect positions to evaluate.
+
+    :param count: the number of positions
+    :param seed: the seed of the random moves
+    :param max_plies: the number of plies after which a new game is started
+    :return: a list of FEN strings
+    """
+    move_random = random.Random(seed)
+    fens = []
+
+    while len(fens) < count:
+        chess_board = ce.ChessBoard("player", backend="bitboard")
+
+        for _ in range(max_plies):
+            moves = chess_board.get_legal_moves()
+
+            if not moves or len(fens) >= count:
+                break
+
+            chess_board.make_move(*move_random.choice(moves))
+            fens.append(chess_board.to_fen())
+
+    return fens
+
+
+def run_benchmark(count, mobility=False, seed=0, backend=const.BOARD_BACKEND):
+    """Compares the positions per second of the batch evaluation with a loop evaluating one position at a time, the
+    batch being given either the chess games or their FEN strings.
+
+    :param count: the number of positions
+    :param mobility: if the mobility is part of the evaluation
+    :param seed: the seed of the random positions
+    :param backend: the board backend of the positions
+    :return: the largest difference between the scores of the two evaluations, 0 when they agree
+    """
+    fens = get_random_positions(count, seed)
+    chess_boards = [ce.ChessBoard("player", fen, backend) for fen in fens]
+
+    start_time = time.perf_counter()
+    loop_scores = [evaluation.evaluate(chess_board) + (evaluate_mobility(chess_board) if mobility else 0)
+                   for chess_board in chess_boards]
+    loop_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    planes, white_turn = get_planes(chess_boards)
+    conversion_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    fen_planes, fen_white_turn = get_planes(fens)
+    fen_conversion_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    batch_scores = evaluate_planes(planes, white_turn, mobility)
+    evaluation_time = time.perf_counter() - start_time
+
+    fen_scores = evaluate_planes(fen_planes, fen_white_turn, mobility)
+
+    difference = int(max(np.abs(batch_scores - np.array(loop_scores)).max(),
+                         np.abs(fen_scores - np.array(loop_scores)).max())) if count else 0
+
+    print(f"positions {count} backend {backend} mobility {'on' if mobility else 'off'}")
+    print(f"loop        {loop_time:.3f}s {count / loop_time:.0f} positions/s")
+    print(f"planes      {conversion_time:.3f}s {count / conversion_time:.0f} positions/s")
+    print(f"fen planes  {fen_conversion_time:.3f}s {count / fen_conversion_time:.0f} positions/s")
+    print(f"batch       {evaluation_time:.3f}s {count / evaluation_time:.0f} positions/s")
+    print(f"batch with planes {count / (conversion_time + evaluation_time):.0f} positions/s, "
+          f"speedup {loop_time / (conversion_time + evaluation_time):.1f}x, "
+          f"with fen planes {count / (fen_conversion_time + evaluation_time):.0f} positions/s, "
+          f"largest difference {difference}")
+
+    if conversion_time + evaluation_time > loop_time:
+        print("batch slower than the loop, converting the games to planes costs more than the evaluation saves")
+
+    return difference
+
+
+def get_arguments(arguments):
+    """Parses the command line arguments of the batch evaluation benchmark.
+
+    :param arguments: the list of arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks the batch evaluation against a per-position loop.")
+    parser.add_argument("--positions", type=int, default=10000, help="the number of random positions")
+    parser.add_argument("--mobility", action="store_true", help="add the mobility to the evaluation")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the random positions")
+    parser.add_argument("--backend", choices=const.BOARD_BACKENDS, default=const.BOARD_BACKEND, help="the board backend of the positions")
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    benchmark_arguments = get_arguments(sys.argv[1:])
+
+    sys.exit(0 if run_benchmark(benchmark_arguments.positions, benchmark_arguments.mobility, benchmark_arguments.seed,
+                              benchmark_arguments.backend) == 0 else 1)
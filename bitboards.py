@@ -0,0 +1,664 @@
+"""Bitboard representation of a chess position.
+
+Squares are numbered the same way the 2D board is indexed, square = rank * 8 + file, where rank 0 is the
+rank black's pieces start on. Bit 0 is therefore a8 and bit 63 is h1.
+"""
+import constants as const
+import move_encoding as me
+import table_cache
+
+FULL_BOARD = (1 << 64) - 1
+
+PIECE_NOTATIONS = [color + "_" + piece_type for color in "bw" for piece_type in "BKNPQR"]
+
+OPPONENT = {'w': 'b', 'b': 'w'}
+
+SQUARE_BITS = [1 << square for square in range(const.RANKS * const.FILES)]
+
+POSITIONS = [divmod(square, const.FILES) for square in range(const.RANKS * const.FILES)]
+
+# The ranks a pawn is promoted on, and the ranks the pawns of each color reach with a single push they can follow
+# with a second one.
+PROMOTION_RANKS = 0xFF | 0xFF << 56
+WHITE_DOUBLE_PUSH_RANK = 0xFF << 40
+BLACK_DOUBLE_PUSH_RANK = 0xFF << 16
+
+# Every square but the ones of the first file, and every square but the ones of the last file.
+NOT_FIRST_FILE = FULL_BOARD ^ sum(1 << square for square in range(0, const.RANKS * const.FILES, const.FILES))
+NOT_LAST_FILE = FULL_BOARD ^ sum(1 << square for square in range(const.FILES - 1, const.RANKS * const.FILES, const.FILES))
+
+# The keys of the pieces of each color in the bitboards, king, knight, bishop, rook, queen and pawn.
+PIECE_KEYS = {color: tuple(color + "_" + piece_type for piece_type in "KNBRQP") for color in "wb"}
+
+# The flags of the packed moves, already shifted into their bits. A pawn reaching the last rank gives one move for
+# every promotion piece, in the order of the promotion pieces.
+CAPTURE_FLAGS = me.CAPTURE << 12
+DOUBLE_PAWN_PUSH_FLAGS = me.DOUBLE_PAWN_PUSH << 12
+EN_PASSANT_FLAGS = me.EN_PASSANT << 12
+CASTLE_FLAGS = {2: me.KING_CASTLE << 12, -2: me.QUEEN_CASTLE << 12}
+PROMOTION_FLAGS = [(me.PROMOTION | me.PROMOTION_FLAG_PIECES.index(promotion)) << 12 for promotion in const.PROMOTION_PIECES]
+
+
+# The packed moves from a square to the squares of a bitboard, filled as the bitboards are met, by the bitboard shifted
+# past the starting square, and the packed moves of the pawns of each color by the squares they move to. The tables are
+# emptied when they reach their size limit, like a cache.
+MOVE_CODES_LIMIT = 1 << 16
+
+_quiet_move_codes = {}
+_capture_move_codes = {}
+_pawn_move_codes = {'w': {}, 'b': {}}
+
+# The distance the pawns of each color come from and the flags of their moves, for their single pushes, double pushes
+# and captures to each side.
+PAWN_MOVE_KINDS = {'w': ((8, 0), (16, DOUBLE_PAWN_PUSH_FLAGS), (9, CAPTURE_FLAGS), (7, CAPTURE_FLAGS)),
+                   'b': ((-8, 0), (-16, DOUBLE_PAWN_PUSH_FLAGS), (-7, CAPTURE_FLAGS), (-9, CAPTURE_FLAGS))}
+
+
+def square_from_position(position):
+    """Converts a position on the 2D board into a square index.
+
+    :param position: a tuple representing the coordinates on the board
+    :return: the index of the square
+    """
+    return position[0] * const.FILES + position[1]
+
+
+def squares_of(bitboard):
+    """Iterates over the squares that are set in a bitboard, from the lowest to the highest.
+
+    :param bitboard: a 64-bit integer
+    :return: a generator of square indexes
+    """
+    while bitboard:
+        lowest_bit = bitboard & -bitboard
+
+        yield lowest_bit.bit_length() - 1
+
+        bitboard ^= lowest_bit
+
+
+def _add_move_codes(move_codes, starting_square, desired_squares, flags):
+    """Packs the moves from a square to the squares of a bitboard and keeps them for the next time they are met.
+
+    :param move_codes: the table of the moves, either the quiet ones or the captures
+    :param starting_square: the index of the square the piece is on
+    :param desired_squares: the bitboard of the squares the piece moves to
+    :param flags: the flags of the moves, already shifted into their bits
+    :return: a tuple of the packed moves
+    """
+    if len(move_codes) >= MOVE_CODES_LIMIT:
+        move_codes.clear()
+
+    codes = move_codes[desired_squares << 6 | starting_square] = tuple(starting_square | desired_square << 6 | flags
+                                                                         for desired_square in squares_of(desired_squares))
+
+    return codes
+
+
+def _add_pawn_move_codes(color, pawn_squares):
+    """Packs the moves of the pawns of a color and keeps them for the next time they are met. The pawns reaching the
+    last rank give one move for every promotion piece.
+
+    :param color: the color of the pawns as 'w' or 'b'
+    :param pawn_squares: a tuple with the bitboards of the squares of the single pushes, the double pushes and the
+                         captures to each side
+    :return: a tuple of the packed moves
+    """
+    move_codes = _pawn_move_codes[color]
+
+    if len(move_codes) >= MOVE_CODES_LIMIT:
+        move_codes.clear()
+
+    codes = []
+
+    for desired_squares, (distance, flags) in zip(pawn_squares, PAWN_MOVE_KINDS[color]):
+        for desired_square in squares_of(desired_squares):
+            move = desired_square + distance | desired_square << 6 | flags
+
+            if SQUARE_BITS[desired_square] & PROMOTION_RANKS:
+                codes.extend(move | promotion_flags for promotion_flags in PROMOTION_FLAGS)
+            else:
+                codes.append(move)
+
+    codes = move_codes[pawn_squares] = tuple(codes)
+
+    return codes
+
+
+def _leaper_attacks(offsets):
+    """Builds the attack table of a piece that jumps by fixed offsets.
+
+    :param offsets: a list of tuples representing the rank and file changes of a jump
+    :return: a list with the attacked squares bitboard of each square
+    """
+    attacks = []
+
+    for rank, file in POSITIONS:
+        bitboard = 0
+
+        for rank_change, file_change in offsets:
+            target_rank, target_file = rank + rank_change, file + file_change
+
+            if 0 <= target_rank < const.RANKS and 0 <= target_file < const.FILES:
+                bitboard |= SQUARE_BITS[square_from_position((target_rank, target_file))]
+
+        attacks.append(bitboard)
+
+    return attacks
+
+
+def _sliding_tables(directions):
+    """Builds the attacks of a sliding piece for every square and every occupancy of the squares that can block it.
+    The squares at the end of a ray never block anything, so they are left out of the masks.
+
+    :param directions: a list of tuples representing the rank and file changes of the rays of the piece
+    :return: a tuple (masks, occupancies, attacks) where masks has the blocking squares of each square, and occupancies
+             and attacks list every occupancy of those squares with its attacks, square after square
+    """
+    masks, occupancies, attacks = [], [], []
+
+    for rank, file in POSITIONS:
+        rays = []
+
+        for rank_change, file_change in directions:
+            ray = []
+            target_rank, target_file = rank + rank_change, file + file_change
+
+            while 0 <= target_rank < const.RANKS and 0 <= target_file < const.FILES:
+                ray.append(SQUARE_BITS[square_from_position((target_rank, target_file))])
+                target_rank, target_file = target_rank + rank_change, target_file + file_change
+
+            rays.append(ray)
+
+        mask = sum(bit for ray in rays for bit in ray[:-1])
+        occupancy = 0
+
+        # Every subset of the mask is visited once, the carry of the subtraction going through the unmasked bits.
+        while True:
+            square_attacks = 0
+
+            for ray in rays:
+                for bit in ray:
+                    square_attacks |= bit
+
+                    if occupancy & bit:
+                        break
+
+            occupancies.append(occupancy)
+            attacks.append(square_attacks)
+
+            occupancy = (occupancy - mask) & mask
+
+            if not occupancy:
+                break
+
+        masks.append(mask)
+
+    return masks, occupancies, attacks
+
+
+def _between_squares():
+    """Builds the squares strictly between every two squares sharing a rank, a file or a diagonal.
+
+    :return: a list indexed by both squares, with an empty bitboard for squares that are not aligned
+    """
+    between = [[0] * len(POSITIONS) for _ in POSITIONS]
+
+    for square, (rank, file) in enumerate(POSITIONS):
+        for rank_change, file_change in [(x, y) for x in [-1, 0, 1] for y in [-1, 0, 1] if (x, y) != (0, 0)]:
+            ray = 0
+            target_rank, target_file = rank + rank_change, file + file_change
+
+            while 0 <= target_rank < const.RANKS and 0 <= target_file < const.FILES:
+                target_square = square_from_position((target_rank, target_file))
+
+                between[square][target_square] = ray
+                ray |= SQUARE_BITS[target_square]
+
+                target_rank, target_file = target_rank + rank_change, target_file + file_change
+
+    return between
+
+
+def _build_tables():
+    """Builds every precomputed table of the bitboards.
+
+    :return: a map from the names of the tables to their values
+    """
+    BISHOP_MASKS, bishop_occupancies, bishop_slides = _sliding_tables([(-1, -1), (-1, 1), (1, -1), (1, 1)])
+    ROOK_MASKS, rook_occupancies, rook_slides = _sliding_tables([(-1, 0), (1, 0), (0, -1), (0, 1)])
+
+    return {
+        "KNIGHT_ATTACKS": _leaper_attacks([(x, y) for x in [-2, 2] for y in [-1, 1]] + [(y, x) for x in [-2, 2] for y in [-1, 1]]),
+        "KING_ATTACKS": _leaper_attacks([(x, y) for x in [-1, 0, 1] for y in [-1, 0, 1] if (x, y) != (0, 0)]),
+        "WHITE_PAWN_ATTACKS": _leaper_attacks([(-1, -1), (-1, 1)]),
+        "BLACK_PAWN_ATTACKS": _leaper_attacks([(1, -1), (1, 1)]),
+        "BETWEEN": _between_squares(),
+        "BISHOP_MASKS": BISHOP_MASKS,
+        "BISHOP_OCCUPANCIES": bishop_occupancies,
+        "BISHOP_SLIDES": bishop_slides,
+        "ROOK_MASKS": ROOK_MASKS,
+        "ROOK_OCCUPANCIES": rook_occupancies,
+        "ROOK_SLIDES": rook_slides,
+    }
+
+
+def _sliding_lookup(masks, occupancies, attacks):
+    """Groups the attacks of a sliding piece by square, so finding them is a single lookup by the masked occupancy,
+    like magic bitboards without the multiplication.
+
+    :param masks: the blocking squares of each square
+    :param occupancies: every occupancy of the blocking squares, square after square
+    :param attacks: the attacks of every occupancy
+    :return: a list with, for each square, a map from the occupancy of its blocking squares to its attacks
+    """
+    lookup = []
+    start = 0
+
+    for mask in masks:
+        end = start + (1 << bin(mask).count("1"))
+        lookup.append(dict(zip(occupancies[start:end], attacks[start:end])))
+        start = end
+
+    return lookup
+
+
+_tables = table_cache.load_tables("bitboards", _build_tables, table_cache.get_fingerprint(__file__, const.RANKS, const.FILES))
+
+KNIGHT_ATTACKS = _tables["KNIGHT_ATTACKS"]
+KING_ATTACKS = _tables["KING_ATTACKS"]
+PAWN_ATTACKS = {'w': _tables["WHITE_PAWN_ATTACKS"], 'b': _tables["BLACK_PAWN_ATTACKS"]}
+
+BETWEEN = _tables["BETWEEN"]
+
+BISHOP_MASKS = _tables["BISHOP_MASKS"]
+BISHOP_ATTACKS = _sliding_lookup(BISHOP_MASKS, _tables["BISHOP_OCCUPANCIES"], _tables["BISHOP_SLIDES"])
+ROOK_MASKS = _tables["ROOK_MASKS"]
+ROOK_ATTACKS = _sliding_lookup(ROOK_MASKS, _tables["ROOK_OCCUPANCIES"], _tables["ROOK_SLIDES"])
+
+# The knight attacks looked up like the sliding ones, with no blocking squares.
+KNIGHT_MASKS = [0] * len(KNIGHT_ATTACKS)
+KNIGHT_LOOKUP = [{0: attacks} for attacks in KNIGHT_ATTACKS]
+
+
+def bishop_attacks(square, occupied):
+    """Computes the squares attacked by a bishop.
+
+    :param square: the square of the bishop
+    :param occupied: the bitboard of all occupied squares
+    :return: the bitboard of the attacked squares
+    """
+    return BISHOP_ATTACKS[square][occupied & BISHOP_MASKS[square]]
+
+
+def rook_attacks(square, occupied):
+    """Computes the squares attacked by a rook.
+
+    :param square: the square of the rook
+    :param occupied: the bitboard of all occupied squares
+    :return: the bitboard of the attacked squares
+    """
+    return ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]]
+
+
+class Bitboards:
+    """Class holding an occupancy bitboard for every piece and for every color of a chess position."""
+    def __init__(self, board):
+        """Initializes the bitboards from a 2D board.
+
+        :param board: the chess board as a 2D list with elements as color_PIECE
+        """
+        self.pieces = {piece: 0 for piece in PIECE_NOTATIONS}
+        self.colors = {'w': 0, 'b': 0}
+        self.occupied = 0
+
+        for rank_index, rank in enumerate(board):
+            for file_index, piece in enumerate(rank):
+                if piece is not None:
+                    self.put_piece(square_from_position((rank_index, file_index)), piece)
+
+    def put_piece(self, square, piece):
+        """Places a piece on an empty square.
+
+        :param square: the index of the square
+        :param piece: the piece notated as color_PIECE
+        """
+        bit = SQUARE_BITS[square]
+
+        self.pieces[piece] |= bit
+        self.colors[piece[0]] |= bit
+        self.occupied |= bit
+
+    def remove_piece(self, square, piece):
+        """Removes a piece from the square it is on.
+
+        :param square: the index of the square
+        :param piece: the piece notated as color_PIECE
+        """
+        bit = SQUARE_BITS[square]
+
+        self.pieces[piece] ^= bit
+        self.colors[piece[0]] ^= bit
+        self.occupied ^= bit
+
+    def attackers_to(self, square, by_color, occupied):
+        """Gets every piece of a color attacking a square.
+
+        :param square: the index of the square
+        :param by_color: the color of the attacking pieces as 'w' or 'b'
+        :param occupied: the bitboard of the occupied squares blocking the sliding pieces
+        :return: the bitboard of the attacking pieces
+        """
+        pieces = self.pieces
+        king_key, knight_key, bishop_key, rook_key, queen_key, pawn_key = PIECE_KEYS[by_color]
+        queens = pieces[queen_key]
+
+        return ((KNIGHT_ATTACKS[square] & pieces[knight_key])
+                | (KING_ATTACKS[square] & pieces[king_key])
+                | (PAWN_ATTACKS[OPPONENT[by_color]][square] & pieces[pawn_key])
+                | (BISHOP_ATTACKS[square][occupied & BISHOP_MASKS[square]] & (pieces[bishop_key] | queens))
+                | (ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]] & (pieces[rook_key] | queens)))
+
+    def is_square_attacked(self, square, by_color, occupied=None):
+        """Checks if a square is attacked by any piece of a color.
+
+        :param square: the index of the square
+        :param by_color: the color of the attacking pieces as 'w' or 'b'
+        :param occupied: the bitboard of the occupied squares blocking the sliding pieces, by default the current one
+        :return: if the square is attacked or not
+        """
+        pieces = self.pieces
+        king_key, knight_key, bishop_key, rook_key, queen_key, pawn_key = PIECE_KEYS[by_color]
+
+        if occupied is None:
+            occupied = self.occupied
+
+        if KNIGHT_ATTACKS[square] & pieces[knight_key]:
+            return True
+
+        if KING_ATTACKS[square] & pieces[king_key]:
+            return True
+
+        if PAWN_ATTACKS[OPPONENT[by_color]][square] & pieces[pawn_key]:
+            return True
+
+        queens = pieces[queen_key]
+
+        if BISHOP_ATTACKS[square][occupied & BISHOP_MASKS[square]] & (pieces[bishop_key] | queens):
+            return True
+
+        return bool(ROOK_ATTACKS[square][occupied & ROOK_MASKS[square]] & (pieces[rook_key] | queens))
+
+    def king_in_check(self, color):
+        """Checks if the king of a color is attacked.
+
+        :param color: the color of the king as 'w' or 'b'
+        :return: if the king is checked or not
+        """
+        king = self.pieces[color + "_K"]
+
+        if not king:
+            return False
+
+        return self.is_square_attacked(king.bit_length() - 1, OPPONENT[color])
+
+    def pawn_moves(self, square, color, en_passant):
+        """Gets the squares a pawn can move to.
+
+        :param square: the index of the square the pawn is on
+        :param color: the color of the pawn as 'w' or 'b'
+        :param en_passant: the position of the pawn that can be taken en passant, or None
+        :return: the bitboard of the reachable squares
+        """
+        empty = ~self.occupied & FULL_BOARD
+        bit = SQUARE_BITS[square]
+        rank, file = POSITIONS[square]
+
+        if color == 'w':
+            moves = (bit >> 8) & empty
+
+            if moves and rank == 6:
+                moves |= (moves >> 8) & empty
+        else:
+            moves = (bit << 8) & empty
+
+            if moves and rank == 1:
+                moves |= (moves << 8) & empty
+
+        moves |= PAWN_ATTACKS[color][square] & self.colors[OPPONENT[color]]
+
+        if en_passant is not None and en_passant[0] == rank and abs(en_passant[1] - file) == 1:
+            moves |= SQUARE_BITS[square_from_position((rank - 1 if color == 'w' else rank + 1, en_passant[1]))]
+
+        return moves
+
+    def castle_moves(self, square, color, castles):
+        """Gets the squares the king can castle to.
+
+        :param square: the index of the square the king is on
+        :param color: the color of the king as 'w' or 'b'
+        :param castles: the castle rights of the game
+        :return: the bitboard of the castle squares
+        """
+        moves = 0
+        rank_shift = square & 56
+
+        if square & 7 != 4:
+            return moves
+
+        king_castle = castles.rights & (const.WHITE_KING_CASTLE if color == 'w' else const.BLACK_KING_CASTLE)
+        queen_castle = castles.rights & (const.WHITE_QUEEN_CASTLE if color == 'w' else const.BLACK_QUEEN_CASTLE)
+
+        if king_castle and not self.occupied & (0b01100000 << rank_shift):
+            moves |= SQUARE_BITS[square + 2]
+
+        if queen_castle and not self.occupied & (0b00001110 << rank_shift):
+            moves |= SQUARE_BITS[square - 2]
+
+        return moves
+
+    def get_moves(self, square, piece, en_passant=None, castles=None):
+        """Gets the squares a piece can move to, without verifying if the king is left in check.
+
+        :param square: the index of the square the piece is on
+        :param piece: the piece notated as color_PIECE
+        :param en_passant: the position of the pawn that can be taken en passant, or None
+        :param castles: the castle rights of the game, or None if castling is not allowed
+        :return: the bitboard of the reachable squares
+        """
+        color, piece_type = piece[0], piece[2]
+
+        if piece_type == "P":
+            return self.pawn_moves(square, color, en_passant)
+
+        if piece_type == "N":
+            attacks = KNIGHT_ATTACKS[square]
+        elif piece_type == "B":
+            attacks = bishop_attacks(square, self.occupied)
+        elif piece_type == "R":
+            attacks = rook_attacks(square, self.occupied)
+        elif piece_type == "Q":
+            attacks = bishop_attacks(square, self.occupied) | rook_attacks(square, self.occupied)
+        else:
+            attacks = KING_ATTACKS[square]
+
+            if castles is not None:
+                attacks |= self.castle_moves(square, color, castles)
+
+        return attacks & ~self.colors[color]
+
+    def get_pins(self, king_square, color):
+        """Finds the pieces pinned to the king.
+
+        :param king_square: the index of the square the king is on
+        :param color: the color of the king as 'w' or 'b'
+        :return: a map from the square of every pinned piece to the bitboard of the squares it can still move to
+        """
+        pins = {}
+
+        opponent = OPPONENT[color]
+        enemy = self.colors[opponent]
+        queens = self.pieces[opponent + "_Q"]
+
+        pinners = rook_attacks(king_square, enemy) & (self.pieces[opponent + "_R"] | queens)
+        pinners |= bishop_attacks(king_square, enemy) & (self.pieces[opponent + "_B"] | queens)
+
+        for pinner in squares_of(pinners):
+            between = BETWEEN[king_square][pinner] & self.occupied
+
+            if between and not between & (between - 1):
+                pins[between.bit_length() - 1] = BETWEEN[king_square][pinner] | SQUARE_BITS[pinner]
+
+        return pins
+
+    def get_legal_moves(self, color, en_passant=None, castles=None, captures_only=False):
+        """Gets the legal moves of a color, computing the checking and pinned pieces once for the whole position. The
+        moves are packed like move_encoding packs them, their flags coming from the bitboards, so the 2D board is never
+        read. The moves of the pieces come whole from the move code tables, and the pawns are moved all at once.
+
+        :param color: the color of the player to move as 'w' or 'b'
+        :param en_passant: the position of the pawn that can be taken en passant, or None
+        :param castles: the castle rights of the game, or None if castling is not allowed
+        :param captures_only: if only the captures, en_passant included, should be generated
+        :return: a list of the packed moves
+        """
+        moves = []
+
+        pieces = self.pieces
+        king_key, knight_key, bishop_key, rook_key, queen_key, pawn_key = PIECE_KEYS[color]
+        opponent = OPPONENT[color]
+        own = self.colors[color]
+        enemy = self.colors[opponent]
+        occupied = self.occupied
+        empty = ~occupied & FULL_BOARD
+
+        king = pieces[king_key]
+        king_square = king.bit_length() - 1
+        checkers = self.attackers_to(king_square, opponent, occupied)
+        targets = enemy if captures_only else ~own & FULL_BOARD
+
+        for desired_square in squares_of(KING_ATTACKS[king_square] & targets):
+            if not self.is_square_attacked(desired_square, opponent, occupied ^ king):
+                moves.append(king_square | desired_square << 6 | (CAPTURE_FLAGS if enemy & SQUARE_BITS[desired_square] else 0))
+
+        if checkers & (checkers - 1):
+            return moves
+
+        if checkers:
+            targets &= checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        elif castles is not None and not captures_only:
+            for desired_square in squares_of(self.castle_moves(king_square, color, castles)):
+                passed_square = (king_square + desired_square) // 2
+
+                if not self.is_square_attacked(passed_square, opponent) and not self.is_square_attacked(desired_square, opponent):
+                    moves.append(king_square | desired_square << 6 | CASTLE_FLAGS[desired_square - king_square])
+
+        pins = self.get_pins(king_square, color)
+        quiet_targets = targets & empty
+        capture_targets = targets & enemy
+        quiet_codes = _quiet_move_codes
+        capture_codes = _capture_move_codes
+
+        # The queens are moved as a bishop and as a rook, and the knights have no blocking squares, so the attacks of
+        # every piece are found the same way.
+        for piece_squares, attack_lookup, masks in ((pieces[knight_key], KNIGHT_LOOKUP, KNIGHT_MASKS),
+                                                    (pieces[bishop_key] | pieces[queen_key], BISHOP_ATTACKS, BISHOP_MASKS),
+                                                    (pieces[rook_key] | pieces[queen_key], ROOK_ATTACKS, ROOK_MASKS)):
+            while piece_squares:
+                starting_bit = piece_squares & -piece_squares
+                piece_squares ^= starting_bit
+                starting_square = starting_bit.bit_length() - 1
+                attacks = attack_lookup[starting_square][occupied & masks[starting_square]]
+
+                if starting_square in pins:
+                    attacks &= pins[starting_square]
+
+                quiet_squares = attacks & quiet_targets
+                capture_squares = attacks & capture_targets
+
+                if quiet_squares:
+                    codes = quiet_codes.get(quiet_squares << 6 | starting_square)
+                    moves += codes if codes is not None else _add_move_codes(quiet_codes, starting_square, quiet_squares, 0)
+
+                if capture_squares:
+                    codes = capture_codes.get(capture_squares << 6 | starting_square)
+                    moves += codes if codes is not None else _add_move_codes(capture_codes, starting_square, capture_squares,
+                                                                            CAPTURE_FLAGS)
+
+        pawns = pieces[pawn_key]
+        pinned_pawns = 0
+
+        for pinned_square in pins:
+            pinned_pawns |= SQUARE_BITS[pinned_square] & pawns
+
+        # The pawns that are not pinned are pushed and take all at once, their moves coming whole from the move code
+        # table by the squares of their single pushes, double pushes and captures to each side.
+        free_pawns = pawns ^ pinned_pawns
+
+        if color == 'w':
+            single_pushes = free_pawns >> 8 & empty
+            pawn_squares = (single_pushes & quiet_targets,
+                            (single_pushes & WHITE_DOUBLE_PUSH_RANK) >> 8 & quiet_targets,
+                            (free_pawns & NOT_FIRST_FILE) >> 9 & capture_targets,
+                            (free_pawns & NOT_LAST_FILE) >> 7 & capture_targets)
+        else:
+            single_pushes = free_pawns << 8 & empty
+            pawn_squares = (single_pushes & quiet_targets,
+                            (single_pushes & BLACK_DOUBLE_PUSH_RANK) << 8 & quiet_targets,
+                            (free_pawns & NOT_FIRST_FILE) << 7 & capture_targets,
+                            (free_pawns & NOT_LAST_FILE) << 9 & capture_targets)
+
+        codes = _pawn_move_codes[color].get(pawn_squares)
+        moves += codes if codes is not None else _add_pawn_move_codes(color, pawn_squares)
+
+        # The pinned pawns can only move along their pin, so they are moved one by one.
+        while pinned_pawns:
+            starting_bit = pinned_pawns & -pinned_pawns
+            pinned_pawns ^= starting_bit
+            starting_square = starting_bit.bit_length() - 1
+
+            if color == 'w':
+                pushes = starting_bit >> 8 & empty
+
+                if pushes & WHITE_DOUBLE_PUSH_RANK:
+                    pushes |= pushes >> 8 & empty
+            else:
+                pushes = starting_bit << 8 & empty
+
+                if pushes & BLACK_DOUBLE_PUSH_RANK:
+                    pushes |= pushes << 8 & empty
+
+            pawn_squares = ((pushes & quiet_targets) | (PAWN_ATTACKS[color][starting_square] & capture_targets)) & pins[starting_square]
+
+            while pawn_squares:
+                desired_bit = pawn_squares & -pawn_squares
+                pawn_squares ^= desired_bit
+                desired_square = desired_bit.bit_length() - 1
+                move = starting_square | desired_square << 6
+
+                if desired_bit & enemy:
+                    move |= CAPTURE_FLAGS
+                elif abs(desired_square - starting_square) == 16:
+                    move |= DOUBLE_PAWN_PUSH_FLAGS
+
+                if desired_bit & PROMOTION_RANKS:
+                    moves.extend(move | promotion_flags for promotion_flags in PROMOTION_FLAGS)
+                else:
+                    moves.append(move)
+
+        if en_passant is None:
+            return moves
+
+        # The en passant captures are verified by looking for the attacks on the king once both pawns are gone, which
+        # also covers the pinned pawns and the pawns taken on a rank shared with the king.
+        en_passant_square = square_from_position(en_passant)
+        en_passant_bit = SQUARE_BITS[en_passant_square]
+        desired_square = en_passant_square - 8 if color == 'w' else en_passant_square + 8
+
+        for starting_square in squares_of(PAWN_ATTACKS[opponent][desired_square] & pawns):
+            occupied_after = (occupied ^ SQUARE_BITS[starting_square] ^ en_passant_bit) | SQUARE_BITS[desired_square]
+
+            if not self.attackers_to(king_square, opponent, occupied_after) & ~en_passant_bit:
+                moves.append(starting_square | desired_square << 6 | EN_PASSANT_FLAGS)
+
+        return moves
@@ -4,6 +4,8 @@ import time
 import pygame as py
 import constants as const
 import chess_engine as ce
+import ai_player as ai
+import assets
 import chess_ui as ui
 import format_conversions as fc
 
@@ -29,9 +31,10 @@ def get_player_type():
         return 'player'
 
 
-def initialize_game_window():
+def initialize_game_window(asset_manager):
     """Initializes the game window using pygame.
 
+    :param asset_manager: the asset manager loading the icon of the window
     :return: the game window
     """
     py.init()
@@ -40,8 +43,7 @@ def initialize_game_window():
 
     py.display.set_caption("Chess")
 
-    icon = py.image.load('images\\chess_icon.png')
-    py.display.set_icon(icon)
+    py.display.set_icon(asset_manager.get_icon())
 
     return game_screen
 
@@ -49,10 +51,15 @@ def initialize_game_window():
 if __name__ == '__main__':
     """The main loop of the chess game"""
 
-    screen = initialize_game_window()
+    startup_start_time = time.perf_counter()
 
-    piece_images = {piece.name: py.transform.scale(py.image.load('images\\chess_pieces\\' + piece.name + ".png"),
-                                                   (const.SQUARE_DIMENSION, const.SQUARE_DIMENSION)) for piece in fc.Pieces}
+    game_assets = assets.AssetManager()
+
+    screen = initialize_game_window(game_assets)
+
+    board_renderer = ui.BoardRenderer(screen, game_assets.get_piece_images())
+
+    print(assets.get_startup_report(game_assets, time.perf_counter() - startup_start_time))
 
     clock = py.time.Clock()
 
@@ -60,20 +67,35 @@ if __name__ == '__main__':
 
     chess_game = ce.ChessBoard(player_type)
     clicks_manager = ce.ClicksManager(chess_game)
+    ai_player = ai.AiPlayer() if player_type == "ai" else None
 
     running = True
     while running:
-        if player_type == "ai":
-            if (chess_game.ai_color is fc.Colors.White and chess_game.white_turn) or (chess_game.ai_color is fc.Colors.Black and not chess_game.white_turn):
-                chess_game.make_ai_move()
+        ai_turn = ai_player is not None and (chess_game.ai_color is fc.Colors.White) == chess_game.white_turn
+
+        if ai_player is not None and not chess_game.game_ended:
+            if ai_turn:
+                if not ai_player.is_searching():
+                    ai_player.start_search(chess_game)
+
+                search_result = ai_player.poll()
+
+                if search_result is not None and search_result.best_move is not None:
+                    chess_game.game_logic(*search_result.best_move)
+
+                    print(f"info {search_result}")
+            else:
+                ai_player.start_pondering(chess_game)
 
         for event in py.event.get():
             if event.type == py.QUIT:
                 running = False
-            elif event.type == py.MOUSEBUTTONDOWN:
+            elif event.type == py.MOUSEBUTTONDOWN and not ai_turn:
                 clicks_manager.process_click(py.mouse.get_pos())
+            elif event.type in [py.VIDEOEXPOSE, py.WINDOWEXPOSED]:
+                board_renderer.invalidate()
 
-        ui.draw_game(chess_game, piece_images, screen)
+        board_renderer.draw(chess_game)
 
         if chess_game.game_ended:
             time.sleep(1)
@@ -81,3 +103,6 @@ if __name__ == '__main__':
             running = False
 
         clock.tick(const.FRAME_RATE)
+
+    if ai_player is not None:
+        ai_player.stop()
@@ -1,9 +1,49 @@
-import copy
 import random
+from collections import namedtuple
 
 import format_conversions as fc
 import constants as const
 import chess_pieces as cp
+import bitboards as bb
+import move_encoding as me
+import attack_maps as am
+import zobrist
+
+FEN_DEFAULT_FIELDS = ["w", "KQkq", "-", "0", "1"]
+
+
+def get_fen_fields(fen):
+    """Splits a FEN string into its six fields, the missing trailing fields being the ones of a new game. The fields are
+    checked, the piece placement only for having one king of each color, its ranks being read with the board.
+
+    :param fen: a string represented in the FEN notation
+    :return: a list with the piece placement, side to move, castling, en passant, halfmove clock and fullmove number
+    """
+    fen_fields = fen.split()
+
+    if not 1 <= len(fen_fields) <= 6:
+        raise ValueError(f"invalid FEN: {fen}")
+
+    fen_fields += FEN_DEFAULT_FIELDS[len(fen_fields) - 1:]
+
+    if fen_fields[0].count("K") != 1 or fen_fields[0].count("k") != 1:
+        raise ValueError(f"a position must have one king of each color in FEN: {fen}")
+
+    if fen_fields[1] not in ["w", "b"]:
+        raise ValueError(f"invalid side to move in FEN: {fen}")
+
+    # The castle rights are written once each and in the order of "KQkq", so to_fen gives back the same field.
+    if fen_fields[2] != "-" and (not fen_fields[2] or
+                                 "".join(character for character in "KQkq" if character in fen_fields[2]) != fen_fields[2]):
+        raise ValueError(f"invalid castling in FEN: {fen}")
+
+    if fen_fields[3] != "-" and (len(fen_fields[3]) != 2 or fen_fields[3][0] not in fc.FILE_NAMES or fen_fields[3][1] not in "36"):
+        raise ValueError(f"invalid en passant square in FEN: {fen}")
+
+    if not fen_fields[4].isdigit() or not fen_fields[5].isdigit():
+        raise ValueError(f"invalid move clocks in FEN: {fen}")
+
+    return fen_fields
 
 
 def get_board_from_fen(fen):
@@ -14,7 +54,7 @@ def get_board_from_fen(fen):
     """
     board_files = []
 
-    for fen_rank in fen.split("/"):
+    for fen_rank in fen.split()[0].split("/"):
         board_rank = []
 
         for character in fen_rank:
@@ -22,64 +62,215 @@ def get_board_from_fen(fen):
                 board_rank.extend([None] * int(character))
                 continue
 
+            if character not in fc.FenToPiece.__members__:
+                raise ValueError(f"invalid piece in FEN: {character}")
+
             board_rank.append(fc.FenToPiece[character].value)
 
+        if len(board_rank) != const.FILES:
+            raise ValueError(f"invalid rank in FEN: {fen_rank}")
+
         board_files.append(board_rank)
 
+    if len(board_files) != const.RANKS:
+        raise ValueError(f"invalid number of ranks in FEN: {fen}")
+
     return board_files
 
 
+def get_fen_from_board(board):
+    """Converts a chess board into the piece placement field of a FEN string.
+
+    :param board: a chess board with elements as color_PIECE
+    :return: the piece placement in the FEN notation
+    """
+    fen_ranks = []
+
+    for board_rank in board:
+        fen_rank = ""
+        empty_squares = 0
+
+        for piece in board_rank:
+            if piece is None:
+                empty_squares += 1
+                continue
+
+            if empty_squares:
+                fen_rank += str(empty_squares)
+                empty_squares = 0
+
+            fen_rank += fc.FenToPiece(piece).name
+
+        if empty_squares:
+            fen_rank += str(empty_squares)
+
+        fen_ranks.append(fen_rank)
+
+    return "/".join(fen_ranks)
+
+
+# The character of every castle right in the castling field of a FEN string.
+CASTLE_CHARACTERS = [("K", const.WHITE_KING_CASTLE), ("Q", const.WHITE_QUEEN_CASTLE), ("k", const.BLACK_KING_CASTLE),
+                     ("q", const.BLACK_QUEEN_CASTLE)]
+
+# The castle rights lost when a piece moves from or to a square, for the squares the kings and rooks start on.
+CASTLES_LOST = {(7, 4): const.WHITE_KING_CASTLE | const.WHITE_QUEEN_CASTLE, (0, 4): const.BLACK_KING_CASTLE | const.BLACK_QUEEN_CASTLE,
+                (7, 0): const.WHITE_QUEEN_CASTLE, (7, 7): const.WHITE_KING_CASTLE, (0, 0): const.BLACK_QUEEN_CASTLE,
+                (0, 7): const.BLACK_KING_CASTLE}
+
+
+def get_castles_from_fen(fen_castles):
+    """Initializes the castle rights from the castling field of a FEN string.
+
+    :param fen_castles: the castling field, like 'KQkq' or '-'
+    :return: the castle rights
+    """
+    return Castles(sum(right for character, right in CASTLE_CHARACTERS if character in fen_castles))
+
+
+def get_en_passant_from_fen(fen_en_passant):
+    """Initializes the en_passant possibility from the en passant field of a FEN string.
+
+    :param fen_en_passant: the en passant target square, like 'e3' or '-'
+    :return: the position of the pawn that can be taken en passant, or None
+    """
+    if fen_en_passant == "-":
+        return None
+
+    rank_index, file_index = fc.get_position(fen_en_passant)
+
+    return rank_index + 1 if rank_index < const.RANKS // 2 else rank_index - 1, file_index
+
+
+def get_fen_from_castles(castles):
+    """Converts the castle rights into the castling field of a FEN string.
+
+    :param castles: the castle rights
+    :return: the castling field, like 'KQkq' or '-'
+    """
+    return "".join(character for character, right in CASTLE_CHARACTERS if castles.rights & right) or "-"
+
+
+def get_fen_from_en_passant(en_passant):
+    """Converts the en_passant possibility into the en passant field of a FEN string.
+
+    :param en_passant: the position of the pawn that can be taken en passant, or None
+    :return: the en passant target square, like 'e3' or '-'
+    """
+    if en_passant is None:
+        return "-"
+
+    rank_index, file_index = en_passant
+
+    return fc.get_square_name((rank_index + 1 if rank_index >= const.RANKS // 2 else rank_index - 1, file_index))
+
+
+UndoRecord = namedtuple("UndoRecord", ["starting_position", "desired_position", "moved_piece", "captured_piece",
+                                       "captured_position", "castles", "en_passant", "promotion", "hash",
+                                       "halfmove_clock"])
+
+
 class Castles:
-    """Class representing the castle moves for a chess game."""
-    def __init__(self):
-        self.black_king_castle = True
-        self.black_queen_castle = True
-        self.white_king_castle = True
-        self.white_queen_castle = True
+    """Class representing the castle moves for a chess game as a 4-bit mask of the const castle rights."""
+    __slots__ = ["rights"]
+
+    def __init__(self, rights=const.ALL_CASTLES):
+        """Initializes the castle rights.
+
+        :param rights: the mask of the castle moves that can still be made, all of them by default
+        """
+        self.rights = rights
+
+    def get_rights(self):
+        """Gets the castle rights so they can be restored later.
+
+        :return: the mask of the castle moves that can still be made
+        """
+        return self.rights
+
+    def set_rights(self, rights):
+        """Restores castle rights previously returned by get_rights.
+
+        :param rights: the mask of the castle moves that can still be made
+        """
+        self.rights = rights
 
 
 class ChessBoard:
     """Class responsible with the logic and management of a chess game."""
-    def __init__(self, player_type, fen=const.STARTING_FEN):
+    def __init__(self, player_type, fen=const.STARTING_FEN, backend=const.BOARD_BACKEND, attack_maps=const.ATTACK_MAPS):
+        if backend not in const.BOARD_BACKENDS:
+            raise ValueError(f"invalid board backend: {backend}")
+
+        fen_fields = get_fen_fields(fen)
+
         self.board = get_board_from_fen(fen)
-        self.previous_board = None
-        self.white_turn = True
-        self.castles = Castles()
-        self.en_passant = None
+        self.bitboards = bb.Bitboards(self.board) if backend == "bitboard" else None
+        self.attack_maps = am.AttackMaps(self.board) if attack_maps else None
+        self.undo_stack = []
+        self.white_turn = fen_fields[1] == "w"
+        self.castles = get_castles_from_fen(fen_fields[2])
+        self.en_passant = get_en_passant_from_fen(fen_fields[3])
+        self.halfmove_clock = int(fen_fields[4])
+        self.fullmove_number = int(fen_fields[5])
         self.game_ended = None
         self.ai_color = None if player_type == "player" else random.choice(list(fc.Colors))
+        self.hash = zobrist.hash_position(self)
+        self.position_counts = {self.hash: 1}
 
-    def check_for_promotions(self):
-        """Checks if there is any pawns on the last ranks and makes them into queen pieces"""
-        for last_ranks_index in [0, 7]:
-            for file_index in range(const.FILES):
-                if self.board[last_ranks_index][file_index] is None:
-                    continue
+    def to_fen(self):
+        """Converts the current position into a FEN string.
 
-                if self.board[last_ranks_index][file_index].endswith("P"):
-                    self.board[last_ranks_index][file_index] = self.board[last_ranks_index][file_index][:-1] + "Q"
+        :return: the position in the FEN notation, with all six fields
+        """
+        return " ".join([get_fen_from_board(self.board), "w" if self.white_turn else "b", get_fen_from_castles(self.castles),
+                         get_fen_from_en_passant(self.en_passant), str(self.halfmove_clock), str(self.fullmove_number)])
 
-    def update_castles(self, starting_position):
-        """Updates the castle moves that can no longer be made"""
-        if starting_position == (7, 4):
-            self.castles.white_king_castle = False
-            self.castles.white_queen_castle = False
+    def check_for_promotions(self, position, promotion="Q"):
+        """Checks if the piece on a position is a pawn on the last ranks and promotes it.
 
-        if starting_position == (0, 4):
-            self.castles.black_king_castle = False
-            self.castles.black_queen_castle = False
+        :param position: a tuple of the coordinates of the piece that was moved
+        :param promotion: the piece type the pawn is promoted to
+        :return: the piece type the pawn was promoted to, or None if there was no promotion
+        """
+        piece = self.board[position[0]][position[1]]
+
+        if position[0] not in [0, 7] or not piece.endswith("P"):
+            return None
 
-        if starting_position == (7, 0):
-            self.castles.white_queen_castle = False
+        self.set_piece(position, piece[:-1] + promotion)
 
-        if starting_position == (7, 7):
-            self.castles.white_king_castle = False
+        return promotion
 
-        if starting_position == (0, 0):
-            self.castles.black_queen_castle = False
+    def set_piece(self, position, piece):
+        """Places a piece on the board, keeping the hash, the bitboards of the bitboard backend and the attack maps in sync.
 
-        if starting_position == (0, 7):
-            self.castles.black_king_castle = False
+        :param position: a tuple of the coordinates of the square
+        :param piece: the piece notated as color_PIECE, or None to empty the square
+        """
+        square = bb.square_from_position(position)
+        current_piece = self.board[position[0]][position[1]]
+
+        if current_piece is not None:
+            self.hash ^= zobrist.PIECE_KEYS[current_piece][square]
+
+            if self.bitboards is not None:
+                self.bitboards.remove_piece(square, current_piece)
+
+        if piece is not None:
+            self.hash ^= zobrist.PIECE_KEYS[piece][square]
+
+            if self.bitboards is not None:
+                self.bitboards.put_piece(square, piece)
+
+        if self.attack_maps is not None:
+            self.attack_maps.set_piece(self.board, position, piece)
+        else:
+            self.board[position[0]][position[1]] = piece
+
+    def update_castles(self, starting_position):
+        """Updates the castle moves that can no longer be made"""
+        self.castles.rights &= ~CASTLES_LOST.get(starting_position, 0)
 
     def update_en_passant(self, starting_position, desired_position):
         """Updates the possibility of an en_passant move for the next turn if a pawn is moved 2 ranks up"""
@@ -102,10 +293,6 @@ class ChessBoard:
         :param verify_checkmate: if it's looking for checkmate or stalemate
         :return: if the current player is in checkmate/stalemate or not
         """
-        current_player_color = fc.Colors.White if self.white_turn else fc.Colors.Black
-
-        self.previous_board = copy.deepcopy(self.board)
-
         if verify_checkmate:
             if not self.king_in_check():
                 return False
@@ -113,29 +300,62 @@ class ChessBoard:
             if self.king_in_check():
                 return False
 
-        for rank_index in range(const.RANKS):
-            for file_index in range(const.FILES):
-                if self.board[rank_index][file_index] is None:
+        return not self.get_legal_moves()
+
+    def is_repetition(self, count=const.REPETITION_DRAW_COUNT):
+        """Checks if the current position was reached a number of times. The positions before the last capture or pawn
+        move can never come back, so counting the hashes of the whole game only counts the reversible moves.
+
+        :param count: the number of times the position must have been reached, the current one included
+        :return: if the position was reached at least that many times
+        """
+        return self.position_counts.get(self.hash, 0) >= count
+
+    def is_fifty_move_draw(self):
+        """Checks if fifty moves of each player were made without a capture or a pawn move.
+
+        :return: if the game can be declared a draw by the fifty-move rule
+        """
+        return self.halfmove_clock >= const.FIFTY_MOVE_RULE_PLIES
+
+    def has_insufficient_material(self):
+        """Checks if neither player has the pieces to checkmate: kings alone, a single minor piece, or only bishops that
+        all stand on squares of the same color.
+
+        :return: if no checkmate is possible
+        """
+        minor_pieces = []
+
+        for rank_index, rank in enumerate(self.board):
+            for file_index, piece in enumerate(rank):
+                if piece is None or piece[2] == "K":
                     continue
 
-                current_piece_color = fc.Colors.White if self.board[rank_index][file_index][0] == 'w' else fc.Colors.Black
+                if piece[2] in "PRQ":
+                    return False
+
+                minor_pieces.append((piece[2], (rank_index + file_index) % 2))
 
-                if current_piece_color is current_player_color:
-                    starting_position = rank_index, file_index
+        if len(minor_pieces) <= 1:
+            return True
 
-                    current_piece_possible_moves = self.get_possible_moves(starting_position, verify_checkmate)
+        return all(piece_type == "B" for piece_type, _ in minor_pieces) and len({color for _, color in minor_pieces}) == 1
 
-                    for current_piece_possible_move in current_piece_possible_moves:
-                        self.simulate_move(starting_position, current_piece_possible_move)
+    def get_draw_reason(self):
+        """Gets the rule the game is drawn by, other than stalemate.
 
-                        if not self.king_in_check():
-                            self.board = copy.deepcopy(self.previous_board)
+        :return: the reason of the draw, or None if the game is not drawn
+        """
+        if self.has_insufficient_material():
+            return "Insufficient material"
 
-                            return False
+        if self.is_fifty_move_draw():
+            return "Fifty-move rule"
 
-                        self.board = copy.deepcopy(self.previous_board)
+        if self.is_repetition():
+            return "Threefold repetition"
 
-        return True
+        return None
 
     def get_king_position(self, color):
         """Gets the position of the king.
@@ -143,89 +363,300 @@ class ChessBoard:
         :param color: the color of the king to look for
         :return: a tuple representing the coordinates of the king on the board
         """
+        if self.attack_maps is not None:
+            return self.attack_maps.king_positions[color.value]
+
         king_notation = "w_K" if color is fc.Colors.White else "b_K"
 
         for rank_index, rank in enumerate(self.board):
             for file_index, file in enumerate(rank):
-                if file is king_notation:
+                if file == king_notation:
                     return rank_index, file_index
 
-    def king_in_check(self):
+    def king_in_check(self, color=None):
         """Checks rather or not the king is being in check.
 
+        :param color: the color of the king to verify, by default the color of the current player
         :return: if the king is checked or not
         """
+        current_player_color = color or (fc.Colors.White if self.white_turn else fc.Colors.Black)
+
+        if self.bitboards is not None:
+            return self.bitboards.king_in_check(current_player_color.value)
+
+        if self.attack_maps is not None:
+            return self.attack_maps.king_in_check(current_player_color.value)
+
+        opponent_color = fc.Colors.Black if current_player_color is fc.Colors.White else fc.Colors.White
+
+        return self.is_square_attacked(self.get_king_position(current_player_color), opponent_color)
+
+    def is_square_attacked(self, position, by_color, ignored_position=None):
+        """Checks if a square is attacked by scanning outward from it for the pieces that could reach it, or with a single
+        lookup when the attack maps are kept.
+
+        :param position: a tuple of the coordinates of the square
+        :param by_color: the color of the attacking pieces
+        :param ignored_position: a tuple of the coordinates of a piece to see through, like the king that is moving
+        :return: if the square is attacked or not
+        """
+        attacker_color = by_color.value
+
+        if self.attack_maps is not None and ignored_position is None:
+            return self.attack_maps.is_square_attacked(position, attacker_color)
+
+        pawn_rank_change = 1 if by_color is fc.Colors.White else -1
+
+        for direction in cp.QUEEN_DIRECTIONS:
+            sliders = cp.SLIDERS[direction]
+
+            for distance, (rank_index, file_index) in enumerate(cp.RAYS[direction][position[0]][position[1]], 1):
+                piece = self.board[rank_index][file_index]
+
+                if piece is not None and (rank_index, file_index) != ignored_position:
+                    if piece[0] == attacker_color:
+                        if piece[2] in sliders or (distance == 1 and piece[2] == "K"):
+                            return True
+
+                        if distance == 1 and piece[2] == "P" and direction[0] == pawn_rank_change and direction[1] != 0:
+                            return True
+
+                    break
+
+        for rank_index, file_index in cp.KNIGHT_TARGETS[position[0]][position[1]]:
+            if self.board[rank_index][file_index] == attacker_color + "_N":
+                return True
+
+        return False
+
+    def get_checks_and_pins(self, king_position):
+        """Finds the pieces checking the king and the pieces pinned to it.
+
+        :param king_position: a tuple of the coordinates of the king
+        :return: a tuple (checks, pins) where checks has, for every checking piece, the set of squares that stop its
+        check and pins maps the position of every pinned piece to the set of squares it can still move to
+        """
+        checks = []
+        pins = {}
+
+        king_color = self.board[king_position[0]][king_position[1]][0]
+
+        for direction in cp.QUEEN_DIRECTIONS:
+            sliders = cp.SLIDERS[direction]
+            ray = set()
+            pinned_position = None
+
+            for rank_index, file_index in cp.RAYS[direction][king_position[0]][king_position[1]]:
+                piece = self.board[rank_index][file_index]
+                ray.add((rank_index, file_index))
+
+                if piece is not None:
+                    if piece[0] == king_color:
+                        if pinned_position is not None:
+                            break
+
+                        pinned_position = rank_index, file_index
+                    else:
+                        if piece[2] in sliders:
+                            if pinned_position is None:
+                                checks.append(ray)
+                            else:
+                                pins[pinned_position] = ray
+
+                        break
+
+        opponent_color = "b" if king_color == "w" else "w"
+
+        for rank_index, file_index in cp.KNIGHT_TARGETS[king_position[0]][king_position[1]]:
+            if self.board[rank_index][file_index] == opponent_color + "_N":
+                checks.append({(rank_index, file_index)})
+
+        for rank_index, file_index in cp.PAWN_ATTACKS[king_color][king_position[0]][king_position[1]]:
+            if self.board[rank_index][file_index] == opponent_color + "_P":
+                checks.append({(rank_index, file_index)})
+
+        return checks, pins
+
+    def get_piece_legal_moves(self, captures_only=False):
+        """Gets the legal moves of the current player on the 2D board, computing the checking and pinned pieces once.
+
+        :param captures_only: if only the captures, en_passant included, should be generated
+        :return: a list of tuples (starting_position, desired_position)
+        """
         current_player_color = fc.Colors.White if self.white_turn else fc.Colors.Black
+        opponent_color = fc.Colors.Black if self.white_turn else fc.Colors.White
 
         king_position = self.get_king_position(current_player_color)
+        checks, pins = self.get_checks_and_pins(king_position)
+
+        legal_moves = []
 
-        attacking_moves = set()
+        for desired_position in self.get_possible_moves(king_position, bool(checks) or captures_only):
+            if captures_only and self.board[desired_position[0]][desired_position[1]] is None:
+                continue
+
+            if abs(desired_position[1] - king_position[1]) == 2:
+                passed_position = (king_position[0], (king_position[1] + desired_position[1]) // 2)
+
+                if self.is_square_attacked(passed_position, opponent_color):
+                    continue
+
+            if not self.is_square_attacked(desired_position, opponent_color, king_position):
+                legal_moves.append((king_position, desired_position))
+
+        if len(checks) > 1:
+            return legal_moves
 
         for rank_index in range(const.RANKS):
             for file_index in range(const.FILES):
-                if self.board[rank_index][file_index] is None:
+                piece = self.board[rank_index][file_index]
+
+                if piece is None or piece[0] != current_player_color.value or piece[2] == "K":
                     continue
 
-                current_piece_color = fc.Colors.White if self.board[rank_index][file_index][0] == 'w' else fc.Colors.Black
+                starting_position = rank_index, file_index
 
-                if current_piece_color is not current_player_color:
-                    attacking_moves |= set(self.get_possible_moves((rank_index, file_index), True))
+                for desired_position in self.get_possible_moves(starting_position, True):
+                    is_en_passant = piece[2] == "P" and desired_position[1] != file_index and self.board[desired_position[0]][desired_position[1]] is None
 
-        return king_position in attacking_moves
+                    if captures_only and self.board[desired_position[0]][desired_position[1]] is None and not is_en_passant:
+                        continue
 
-    def choose_random_piece(self, color):
-        """Chooses a random piece from all available pieces on the table of a color.
+                    if is_en_passant:
+                        self.make_move(starting_position, desired_position)
 
-        :param color: the color of pieces to look for
-        :return: a tuple representing the coordinates of the piece randomly choose
-        """
-        possible_pieces = []
+                        king_is_safe = not self.is_square_attacked(king_position, opponent_color)
 
-        for rank_index in range(const.RANKS):
-            for file_index in range(const.FILES):
-                if self.board[rank_index][file_index] is None:
-                    continue
+                        self.unmake_move()
 
-                current_piece_color = fc.Colors.White if self.board[rank_index][file_index][0] == 'w' else fc.Colors.Black
+                        if king_is_safe:
+                            legal_moves.append((starting_position, desired_position))
 
-                if current_piece_color is color:
-                    possible_pieces.append((rank_index, file_index))
+                        continue
 
-        return random.choice(possible_pieces)
+                    if checks and desired_position not in checks[0]:
+                        continue
 
-    def make_ai_move(self):
-        """The AI that makes random correct moves."""
-        while (self.ai_color is fc.Colors.White and self.white_turn) or (self.ai_color is fc.Colors.Black and not self.white_turn):
-            starting_position = self.choose_random_piece(self.ai_color)
+                    if starting_position in pins and desired_position not in pins[starting_position]:
+                        continue
 
-            possible_moves = self.get_possible_moves(starting_position, self.king_in_check())
+                    legal_moves.append((starting_position, desired_position))
 
-            if not possible_moves:
-                continue
+        return legal_moves
 
-            random_desired_move = random.choice(possible_moves)
+    def get_legal_moves(self, captures_only=False):
+        """Gets every legal move of the current player.
 
-            self.game_logic(starting_position, random_desired_move)
+        :param captures_only: if only the captures, en_passant included, should be generated
+        :return: a list of tuples (starting_position, desired_position, promotion) with promotion set only for pawns
+        reaching the last ranks, once for every piece type they can promote to
+        """
+        if self.bitboards is not None:
+            color = fc.Colors.White.value if self.white_turn else fc.Colors.Black.value
+
+            return me.decode_moves(self.bitboards.get_legal_moves(color, self.en_passant, self.castles, captures_only))
+
+        piece_moves = self.get_piece_legal_moves(captures_only)
+
+        legal_moves = []
+
+        for starting_position, desired_position in piece_moves:
+            if desired_position[0] in [0, 7] and self.board[starting_position[0]][starting_position[1]][2] == "P":
+                legal_moves.extend((starting_position, desired_position, promotion) for promotion in const.PROMOTION_PIECES)
+            else:
+                legal_moves.append((starting_position, desired_position, None))
+
+        return legal_moves
 
-    def simulate_move(self, starting_position, desired_position):
-        """Makes a move on the board. It also checks if the move is en_passant or castle, so it can be made accordingly
+    def make_move(self, starting_position, desired_position, promotion="Q"):
+        """Makes a move on the board without verifying it and pushes what is needed to take it back on the undo stack.
+        It also checks if the move is en_passant, castle or a promotion, so it can be made accordingly.
 
         :param starting_position: a tuple of the coordinates that the piece is on
         :param desired_position: a tuple of the coordinates to the position that the piece will end up on
+        :param promotion: the piece type a pawn reaching the last rank is promoted to
         """
-        if isinstance(fc.Pieces[self.board[starting_position[0]][starting_position[1]]].value, cp.Pawn):
-            if self.board[desired_position[0]][desired_position[1]] is None and abs(
-                    starting_position[1] - desired_position[1]) == 1:
-                self.board[starting_position[0]][desired_position[1]] = None
+        moved_piece = self.board[starting_position[0]][starting_position[1]]
+        captured_position = desired_position
+
+        if moved_piece.endswith("P") and starting_position[1] != desired_position[1]:
+            if self.board[desired_position[0]][desired_position[1]] is None:
+                captured_position = (starting_position[0], desired_position[1])
+
+        captured_piece = self.board[captured_position[0]][captured_position[1]]
+
+        castles = self.castles.get_rights()
+        en_passant = self.en_passant
+        previous_hash = self.hash
+
+        self.hash ^= zobrist.hash_castles(castles) ^ zobrist.hash_en_passant(en_passant, self.board) ^ zobrist.BLACK_TURN_KEY
+
+        if captured_piece is not None:
+            self.set_piece(captured_position, None)
+
+        self.set_piece(desired_position, moved_piece)
+        self.set_piece(starting_position, None)
+
+        if moved_piece.endswith("K") and abs(starting_position[1] - desired_position[1]) == 2:
+            file_changes = (0, desired_position[1] + 1) if desired_position[1] < 4 else (7, desired_position[1] - 1)
+
+            self.set_piece((desired_position[0], file_changes[1]), self.board[desired_position[0]][file_changes[0]])
+            self.set_piece((desired_position[0], file_changes[0]), None)
+
+        promoted = self.check_for_promotions(desired_position, promotion) if moved_piece.endswith("P") else None
+
+        self.update_castles(starting_position)
+        self.update_castles(desired_position)
+
+        self.update_en_passant(starting_position, desired_position)
+
+        self.hash ^= zobrist.hash_castles(self.castles.get_rights()) ^ zobrist.hash_en_passant(self.en_passant, self.board)
+
+        halfmove_clock = self.halfmove_clock
+        self.halfmove_clock = 0 if moved_piece.endswith("P") or captured_piece is not None else halfmove_clock + 1
+
+        if not self.white_turn:
+            self.fullmove_number += 1
+
+        self.white_turn = not self.white_turn
 
-        if isinstance(fc.Pieces[self.board[starting_position[0]][starting_position[1]]].value, cp.King):
-            if abs(starting_position[1] - desired_position[1]) == 2:
-                file_changes = (0, desired_position[1] + 1) if desired_position[1] < 4 else (7, desired_position[1] - 1)
+        self.undo_stack.append(UndoRecord(starting_position, desired_position, moved_piece, captured_piece,
+                                          captured_position, castles, en_passant, promoted, previous_hash, halfmove_clock))
 
-                self.simulate_move((starting_position[0], file_changes[0]), (desired_position[0], file_changes[1]))
+        self.position_counts[self.hash] = self.position_counts.get(self.hash, 0) + 1
 
-        self.board[desired_position[0]][desired_position[1]] = self.board[starting_position[0]][starting_position[1]]
-        self.board[starting_position[0]][starting_position[1]] = None
+    def unmake_move(self):
+        """Takes back the last move made with make_move, restoring the position from the undo stack."""
+        record = self.undo_stack.pop()
+
+        if self.position_counts[self.hash] == 1:
+            del self.position_counts[self.hash]
+        else:
+            self.position_counts[self.hash] -= 1
+
+        starting_position, desired_position = record.starting_position, record.desired_position
+
+        self.white_turn = not self.white_turn
+
+        if not self.white_turn:
+            self.fullmove_number -= 1
+
+        self.set_piece(desired_position, None)
+        self.set_piece(starting_position, record.moved_piece)
+
+        if record.moved_piece.endswith("K") and abs(starting_position[1] - desired_position[1]) == 2:
+            file_changes = (0, desired_position[1] + 1) if desired_position[1] < 4 else (7, desired_position[1] - 1)
+
+            self.set_piece((desired_position[0], file_changes[0]), self.board[desired_position[0]][file_changes[1]])
+            self.set_piece((desired_position[0], file_changes[1]), None)
+
+        if record.captured_piece is not None:
+            self.set_piece(record.captured_position, record.captured_piece)
+
+        self.castles.set_rights(record.castles)
+        self.en_passant = record.en_passant
+        self.hash = record.hash
+        self.halfmove_clock = record.halfmove_clock
 
     def get_possible_moves(self, position, king_is_checked):
         """Gets the possible moves of a certain piece.
@@ -236,46 +667,32 @@ class ChessBoard:
         """
         piece_type = self.board[position[0]][position[1]]
 
-        if isinstance(fc.Pieces[piece_type].value, cp.Pawn):
-            fc.Pieces[piece_type].value.en_passant = self.en_passant
-
-        if isinstance(fc.Pieces[piece_type].value, cp.King):
-            if not king_is_checked:
-                fc.Pieces[piece_type].value.castles = self.castles
+        castles = None if king_is_checked else self.castles
 
-        return fc.Pieces[piece_type].value.get_valid_moves(self.board, position)
+        if self.bitboards is not None:
+            moves = self.bitboards.get_moves(bb.square_from_position(position), piece_type, self.en_passant, castles)
 
-    def game_logic(self, starting_position, desired_position):
-        """The logic of the chess engine"""
-        self.previous_board = copy.deepcopy(self.board)
-
-        possible_moves = self.get_possible_moves(starting_position, self.king_in_check())
-
-        if desired_position not in possible_moves:
-            return
+            return [bb.POSITIONS[square] for square in bb.squares_of(moves)]
 
-        self.simulate_move(starting_position, desired_position)
+        return fc.Pieces[piece_type].value.get_valid_moves(self.board, position, self.en_passant, castles)
 
-        if self.king_in_check():
-            self.board = copy.deepcopy(self.previous_board)
+    def game_logic(self, starting_position, desired_position, promotion="Q"):
+        """The logic of the chess engine"""
+        if not any(move[0] == starting_position and move[1] == desired_position for move in self.get_legal_moves()):
             return
 
-        self.check_for_promotions()
-
-        self.update_castles(starting_position)
-
-        self.update_en_passant(starting_position, desired_position)
-
-        self.white_turn = not self.white_turn
+        self.make_move(starting_position, desired_position, promotion)
 
         if self.verify_checkmate_stalemate():
             self.game_ended = "Checkmate"
             return
 
         if self.verify_checkmate_stalemate(verify_checkmate=False):
-            self.game_ended = "Draw"
+            self.game_ended = "Stalemate"
             return
 
+        self.game_ended = self.get_draw_reason()
+
 
 class ClicksManager:
     """Class responsible with managing the clicks that the players are making"""
@@ -1,67 +1,108 @@
 from abc import ABC, abstractmethod
 import format_conversions as fc
+import constants as const
 
+ROOK_DIRECTIONS = [(x, 0) for x in [-1, 1]] + [(0, x) for x in [-1, 1]]
+BISHOP_DIRECTIONS = [(x, y) for x in [-1, 1] for y in [-1, 1]]
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+KNIGHT_DIRECTIONS = [(x, y) for x in [-2, 2] for y in [-1, 1]] + [(y, x) for x in [-2, 2] for y in [-1, 1]]
 
-def directional_moves(starting_position, depth, directions, board):
-    """Generates the possible moves a piece can make on the board.
+# The pieces sliding along every direction, used to find the attackers of a square.
+SLIDERS = {direction: "RQ" if direction in ROOK_DIRECTIONS else "BQ" for direction in QUEEN_DIRECTIONS}
 
-    :param starting_position: a tuple representing the coordinates of the piece on the board
-    :param depth: the amount of spaces a piece can move
-    :param directions: a list of tuples representing the directions a piece can make
-    :param board: the chess board as a 2D list
-    :return: a list of tuples representing the coordinates a piece can move on the board
+
+def get_ray(position, direction):
+    """Gets the squares from a position to the edge of the board in a direction.
+
+    :param position: a tuple representing the coordinates of the starting square, which is not part of the ray
+    :param direction: a tuple representing the direction of the ray
+    :return: a tuple of the coordinates of the squares, ordered from the closest one
     """
-    moves = []
+    ray = []
+    rank_index, file_index = position[0] + direction[0], position[1] + direction[1]
 
-    for direction in directions:
-        for iterations in range(1, depth + 1):
-            possible_move = tuple(x + y * iterations for x, y in zip(starting_position, direction))
+    while 0 <= rank_index < const.RANKS and 0 <= file_index < const.FILES:
+        ray.append((rank_index, file_index))
+        rank_index, file_index = rank_index + direction[0], file_index + direction[1]
 
-            if not all(0 <= x <= 7 for x in possible_move):
-                break
+    return tuple(ray)
 
-            if board[possible_move[0]][possible_move[1]] is not None:
-                if fc.Pieces[board[starting_position[0]][starting_position[1]]].value.color != fc.Pieces[board[possible_move[0]][possible_move[1]]].value.color:
-                    moves.append(possible_move)
 
-                break
+def get_targets(position, directions):
+    """Gets the squares one step away from a position in some directions, leaving out the ones off the board.
 
-            moves.append(possible_move)
+    :param position: a tuple representing the coordinates of the starting square
+    :param directions: a list of tuples representing the steps
+    :return: a tuple of the coordinates of the squares
+    """
+    return tuple(ray[0] for ray in (get_ray(position, direction) for direction in directions) if ray)
 
-    return moves
 
+def build_square_table(get_value):
+    """Builds a table with a value for every square, indexed like the board.
 
-def pawn_directional_moves(starting_position, directions, board, attacking=False):
-    """Generate the moves a pawn can make on the board.
+    :param get_value: a function computing the value of a square from its coordinates
+    :return: a 2D list where table[rank_index][file_index] is the value of the square
+    """
+    return [[get_value((rank_index, file_index)) for file_index in range(const.FILES)] for rank_index in range(const.RANKS)]
+
+
+# Tables built once at import, indexed like the board by the coordinates of the starting square.
+RAYS = {direction: build_square_table(lambda position: get_ray(position, direction)) for direction in QUEEN_DIRECTIONS}
+ROOK_RAYS = build_square_table(lambda position: [RAYS[direction][position[0]][position[1]] for direction in ROOK_DIRECTIONS])
+BISHOP_RAYS = build_square_table(lambda position: [RAYS[direction][position[0]][position[1]] for direction in BISHOP_DIRECTIONS])
+QUEEN_RAYS = build_square_table(lambda position: ROOK_RAYS[position[0]][position[1]] + BISHOP_RAYS[position[0]][position[1]])
+KNIGHT_TARGETS = build_square_table(lambda position: get_targets(position, KNIGHT_DIRECTIONS))
+KING_TARGETS = build_square_table(lambda position: get_targets(position, QUEEN_DIRECTIONS))
+
+# The pawn tables are indexed by the color first, the pushes being ordered so the double push comes last.
+PAWN_PUSHES = {
+    "w": build_square_table(lambda position: get_ray(position, (-1, 0))[:2 if position[0] == 6 else 1]),
+    "b": build_square_table(lambda position: get_ray(position, (1, 0))[:2 if position[0] == 1 else 1]),
+}
+PAWN_ATTACKS = {
+    "w": build_square_table(lambda position: get_targets(position, [(-1, -1), (-1, 1)])),
+    "b": build_square_table(lambda position: get_targets(position, [(1, -1), (1, 1)])),
+}
 
-    :param starting_position: a tuple representing the coordinates of the pawn on the board
-    :param directions: a list of tuples representing the directions the pawn can make
+
+def directional_moves(starting_position, rays, board):
+    """Generates the possible moves a sliding piece can make on the board.
+
+    :param starting_position: a tuple representing the coordinates of the piece on the board
+    :param rays: a list of rays from the square of the piece, like ROOK_RAYS[rank_index][file_index]
     :param board: the chess board as a 2D list
-    :param attacking: rather or not we are the generating the attacking moves the pawn can make or the up moves
     :return: a list of tuples representing the coordinates a piece can move on the board
     """
     moves = []
+    color = board[starting_position[0]][starting_position[1]][0]
 
-    for direction in directions:
-        possible_move = tuple(x + y for x, y in zip(starting_position, direction))
+    for ray in rays:
+        for possible_move in ray:
+            piece = board[possible_move[0]][possible_move[1]]
 
-        if not all(0 <= x <= 7 for x in possible_move):
-            continue
+            if piece is not None:
+                if piece[0] != color:
+                    moves.append(possible_move)
 
-        if attacking is False:
-            if board[possible_move[0]][possible_move[1]] is not None:
                 break
 
-        if attacking is True:
-            if board[possible_move[0]][possible_move[1]] is None:
-                continue
+            moves.append(possible_move)
 
-            if fc.Pieces[board[starting_position[0]][starting_position[1]]].value.color == fc.Pieces[board[possible_move[0]][possible_move[1]]].value.color:
-                continue
+    return moves
 
-        moves.append(possible_move)
 
-    return moves
+def step_moves(starting_position, targets, board):
+    """Generates the possible moves a piece moving a single step can make on the board.
+
+    :param starting_position: a tuple representing the coordinates of the piece on the board
+    :param targets: the squares the piece reaches, like KNIGHT_TARGETS[rank_index][file_index]
+    :param board: the chess board as a 2D list
+    :return: a list of tuples representing the coordinates a piece can move on the board
+    """
+    color = board[starting_position[0]][starting_position[1]][0]
+
+    return [target for target in targets if board[target[0]][target[1]] is None or board[target[0]][target[1]][0] != color]
 
 
 def check_blank_spaces(board, rank, files):
@@ -90,11 +131,14 @@ class ChessPiece(ABC):
         self.color = color
 
     @abstractmethod
-    def get_valid_moves(self, board, position):
-        """Abstract method for getting the available moves of a piece
+    def get_valid_moves(self, board, position, en_passant=None, castles=None):
+        """Abstract method for getting the available moves of a piece. The moves only depend on the arguments,
+        so the same piece objects can be used by any number of boards at the same time.
 
         :param board: the chess board
         :param position: a tuple representing the coordinates of the piece on the board
+        :param en_passant: the position of the pawn that can be captured en_passant, or None
+        :param castles: the castle rights of the position, or None if castling is not possible
         :return: a list of tuples that contains the moves that the piece can make
         """
         pass
@@ -102,14 +146,6 @@ class ChessPiece(ABC):
 
 class Pawn(ChessPiece):
     """Class representing a pawn"""
-    def __init__(self, color):
-        """Initializes a pawn piece.
-
-        :param color: the color of the pawn
-        """
-        self.en_passant = None
-        super().__init__(color)
-
     def get_up_moves(self, board, position):
         """Get any moves in the relative up direction based on the color that the pawn can make.
 
@@ -117,20 +153,15 @@ class Pawn(ChessPiece):
         :param position: a tuple representing the coordinates of the pawn on the board
         :return: a list of tuples that contains the castle moves that the pawn can make
         """
-        directions = []
-
-        if self.color is fc.Colors.Black:
-            directions.append((1, 0))
+        moves = []
 
-            if position[0] == 1:
-                directions.append((2, 0))
-        else:
-            directions.append((-1, 0))
+        for possible_move in PAWN_PUSHES[self.color.value][position[0]][position[1]]:
+            if board[possible_move[0]][possible_move[1]] is not None:
+                break
 
-            if position[0] == 6:
-                directions.append((-2, 0))
+            moves.append(possible_move)
 
-        return pawn_directional_moves(position, directions, board)
+        return moves
 
     def get_attacking_moves(self, board, position):
         """Get any attacking moves that the pawn can make.
@@ -139,144 +170,135 @@ class Pawn(ChessPiece):
         :param position: a tuple representing the coordinates of the pawn on the board
         :return: a list of tuples that contains the attacking moves that the pawn can make
         """
-        directions = [(1, x) for x in [1, -1]] if self.color is fc.Colors.Black else [(-1, x) for x in [1, -1]]
-
-        return pawn_directional_moves(position, directions, board, True)
+        return [target for target in PAWN_ATTACKS[self.color.value][position[0]][position[1]]
+                if board[target[0]][target[1]] is not None and board[target[0]][target[1]][0] != self.color.value]
 
-    def get_en_passant_moves(self, position):
+    def get_en_passant_moves(self, position, en_passant):
         """Get the en_passant moves that the pawn can make.
 
         :param position: a tuple representing the coordinates of the pawn on the board
+        :param en_passant: the position of the pawn that can be captured en_passant, or None
         :return: a list of tuples that contains the en_passant moves that the pawn can make
         """
         en_passant_move = []
 
-        if self.en_passant is None:
+        if en_passant is None:
             return en_passant_move
 
-        if any(x == self.en_passant for x in [(position[0], position[1] + x) for x in [-1, 1]]):
-            en_passant_move = [(self.en_passant[0] - 1 if self.color is fc.Colors.White else self.en_passant[0] + 1, self.en_passant[1])]
+        if any(x == en_passant for x in [(position[0], position[1] + x) for x in [-1, 1]]):
+            en_passant_move = [(en_passant[0] - 1 if self.color is fc.Colors.White else en_passant[0] + 1, en_passant[1])]
 
         return en_passant_move
 
-    def get_valid_moves(self, board, position):
+    def get_valid_moves(self, board, position, en_passant=None, castles=None):
         """Gets the available moves of a pawn piece.
 
         :param board: the chess board
         :param position: a tuple representing the coordinates of the pawn on the board
+        :param en_passant: the position of the pawn that can be captured en_passant, or None
+        :param castles: not used by pawns
         :return: a list of tuples that contains the moves that the pawn can make
         """
-        return self.get_up_moves(board, position) + self.get_attacking_moves(board, position) + self.get_en_passant_moves(position)
+        return self.get_up_moves(board, position) + self.get_attacking_moves(board, position) + self.get_en_passant_moves(position, en_passant)
 
 
 class Bishop(ChessPiece):
     """Class representing a bishop"""
-    def get_valid_moves(self, board, position):
+    def get_valid_moves(self, board, position, en_passant=None, castles=None):
         """Gets the available moves of a bishop piece.
 
         :param board: the chess board
         :param position: a tuple representing the coordinates of the bishop on the board
+        :param en_passant: not used by bishops
+        :param castles: not used by bishops
         :return: a list of tuples that contains the moves that the bishop can make
         """
-        bishop_directions = [(x, y) for x in [-1, 1] for y in [-1, 1]]
-
-        return directional_moves(position, 7, bishop_directions, board)
+        return directional_moves(position, BISHOP_RAYS[position[0]][position[1]], board)
 
 
 class Knight(ChessPiece):
     """Class representing a knight"""
-    def get_valid_moves(self, board, position):
+    def get_valid_moves(self, board, position, en_passant=None, castles=None):
         """Gets the available moves of a knight piece.
 
         :param board: the chess board
         :param position: a tuple representing the coordinates of the knight on the board
+        :param en_passant: not used by knights
+        :param castles: not used by knights
         :return: a list of tuples that contains the moves that the knight can make
         """
-        knight_directions = [(x, y) for x in [-2, 2] for y in [-1, 1]] + [(y, x) for x in [-2, 2] for y in [-1, 1]]
-
-        return directional_moves(position, 1, knight_directions, board)
+        return step_moves(position, KNIGHT_TARGETS[position[0]][position[1]], board)
 
 
 class Rook(ChessPiece):
     """Class representing a rook"""
-    def get_valid_moves(self, board, position):
+    def get_valid_moves(self, board, position, en_passant=None, castles=None):
         """Gets the available moves of a rook piece.
 
         :param board: the chess board
         :param position: a tuple representing the coordinates of the rook on the board
+        :param en_passant: not used by rooks
+        :param castles: not used by rooks
         :return: a list of tuples that contains the moves that the rook can make
         """
-        rook_directions = [(x, 0) for x in [-1, 1]] + [(0, x) for x in [-1, 1]]
-
-        return directional_moves(position, 7, rook_directions, board)
+        return directional_moves(position, ROOK_RAYS[position[0]][position[1]], board)
 
 
 class Queen(ChessPiece):
     """Class representing a queen"""
-    def get_valid_moves(self, board, position):
+    def get_valid_moves(self, board, position, en_passant=None, castles=None):
         """Gets the available moves of a queen piece.
 
         :param board: the chess board
         :param position: a tuple representing the coordinates of the queen on the board
+        :param en_passant: not used by queens
+        :param castles: not used by queens
         :return: a list of tuples that contains the moves that the queen can make
         """
-        queen_directions = [(x, 0) for x in [-1, 1]] + [(0, x) for x in [-1, 1]]
-        queen_directions += [(x, y) for x in [-1, 1] for y in [-1, 1]]
-
-        return directional_moves(position, 7, queen_directions, board)
+        return directional_moves(position, QUEEN_RAYS[position[0]][position[1]], board)
 
 
 class King(ChessPiece):
     """Class representing a king"""
-    def __init__(self, color):
-        """Initializes a king piece.
-
-        :param color: the color of the king
-        """
-        self.castles = None
-        super().__init__(color)
-
-    def castle_moves(self, board, position):
+    def castle_moves(self, board, position, castles):
         """Get any castle moves that the king can make.
 
         :param board: the chess board
         :param position: a tuple representing the coordinates of the king on the board
+        :param castles: the castle rights of the position, or None if castling is not possible
         :return: a list of tuples that contains the castle moves that the king can make
         """
         castle_moves = []
 
-        if self.castles is None:
+        if castles is None:
             return castle_moves
 
         if self.color is fc.Colors.White:
-            if self.castles.white_king_castle:
+            if castles.rights & const.WHITE_KING_CASTLE:
                 if check_blank_spaces(board, position[0], [5, 6]):
                     castle_moves.append((position[0], position[1] + 2))
 
-            if self.castles.white_queen_castle:
+            if castles.rights & const.WHITE_QUEEN_CASTLE:
                 if check_blank_spaces(board, position[0], [1, 2, 3]):
                     castle_moves.append((position[0], position[1] - 2))
         else:
-            if self.castles.black_king_castle:
+            if castles.rights & const.BLACK_KING_CASTLE:
                 if check_blank_spaces(board, position[0], [5, 6]):
                     castle_moves.append((position[0], position[1] + 2))
 
-            if self.castles.black_queen_castle:
+            if castles.rights & const.BLACK_QUEEN_CASTLE:
                 if check_blank_spaces(board, position[0], [1, 2, 3]):
                     castle_moves.append((position[0], position[1] - 2))
 
-        self.castles = None
-
         return castle_moves
 
-    def get_valid_moves(self, board, position):
+    def get_valid_moves(self, board, position, en_passant=None, castles=None):
         """Gets the available moves of a king.
 
         :param board: the chess board
         :param position: a tuple representing the coordinates of the king on the board
+        :param en_passant: not used by kings
+        :param castles: the castle rights of the position, or None if castling is not possible
         :return: a list of tuples that contains the moves that the king can make
         """
-        king_directions = [(x, 0) for x in [-1, 1]] + [(0, x) for x in [-1, 1]]
-        king_directions += [(x, y) for x in [-1, 1] for y in [-1, 1]]
-
-        return directional_moves(position, 1, king_directions, board) + self.castle_moves(board, position)
+        return step_moves(position, KING_TARGETS[position[0]][position[1]], board) + self.castle_moves(board, position, castles)
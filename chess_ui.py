@@ -1,6 +1,18 @@
 import constants as const
 import pygame as py
 
+END_SCREEN_FONT_SIZE = 48
+
+
+def get_square_rect(rank, file):
+    """Gets the area of a square on the screen.
+
+    :param rank: the rank index of the square
+    :param file: the file index of the square
+    :return: the rectangle of the square
+    """
+    return py.Rect(file * const.SQUARE_DIMENSION, rank * const.SQUARE_DIMENSION, const.SQUARE_DIMENSION, const.SQUARE_DIMENSION)
+
 
 def draw_board(screen):
     """Draws the tiles of the chessboard.
@@ -11,58 +23,135 @@ def draw_board(screen):
 
     for rank in range(const.RANKS):
         for file in range(const.FILES):
-            py.draw.rect(screen, board_colors[(file + rank) % 2],
-                         (file * const.SQUARE_DIMENSION, rank * const.SQUARE_DIMENSION, const.SQUARE_DIMENSION, const.SQUARE_DIMENSION))
+            py.draw.rect(screen, board_colors[(file + rank) % 2], get_square_rect(rank, file))
 
 
-def draw_pieces(board, images, screen):
-    """Draws the chess pieces on the board.
+def get_end_text(game):
+    """Gets the message shown when the game ended.
 
-    :param screen: the game screen to draw on
-    :param board: the current chess board with the pieces notated as color_PIECE
-    :param images: a map containing the chess pieces notated as color_PIECE with their corresponding image
+    :param game: the current game
+    :return: the message, or None if the game did not end
     """
-    for rank in range(const.RANKS):
-        for file in range(const.FILES):
-            if board[rank][file] is not None:
-                screen.blit(images[board[rank][file]],
-                            py.Rect(file * const.SQUARE_DIMENSION, rank * const.SQUARE_DIMENSION, const.SQUARE_DIMENSION, const.SQUARE_DIMENSION))
+    if not game.game_ended:
+        return None
 
+    if game.game_ended != "Checkmate":
+        return "Draw"
 
-def draw_end_screen(game, screen):
-    """Draws a corresponding massage if the game ended.
+    return ("Black" if game.white_turn else "White") + " Won"
 
-    :param screen: the game screen to draw on
-    :param game: the current game
+
+class BoardRenderer:
+    """Class drawing a chess game while redrawing as little as possible.
+
+    The tiles are drawn once on a background surface. Every frame, the board is compared with the one drawn last,
+    and only the squares that changed are drawn again and sent to the display. A frame where nothing changed
+    draws nothing at all. The fonts and the rendered texts are kept, so they are only created once.
     """
-    if game.game_ended == "Draw":
-        text = game.game_ended
-    else:
-        text = "Black" if game.white_turn else "White"
-        text += " Won"
+    def __init__(self, screen, images):
+        """Initializes the renderer and draws the background.
 
-    font = py.font.Font("freesansbold.ttf", 48)
+        :param screen: the game screen to draw on
+        :param images: a map containing the chess pieces notated as color_PIECE with their corresponding image
+        """
+        self.screen = screen
+        self.images = images
+        self.background = py.Surface(screen.get_size()).convert()
+        self.fonts = {}
+        self.texts = {}
+        self.drawn_board = None
+        self.drawn_end_text = None
 
-    text_to_draw = font.render(text, True, py.Color('black'), py.Color('white'))
+        draw_board(self.background)
 
-    text_rect = text_to_draw.get_rect()
+    def invalidate(self):
+        """Makes the next frame redraw the whole screen, like after the window was hidden."""
+        self.drawn_board = None
 
-    text_rect.center = (const.WIGHT // 2, const.HEIGHT // 2)
+    def get_text(self, text, size):
+        """Renders a text, or takes it from the cache.
 
-    screen.blit(text_to_draw, text_rect)
+        :param text: the text to render
+        :param size: the font size
+        :return: the surface of the rendered text
+        """
+        if (text, size) not in self.texts:
+            if size not in self.fonts:
+                self.fonts[size] = py.font.Font("freesansbold.ttf", size)
 
+            self.texts[(text, size)] = self.fonts[size].render(text, True, py.Color('black'), py.Color('white'))
 
-def draw_game(game, images, screen):
-    """Draws the current chess game.
+        return self.texts[(text, size)]
 
-    :param screen: the game screen to draw on
-    :param game: the current game
-    :param images: a map containing the chess pieces notated as color_PIECE with their corresponding image
-    """
-    draw_board(screen)
-    draw_pieces(game.board, images, screen)
+    def draw_square(self, rank, file, piece):
+        """Draws a square and the piece on it.
+
+        :param rank: the rank index of the square
+        :param file: the file index of the square
+        :param piece: the piece notated as color_PIECE, or None
+        :return: the rectangle of the square
+        """
+        square_rect = get_square_rect(rank, file)
+
+        self.screen.blit(self.background, square_rect, square_rect)
+
+        if piece is not None:
+            self.screen.blit(self.images[piece], square_rect)
+
+        return square_rect
+
+    def draw_end_screen(self, text):
+        """Draws the message of the end of the game in the middle of the board.
+
+        :param text: the message to draw
+        :return: the rectangle of the message
+        """
+        text_to_draw = self.get_text(text, END_SCREEN_FONT_SIZE)
+        text_rect = text_to_draw.get_rect(center=(const.WIGHT // 2, const.HEIGHT // 2))
+
+        self.screen.blit(text_to_draw, text_rect)
+
+        return text_rect
+
+    def draw(self, game):
+        """Draws what changed in the game since the last frame.
+
+        :param game: the current game
+        :return: if anything was drawn
+        """
+        board = game.board
+        end_text = get_end_text(game)
+
+        # The squares under an end message that went away are redrawn with the whole screen.
+        if self.drawn_end_text is not None and end_text != self.drawn_end_text:
+            self.drawn_board = None
+
+        if self.drawn_board is None:
+            self.screen.blit(self.background, (0, 0))
+
+            for rank in range(const.RANKS):
+                for file in range(const.FILES):
+                    if board[rank][file] is not None:
+                        self.screen.blit(self.images[board[rank][file]], get_square_rect(rank, file))
+
+            if end_text is not None:
+                self.draw_end_screen(end_text)
+
+            py.display.flip()
+        else:
+            dirty_rects = [self.draw_square(rank, file, board[rank][file])
+                           for rank in range(const.RANKS) for file in range(const.FILES)
+                           if board[rank][file] != self.drawn_board[rank][file]]
+
+            if end_text is not None and (dirty_rects or end_text != self.drawn_end_text):
+                dirty_rects.append(self.draw_end_screen(end_text))
+
+            if not dirty_rects:
+                return False
+
+            py.display.update(dirty_rects)
 
-    if game.game_ended:
-        draw_end_screen(game, screen)
+        self.drawn_board = [rank[:] for rank in board]
+        self.drawn_end_text = end_text
 
-    py.display.flip()
+        return True
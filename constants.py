@@ -8,4 +8,66 @@ SQUARE_DIMENSION = 64
 WIGHT = RANKS * SQUARE_DIMENSION
 HEIGHT = FILES * SQUARE_DIMENSION
 
-STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR'
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+BOARD_BACKENDS = ['mailbox', 'bitboard']
+BOARD_BACKEND = 'bitboard'
+
+ATTACK_MAPS = False
+
+FIFTY_MOVE_RULE_PLIES = 100
+REPETITION_DRAW_COUNT = 3
+
+PROMOTION_PIECES = ['Q', 'R', 'B', 'N']
+
+BLACK_KING_CASTLE = 1
+BLACK_QUEEN_CASTLE = 2
+WHITE_KING_CASTLE = 4
+WHITE_QUEEN_CASTLE = 8
+ALL_CASTLES = 15
+
+AI_MAX_DEPTH = 64
+AI_MOVE_TIME = 1.0
+AI_PONDER = False
+
+SEARCH_WORKERS = 1
+
+BOOK_PATH = 'opening_book.bin'
+BOOK_MAX_PLIES = 20
+BOOK_MIN_WEIGHT = 1
+
+ZOBRIST_SEED = 20240229
+
+CACHE_DIRECTORY = 'cache'
+
+TT_SIZE_MB = 16
+
+PERFT_SUITE_MAX_NODES = 100000
+
+SELF_PLAY_DEPTH = 2
+SELF_PLAY_MAX_MOVES = 200
+SELF_PLAY_TT_SIZE_MB = 4
+SELF_PLAY_RANDOM_PLIES = 4
+SELF_PLAY_SEED = 0
+
+ENGINE_NAME = 'Chess_Engine-GUI'
+ENGINE_AUTHOR = 'Aligatrone'
+
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+SERVER_MAX_SESSIONS = 10000
+SERVER_MAX_LINE = 65536
+SERVER_LATENCY_SAMPLES = 64
+SERVER_STATS_SAMPLES = 10000
+SERVER_MONITOR_INTERVAL = 0.01
+SERVER_AI_MAX_DEPTH = 4
+SERVER_AI_MOVE_TIME = 0.1
+SERVER_TT_SIZE_MB = 4
+
+UCI_MAX_DEPTH = 64
+UCI_MOVES_TO_GO = 30
+
+TIME_OVERHEAD = 0.05
+TIME_MAX_USAGE = 0.8
+TIME_HARD_FACTOR = 4
+TIME_BRANCHING_FACTOR = 4
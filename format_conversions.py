@@ -1,5 +1,8 @@
 from enum import Enum
 import chess_pieces as cp
+import constants as const
+
+FILE_NAMES = "abcdefgh"
 
 
 class Colors(Enum):
@@ -38,3 +41,41 @@ class FenToPiece(Enum):
     P = 'w_P'
     Q = 'w_Q'
     R = 'w_R'
+
+
+def get_square_name(position):
+    """Converts a position on the board into the name of the square.
+
+    :param position: a tuple representing the coordinates on the board
+    :return: the name of the square, like 'e4'
+    """
+    return FILE_NAMES[position[1]] + str(const.RANKS - position[0])
+
+
+def get_position(square_name):
+    """Converts the name of a square into a position on the board.
+
+    :param square_name: the name of the square, like 'e4'
+    :return: a tuple representing the coordinates on the board
+    """
+    return const.RANKS - int(square_name[1]), FILE_NAMES.index(square_name[0])
+
+
+def get_move_notation(move):
+    """Converts a move into coordinate notation.
+
+    :param move: a tuple (starting_position, desired_position, promotion)
+    :return: the move in coordinate notation, like 'e2e4' or 'e7e8q'
+    """
+    starting_position, desired_position, promotion = move
+
+    return get_square_name(starting_position) + get_square_name(desired_position) + (promotion.lower() if promotion else "")
+
+
+def get_move_from_notation(notation):
+    """Converts a move in coordinate notation into a move.
+
+    :param notation: the move in coordinate notation, like 'e2e4' or 'e7e8q'
+    :return: a tuple (starting_position, desired_position, promotion)
+    """
+    return get_position(notation[0:2]), get_position(notation[2:4]), notation[4].upper() if len(notation) > 4 else None
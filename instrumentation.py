@@ -0,0 +1,229 @@
+import argparse
+import cProfile
+import functools
+import importlib
+import json
+import pstats
+import sys
+import time
+
+import constants as const
+
+# The functions that are instrumented, as tuples (module, class or None, function, counter, wrapper), the wrapper being
+# "timed" to add up their time as well as counting their calls, "counted" to only count them, or "interior" to count
+# the calls of negamax that search at least one ply. The recursive searches are only counted, their time would include
+# their own calls, and the calls of negamax at depth 0 are left out as they are counted again by quiescence.
+INSTRUMENTED_FUNCTIONS = [
+    ("chess_engine", "ChessBoard", "get_legal_moves", "move_generation", "timed"),
+    ("chess_engine", "ChessBoard", "king_in_check", "check_tests", "timed"),
+    ("chess_engine", "ChessBoard", "is_square_attacked", "attack_tests", "counted"),
+    ("chess_engine", "ChessBoard", "make_move", "make_move", "timed"),
+    ("chess_engine", "ChessBoard", "unmake_move", "unmake_move", "timed"),
+    ("chess_engine", "ChessBoard", "verify_checkmate_stalemate", "verify_checkmate_stalemate", "timed"),
+    ("chess_engine", "ChessBoard", "game_logic", "game_logic", "timed"),
+    ("ai_player", None, "copy_chess_board", "board_copies", "timed"),
+    ("search", "Searcher", "negamax", "nodes", "interior"),
+    ("search", "Searcher", "quiescence", "quiescence_nodes", "counted"),
+    ("transposition_table", "TranspositionTable", "probe", "tt_probes", "counted"),
+    ("transposition_table", "TranspositionTable", "store", "tt_stores", "counted"),
+    ("transposition_table", "SharedTranspositionTable", "probe", "tt_probes", "counted"),
+    ("transposition_table", "SharedTranspositionTable", "store", "tt_stores", "counted"),
+]
+
+counters = {}
+timers = {}
+
+_original_functions = {}
+
+# The time the counters started from, and the time the instrumentation was disabled, or None while it is enabled.
+_start_time = time.perf_counter()
+_stop_time = _start_time
+
+
+def counted(function, name):
+    """Wraps a function so its calls are counted.
+
+    :param function: the function to wrap
+    :param name: the name of its counter
+    :return: the wrapped function
+    """
+    @functools.wraps(function)
+    def counted_function(*args, **kwargs):
+        counters[name] += 1
+
+        return function(*args, **kwargs)
+
+    return counted_function
+
+
+def counted_interior(function, name):
+    """Wraps the negamax method of the searcher so only its calls with some depth left are counted, the ones at depth 0
+    handing the position over to the quiescence search.
+
+    :param function: the function to wrap, called with the searcher, the chess game and the depth first
+    :param name: the name of its counter
+    :return: the wrapped function
+    """
+    @functools.wraps(function)
+    def counted_function(searcher, chess_board, depth, *args, **kwargs):
+        if depth > 0:
+            counters[name] += 1
+
+        return function(searcher, chess_board, depth, *args, **kwargs)
+
+    return counted_function
+
+
+def timed(function, name):
+    """Wraps a function so its calls are counted and their time is added up.
+
+    :param function: the function to wrap
+    :param name: the name of its counter and of its timer
+    :return: the wrapped function
+    """
+    @functools.wraps(function)
+    def timed_function(*args, **kwargs):
+        start_time = time.perf_counter()
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counters[name] += 1
+            timers[name] += time.perf_counter() - start_time
+
+    return timed_function
+
+
+def is_enabled():
+    """Checks if the instrumentation is enabled.
+
+    :return: if the instrumented functions are wrapped
+    """
+    return bool(_original_functions)
+
+
+def enable():
+    """Wraps the instrumented functions and sets the counters and the timers back to zero, so they only count the run
+    starting. Nothing is wrapped while the instrumentation is disabled, so it costs nothing then."""
+    if is_enabled():
+        return
+
+    wrappers = {"counted": counted, "interior": counted_interior, "timed": timed}
+
+    for module_name, class_name, function_name, name, wrapper in INSTRUMENTED_FUNCTIONS:
+        module = importlib.import_module(module_name)
+        owner = getattr(module, class_name) if class_name is not None else module
+        function = vars(owner)[function_name]
+
+        counters.setdefault(name, 0)
+
+        if wrapper == "timed":
+            timers.setdefault(name, 0.0)
+
+        _original_functions[(owner, function_name)] = function
+        setattr(owner, function_name, wrappers[wrapper](function, name))
+
+    reset()
+
+
+def disable():
+    """Puts the original functions back, keeping the counters and the timers of the run that ended and its elapsed
+    time, so they can still be read until the instrumentation is enabled again."""
+    global _stop_time
+
+    if not is_enabled():
+        return
+
+    for (owner, function_name), function in _original_functions.items():
+        setattr(owner, function_name, function)
+
+    _original_functions.clear()
+    _stop_time = time.perf_counter()
+
+
+def reset():
+    """Sets the counters and the timers back to zero."""
+    global _start_time, _stop_time
+
+    for name in counters:
+        counters[name] = 0
+
+    for name in timers:
+        timers[name] = 0.0
+
+    _start_time = time.perf_counter()
+    _stop_time = None if is_enabled() else _start_time
+
+
+def get_snapshot():
+    """Gets the counters and the timers. Once the instrumentation is disabled, they are the ones of the last run, with
+    "enabled" false and the elapsed time of that run, and nothing is counted until it is enabled again.
+
+    :return: a map ready to be written as JSON, with the timers in seconds and the time since the last reset, up to the
+             moment the instrumentation was disabled
+    """
+    stop_time = time.perf_counter() if _stop_time is None else _stop_time
+
+    return {"enabled": is_enabled(), "elapsed": round(stop_time - _start_time, 6), "counters": dict(counters),
+            "timers": {name: round(seconds, 6) for name, seconds in timers.items()}}
+
+
+def dump_snapshot(output_file):
+    """Writes the snapshot of the counters and the timers as one line of JSON, so it can be appended to a log.
+
+    :param output_file: an open text file
+    """
+    output_file.write(json.dumps(get_snapshot()) + "\n")
+    output_file.flush()
+
+
+def get_arguments(arguments):
+    """Parses the command line arguments of the instrumented search.
+
+    :param arguments: the list of arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Searches a position and reports where the time goes.")
+    parser.add_argument("--fen", default=const.STARTING_FEN, help="the position to search")
+    parser.add_argument("--depth", type=int, default=4, help="the depth to search to")
+    parser.add_argument("--backend", choices=const.BOARD_BACKENDS, default=const.BOARD_BACKEND, help="the board backend")
+    parser.add_argument("--profile", action="store_true", help="run the search under cProfile instead of the counters")
+    parser.add_argument("--sort", default="cumulative", help="the order of the profile statistics")
+    parser.add_argument("--limit", type=int, default=25, help="the number of functions of the profile printed")
+    parser.add_argument("--profile-output", help="a file the raw profile statistics are saved to")
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    instrumentation_arguments = get_arguments(sys.argv[1:])
+
+    import chess_engine as ce
+    import search
+    import transposition_table as tt
+
+    # The module is imported again, the functions being wrapped are the ones of the imported modules.
+    import instrumentation
+
+    chess_board = ce.ChessBoard("player", instrumentation_arguments.fen, instrumentation_arguments.backend)
+    searcher = search.Searcher(transposition_table=tt.TranspositionTable())
+
+    if instrumentation_arguments.profile:
+        profiler = cProfile.Profile()
+        search_result = profiler.runcall(searcher.iterative_deepening, chess_board, instrumentation_arguments.depth)
+
+        print(search_result)
+
+        profile_stats = pstats.Stats(profiler, stream=sys.stdout)
+        profile_stats.sort_stats(instrumentation_arguments.sort).print_stats(instrumentation_arguments.limit)
+
+        if instrumentation_arguments.profile_output is not None:
+            profile_stats.dump_stats(instrumentation_arguments.profile_output)
+    else:
+        instrumentation.enable()
+        search_result = searcher.iterative_deepening(chess_board, instrumentation_arguments.depth)
+        instrumentation.disable()
+
+        print(search_result)
+
+        instrumentation.dump_snapshot(sys.stdout)
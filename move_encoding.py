@@ -0,0 +1,110 @@
+import constants as const
+
+# A move fits in 16 bits: the starting square in bits 0-5, the desired square in bits 6-11 and the flags in bits
+# 12-15. The squares are numbered rank_index * 8 + file_index like the board, and 0 is never a move (a8 to a8).
+QUIET = 0
+DOUBLE_PAWN_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EN_PASSANT = 5
+PROMOTION = 8
+
+# The piece a pawn is promoted to is kept in the two lowest bits of the flags.
+PROMOTION_FLAG_PIECES = ['N', 'B', 'R', 'Q']
+
+NO_MOVE = 0
+
+# The moves unpacked so far, so a move code always gives back the same tuple without unpacking it again.
+_decoded_moves = {}
+
+
+def get_square_index(position):
+    """Gets the index of a square from 0 to 63.
+
+    :param position: a tuple of the coordinates of the square
+    :return: the index of the square
+    """
+    return position[0] * const.FILES + position[1]
+
+
+def get_move_flags(board, move):
+    """Finds the flags of a move from the board it is made on.
+
+    :param board: the chess board as a 2D list, before the move is made
+    :param move: a tuple (starting_position, desired_position, promotion)
+    :return: the flags of the move, from 0 to 15
+    """
+    starting_position, desired_position, promotion = move
+    piece_type = board[starting_position[0]][starting_position[1]][2]
+    is_capture = board[desired_position[0]][desired_position[1]] is not None
+
+    if promotion is not None:
+        return PROMOTION | (CAPTURE if is_capture else 0) | PROMOTION_FLAG_PIECES.index(promotion)
+
+    if is_capture:
+        return CAPTURE
+
+    if piece_type == "P":
+        if starting_position[1] != desired_position[1]:
+            return EN_PASSANT
+
+        if abs(starting_position[0] - desired_position[0]) == 2:
+            return DOUBLE_PAWN_PUSH
+
+    if piece_type == "K" and abs(starting_position[1] - desired_position[1]) == 2:
+        return KING_CASTLE if desired_position[1] > starting_position[1] else QUEEN_CASTLE
+
+    return QUIET
+
+
+def encode_move(move, board=None):
+    """Packs a move into a 16-bit integer.
+
+    :param move: a tuple (starting_position, desired_position, promotion), or None
+    :param board: the chess board as a 2D list before the move is made, to find the flags of the move, or None to only
+                  keep the promotion in them
+    :return: the packed move, NO_MOVE for None
+    """
+    if move is None:
+        return NO_MOVE
+
+    starting_position, desired_position, promotion = move
+
+    if board is not None:
+        flags = get_move_flags(board, move)
+    else:
+        flags = QUIET if promotion is None else PROMOTION | PROMOTION_FLAG_PIECES.index(promotion)
+
+    return get_square_index(starting_position) | get_square_index(desired_position) << 6 | flags << 12
+
+
+def decode_move(code):
+    """Unpacks a move packed by encode_move.
+
+    :param code: the packed move
+    :return: a tuple (starting_position, desired_position, promotion), or None for NO_MOVE
+    """
+    if code == NO_MOVE:
+        return None
+
+    flags = code >> 12
+    promotion = PROMOTION_FLAG_PIECES[flags & 0b11] if flags & PROMOTION else None
+
+    return divmod(code & 63, const.FILES), divmod((code >> 6) & 63, const.FILES), promotion
+
+
+def decode_moves(codes):
+    """Unpacks a list of packed moves, reusing the tuples of the codes unpacked before.
+
+    :param codes: the packed moves
+    :return: a list of tuples (starting_position, desired_position, promotion)
+    """
+    try:
+        return [_decoded_moves[code] for code in codes]
+    except KeyError:
+        for code in codes:
+            if code not in _decoded_moves:
+                _decoded_moves[code] = decode_move(code)
+
+        return [_decoded_moves[code] for code in codes]
@@ -0,0 +1,157 @@
+import constants as const
+import evaluation
+import move_encoding as me
+
+MAX_PLY = 128
+KILLER_SLOTS = 2
+HISTORY_LIMIT = 1 << 20
+
+
+def get_capture_score(board, move):
+    """Scores a capture or a promotion with MVV-LVA: the most valuable victim first, the least valuable attacker
+    breaking the ties.
+
+    :param board: the chess board as a 2D list, before the move is made
+    :param move: a tuple (starting_position, desired_position, promotion)
+    :return: the score of the move, 0 for the quiet moves
+    """
+    starting_position, desired_position, promotion = move
+    attacker = board[starting_position[0]][starting_position[1]]
+    victim = board[desired_position[0]][desired_position[1]]
+
+    if victim is None and attacker[2] == "P" and starting_position[1] != desired_position[1]:
+        victim = "P"
+
+    score = 0
+
+    if victim is not None:
+        score = evaluation.PIECE_VALUES[victim[-1]] * 10 - evaluation.PIECE_VALUES[attacker[2]] + 1
+
+    if promotion == "Q":
+        score += evaluation.PIECE_VALUES["Q"] * 10
+
+    return score
+
+
+class MoveOrderer:
+    """Class ordering the moves of a search so the ones most likely to cause a cutoff are searched first.
+
+    The moves are given in stages: the hash move, the captures and queen promotions by MVV-LVA, the killer moves
+    of the ply and the other quiet moves by their history score. Every stage is only prepared when the previous one
+    is exhausted, so a cutoff on the hash move costs no sorting at all.
+    """
+    def __init__(self):
+        """Initializes a move orderer with empty killer moves and history."""
+        self.killers = [[None] * KILLER_SLOTS for _ in range(MAX_PLY)]
+        self.history = [0] * (const.RANKS * const.FILES) ** 2
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """Prepares a new search: the killer moves and the counters are reset and the history is halved, so it
+        favours the moves of the new position."""
+        self.killers = [[None] * KILLER_SLOTS for _ in range(MAX_PLY)]
+        self.history = [score // 2 for score in self.history]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def get_history_index(self, move):
+        """Gets the index of a move in the history table.
+
+        :param move: a tuple (starting_position, desired_position, promotion)
+        :return: the index of the move
+        """
+        return me.get_square_index(move[0]) * const.RANKS * const.FILES + me.get_square_index(move[1])
+
+    def get_moves(self, chess_board, moves, ply, hash_move=None):
+        """Yields the moves of a position in the staged order.
+
+        :param chess_board: the chess game the moves belong to
+        :param moves: a list of the legal moves as tuples (starting_position, desired_position, promotion)
+        :param ply: the distance from the root in plies
+        :param hash_move: the best move of a previous search of the position, or None
+        :return: a generator of the moves
+        """
+        if hash_move is not None and hash_move in moves:
+            yield hash_move
+
+        board = chess_board.board
+
+        captures = []
+        quiet_moves = []
+
+        for move in moves:
+            if move == hash_move:
+                continue
+
+            score = get_capture_score(board, move)
+
+            if score:
+                captures.append((score, move))
+            else:
+                quiet_moves.append(move)
+
+        captures.sort(key=lambda scored_move: scored_move[0], reverse=True)
+
+        for _, move in captures:
+            yield move
+
+        killers = [killer for killer in self.killers[min(ply, MAX_PLY - 1)] if killer is not None and killer in quiet_moves]
+
+        for killer in killers:
+            yield killer
+
+        quiet_moves.sort(key=lambda move: self.history[self.get_history_index(move)], reverse=True)
+
+        for move in quiet_moves:
+            if move not in killers:
+                yield move
+
+    @staticmethod
+    def order_captures(chess_board, moves):
+        """Orders captures by MVV-LVA, for the quiescence search.
+
+        :param chess_board: the chess game the moves belong to
+        :param moves: a list of tuples (starting_position, desired_position, promotion)
+        :return: the ordered list of moves
+        """
+        board = chess_board.board
+
+        return sorted(moves, key=lambda move: get_capture_score(board, move), reverse=True)
+
+    def record_cutoff(self, chess_board, move, ply, depth, move_number):
+        """Records a move that caused a beta cutoff, making it a killer move and raising its history if it is quiet.
+
+        :param chess_board: the chess game the move belongs to, before the move is made
+        :param move: a tuple (starting_position, desired_position, promotion)
+        :param ply: the distance from the root in plies
+        :param depth: the remaining depth of the search in plies
+        :param move_number: the number of moves searched before it
+        """
+        self.cutoffs += 1
+
+        if move_number == 0:
+            self.first_move_cutoffs += 1
+
+        if get_capture_score(chess_board.board, move):
+            return
+
+        killers = self.killers[min(ply, MAX_PLY - 1)]
+
+        if killers[0] != move:
+            killers.insert(0, move)
+            killers.pop()
+
+        history_index = self.get_history_index(move)
+        self.history[history_index] += depth * depth
+
+        if self.history[history_index] > HISTORY_LIMIT:
+            self.history = [score // 2 for score in self.history]
+
+    def get_stats(self):
+        """Gets the counters of the cutoffs.
+
+        :return: a map with the cutoffs, the ones made by the first move searched and their rate
+        """
+        return {"cutoffs": self.cutoffs, "first_move_cutoffs": self.first_move_cutoffs,
+                "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0}
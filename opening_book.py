@@ -0,0 +1,296 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+
+import chess_engine as ce
+import constants as const
+import format_conversions as fc
+import move_encoding as me
+import pgn
+import zobrist
+
+# The file starts with this magic, the version of the Zobrist keys and the seed they were drawn with, and is followed
+# by the records, sorted by key then move. A book with other keys is refused, its positions would never be found.
+BOOK_NAME = b"CEBOOK"
+BOOK_MAGIC = BOOK_NAME + b"02"
+BOOK_HEADER = struct.Struct("<8sHQ")
+
+# A record is the Zobrist key of a position, a packed move played in it and the weight of the move.
+RECORD = struct.Struct("<QHH")
+
+MAX_WEIGHT = 0xFFFF
+
+# The weight a game adds to its moves, from the point of view of the player making them.
+RESULT_WEIGHTS = {"win": 2, "draw": 1, "loss": 0}
+
+_open_books = {}
+
+
+def get_move_weight(result, white_turn):
+    """Gets the weight a game adds to one of its moves.
+
+    :param result: the result of the game, '1-0', '0-1', '1/2-1/2' or '*'
+    :param white_turn: if the move is made by white
+    :return: the weight of the move
+    """
+    if result == "1-0":
+        return RESULT_WEIGHTS["win" if white_turn else "loss"]
+
+    if result == "0-1":
+        return RESULT_WEIGHTS["loss" if white_turn else "win"]
+
+    return RESULT_WEIGHTS["draw"]
+
+
+class OpeningBook:
+    """Class reading an opening book file through a read-only memory map.
+
+    Nothing is parsed when the book is opened: a lookup binary searches the sorted records for the key of the
+    position. The pages of the file are shared by every process that maps it, so many workers can use one book
+    without copying it.
+    """
+    def __init__(self, book_path):
+        """Opens a book file.
+
+        :param book_path: the path of the file written by build_book
+        :raises ValueError: if the file is not an opening book, or if its positions were hashed with other Zobrist keys
+        """
+        self.book_path = book_path
+
+        with open(book_path, "rb") as book_file:
+            self.book_map = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = self.book_map[:BOOK_HEADER.size]
+
+        # The books of older versions start with the same name, and only their keys changed.
+        if not header.startswith(BOOK_NAME):
+            self.book_map.close()
+
+            raise ValueError(f"invalid opening book: {book_path}")
+
+        if header != BOOK_HEADER.pack(BOOK_MAGIC, zobrist.KEY_VERSION, const.ZOBRIST_SEED):
+            self.book_map.close()
+
+            raise ValueError(f"opening book built with other Zobrist keys, it needs to be built again: {book_path}")
+
+        if (len(self.book_map) - BOOK_HEADER.size) % RECORD.size:
+            self.book_map.close()
+
+            raise ValueError(f"invalid opening book: {book_path}")
+
+        self.record_count = (len(self.book_map) - BOOK_HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.record_count
+
+    def get_record(self, index):
+        """Reads a record of the book.
+
+        :param index: the index of the record
+        :return: a tuple (key, move, weight) with the move packed
+        """
+        return RECORD.unpack_from(self.book_map, BOOK_HEADER.size + index * RECORD.size)
+
+    def find_first_record(self, key):
+        """Binary searches the first record of a position.
+
+        :param key: the Zobrist hash of the position
+        :return: the index of the first record with a key not lower than the given one
+        """
+        low, high = 0, self.record_count
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if self.get_record(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def get_entries(self, key):
+        """Gets the moves the book has for a position.
+
+        :param key: the Zobrist hash of the position
+        :return: a list of tuples (move, weight) with the moves as tuples (starting_position, desired_position, promotion)
+        """
+        entries = []
+
+        for index in range(self.find_first_record(key), self.record_count):
+            record_key, move, weight = self.get_record(index)
+
+            if record_key != key:
+                break
+
+            entries.append((me.decode_move(move), weight))
+
+        return entries
+
+    def get_move(self, chess_board, random_choice=True):
+        """Chooses a book move for the current position of a chess game.
+
+        :param chess_board: the chess game to find a move for
+        :param random_choice: if the move is chosen at random in proportion to its weight, instead of the heaviest one,
+                              every move being as likely when the weights are all 0
+        :return: a tuple (starting_position, desired_position, promotion), or None if the position is not in the book
+        """
+        entries = self.get_entries(chess_board.hash)
+
+        if not entries:
+            return None
+
+        # A different position with the same key could give moves that are not legal here.
+        legal_moves = chess_board.get_legal_moves()
+        entries = [(move, weight) for move, weight in entries if move in legal_moves]
+
+        if not entries:
+            return None
+
+        if random_choice:
+            weights = [weight for _, weight in entries]
+
+            return random.choices([move for move, _ in entries], weights if any(weights) else None)[0]
+
+        return max(entries, key=lambda entry: entry[1])[0]
+
+    def close(self):
+        """Closes the memory map of the book."""
+        self.book_map.close()
+
+
+def get_book(book_path=const.BOOK_PATH):
+    """Gets an opening book, opening it the first time it is asked for.
+
+    :param book_path: the path of the book file, or None for no book
+    :return: the opening book, or None if there is no book file
+    """
+    if book_path is None or not os.path.isfile(book_path):
+        return None
+
+    if book_path not in _open_books:
+        _open_books[book_path] = OpeningBook(book_path)
+
+    return _open_books[book_path]
+
+
+def add_game(weights, chess_board, moves, result, max_plies):
+    """Adds the opening moves of a game to the weights of a book being built.
+
+    :param weights: a map from the tuples (key, packed_move) to their weight, updated in place
+    :param chess_board: the chess game in the position the game starts from
+    :param moves: a list of the moves as tuples (starting_position, desired_position, promotion)
+    :param result: the result of the game, '1-0', '0-1', '1/2-1/2' or '*'
+    :param max_plies: the number of plies of every game added to the book
+    """
+    for move in moves[:max_plies]:
+        record = (chess_board.hash, me.encode_move(move))
+        weights[record] = weights.get(record, 0) + get_move_weight(result, chess_board.white_turn)
+
+        chess_board.make_move(*move)
+
+
+def read_book_games(input_path):
+    """Reads the games of a PGN file or of a self-play JSONL file one at a time.
+
+    :param input_path: the path of the file, read as JSONL if it ends with .jsonl and as PGN otherwise
+    :return: a generator of tuples (fen, moves, result) with the moves as tuples (starting_position, desired_position, promotion)
+    """
+    with open(input_path) as input_file:
+        if input_path.endswith(".jsonl"):
+            for line in input_file:
+                if line.strip():
+                    game = json.loads(line)
+
+                    yield game["fen"], [fc.get_move_from_notation(notation) for notation in game["moves"]], game["result"]
+        else:
+            for game in pgn.read_games(input_file):
+                chess_board = ce.ChessBoard("player", game.get_fen())
+                moves = []
+
+                for san in game.moves:
+                    try:
+                        move = pgn.get_move_from_san(chess_board, san)
+                    except ValueError:
+                        break
+
+                    moves.append(move)
+                    chess_board.make_move(*move)
+
+                yield game.get_fen(), moves, game.result
+
+
+def build_book(input_paths, book_path, max_plies=const.BOOK_MAX_PLIES, min_weight=const.BOOK_MIN_WEIGHT):
+    """Builds an opening book from game records.
+
+    :param input_paths: a list of PGN and self-play JSONL files
+    :param book_path: the path of the book file to write
+    :param max_plies: the number of plies of every game added to the book
+    :param min_weight: the weight under which a move is left out of the book
+    :return: a tuple (games, records) with the number of games read and of records written
+    """
+    weights = {}
+    games = 0
+
+    for input_path in input_paths:
+        for fen, moves, result in read_book_games(input_path):
+            add_game(weights, ce.ChessBoard("player", fen), moves, result, max_plies)
+            games += 1
+
+    records = sorted((key, move, min(weight, MAX_WEIGHT)) for (key, move), weight in weights.items() if weight >= min_weight)
+
+    with open(book_path, "wb") as book_file:
+        book_file.write(BOOK_HEADER.pack(BOOK_MAGIC, zobrist.KEY_VERSION, const.ZOBRIST_SEED))
+
+        for record in records:
+            book_file.write(RECORD.pack(*record))
+
+    return games, len(records)
+
+
+def get_arguments(arguments):
+    """Parses the command line arguments of the opening book tools.
+
+    :param arguments: the list of arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Builds and queries opening books.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="build a book from PGN and self-play JSONL files")
+    build_parser.add_argument("inputs", nargs="+", help="the PGN and JSONL files")
+    build_parser.add_argument("--output", default=const.BOOK_PATH, help="the book file to write")
+    build_parser.add_argument("--max-plies", type=int, default=const.BOOK_MAX_PLIES, help="the plies of every game added to the book")
+    build_parser.add_argument("--min-weight", type=int, default=const.BOOK_MIN_WEIGHT, help="the weight under which a move is left out")
+
+    probe_parser = subparsers.add_parser("probe", help="print the book moves of a position")
+    probe_parser.add_argument("--book", default=const.BOOK_PATH, help="the book file")
+    probe_parser.add_argument("--fen", default=const.STARTING_FEN, help="the position, by default the starting position")
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    book_arguments = get_arguments(sys.argv[1:])
+
+    if book_arguments.command == "build":
+        start_time = time.perf_counter()
+        book_games, book_records = build_book(book_arguments.inputs, book_arguments.output, book_arguments.max_plies,
+                                              book_arguments.min_weight)
+
+        print(f"games {book_games} records {book_records} time {time.perf_counter() - start_time:.3f}s")
+    else:
+        probe_start_time = time.perf_counter()
+        opening_book = OpeningBook(book_arguments.book)
+        probe_board = ce.ChessBoard("player", book_arguments.fen)
+        book_entries = opening_book.get_entries(probe_board.hash)
+
+        print(f"records {len(opening_book)} lookup {(time.perf_counter() - probe_start_time) * 1000:.3f}ms")
+
+        for book_move, book_weight in sorted(book_entries, key=lambda entry: entry[1], reverse=True):
+            print(f"{pgn.get_san(probe_board, book_move)} {fc.get_move_notation(book_move)} weight {book_weight}")
@@ -0,0 +1,309 @@
+import argparse
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+
+import chess_engine as ce
+import constants as const
+import search
+import transposition_table as tt
+
+# The workers are started by a clean server process where it exists: forking the main process could copy locks held
+# by its other threads, like the one of the standard input the UCI loop is reading.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# The time the main process waits for a message of the workers before checking its stop event again.
+POLL_INTERVAL = 0.01
+
+# The time the workers have to send their last message once they were told to stop, before they are killed.
+STOP_GRACE_TIME = 1.0
+
+# The time the workers have to start and open the shared transposition table.
+START_TIMEOUT = 30.0
+
+
+def search_position(worker_index, fen, position_counts, backend, max_depth, time_manager, transposition_table, stop_event,
+                    result_queue):
+    """Searches a position in a worker process of the lazy SMP search, sharing the transposition table with the others.
+    Every finished iteration is sent to the main process, then a last message with a depth of None when the search ends,
+    even when it failed, with no move then.
+
+    :param worker_index: the index of the worker, the odd ones starting one ply deeper to spread the workers over
+                         two depths
+    :param fen: the position to search
+    :param position_counts: the position counts of the game, so the repetitions of the moves before it are seen
+    :param backend: the board backend used for move generation
+    :param max_depth: the maximum depth to search to in plies
+    :param time_manager: the time manager deciding when to stop, or None
+    :param transposition_table: the shared transposition table
+    :param stop_event: the event set by the main process to stop the search
+    :param result_queue: the queue the messages (worker_index, depth, best_move, score, nodes) are put on
+    """
+    chess_board = ce.ChessBoard("player", fen, backend)
+    chess_board.position_counts = dict(position_counts)
+
+    searcher = search.Searcher(transposition_table=transposition_table)
+    searcher.stop_event = stop_event
+
+    def report(search_result):
+        result_queue.put((worker_index, search_result.depth, search_result.best_move, search_result.score, search_result.nodes))
+
+    search_result = None
+
+    try:
+        search_result = searcher.iterative_deepening(chess_board, max_depth, time_manager, report, 1 + worker_index % 2)
+    finally:
+        if search_result is None:
+            result_queue.put((worker_index, None, None, 0, searcher.nodes))
+        else:
+            result_queue.put((worker_index, None, search_result.best_move, search_result.score, search_result.nodes))
+
+
+def run_worker(worker_index, table_name, table_size_mb, ready_barrier, task_queue, stop_event, result_queue):
+    """Runs a worker process of the lazy SMP search, which opens the shared transposition table once and searches the
+    positions sent to it until it gets None. A search that fails ends the worker, which is started again before the
+    next search.
+
+    :param worker_index: the index of the worker
+    :param table_name: the name of the shared memory of the transposition table
+    :param table_size_mb: the memory used by the transposition table in megabytes
+    :param ready_barrier: the barrier the worker waits on with the main process once it is ready to search
+    :param task_queue: the queue of the worker the searches are put on, as the arguments of search_position after
+                       the worker index
+    :param stop_event: the event set by the main process to stop the search
+    :param result_queue: the queue the messages of the searches are put on
+    """
+    transposition_table = tt.SharedTranspositionTable(table_size_mb, table_name)
+
+    try:
+        ready_barrier.wait(START_TIMEOUT)
+
+        for task in iter(task_queue.get, None):
+            search_position(worker_index, *task, transposition_table, stop_event, result_queue)
+    finally:
+        transposition_table.close()
+
+
+class ParallelSearcher:
+    """Class searching a position with several worker processes at once, in the lazy SMP way.
+
+    Every worker runs its own iterative deepening on the same position and they only share the transposition table,
+    so each one finds the entries the others stored and they drift apart in the moves they search. The search ends
+    when the first worker ends, and the deepest iteration any worker finished gives the best move. The workers are
+    started once and wait for the next position between the searches, so a search does not pay for starting them. A
+    worker that dies without its last message is left out, and the workers still running once stopped for too long are
+    killed, the workers being started again before the next search.
+    """
+    def __init__(self, workers=const.SEARCH_WORKERS, table_size_mb=const.TT_SIZE_MB):
+        """Initializes a parallel searcher and its shared transposition table, without starting the workers.
+
+        :param workers: the number of worker processes
+        :param table_size_mb: the memory used by the transposition table in megabytes
+        """
+        self.workers = workers
+        self.table_size_mb = table_size_mb
+        self.transposition_table = tt.SharedTranspositionTable(table_size_mb)
+        self.stop_event = None
+
+        self.context = multiprocessing.get_context(START_METHOD)
+        self.processes = []
+        self.task_queues = []
+        self.worker_stop_event = None
+        self.result_queue = None
+
+    def start(self):
+        """Starts the worker processes, if they are not running, and waits until they are ready to search."""
+        if self.processes and all(process.is_alive() for process in self.processes):
+            return
+
+        self.stop_workers()
+
+        ready_barrier = self.context.Barrier(self.workers + 1)
+        self.task_queues = [self.context.Queue() for _ in range(self.workers)]
+        self.worker_stop_event = self.context.Event()
+        self.result_queue = self.context.Queue()
+        self.processes = [self.context.Process(target=run_worker, args=(worker_index, self.transposition_table.name,
+                                                                        self.table_size_mb, ready_barrier,
+                                                                        self.task_queues[worker_index],
+                                                                        self.worker_stop_event, self.result_queue),
+                                               daemon=True)
+                          for worker_index in range(self.workers)]
+
+        for process in self.processes:
+            process.start()
+
+        try:
+            ready_barrier.wait(START_TIMEOUT)
+        except threading.BrokenBarrierError:
+            self.stop_workers()
+
+            raise RuntimeError("the search workers did not start")
+
+    def stop_workers(self):
+        """Ends the worker processes, killing the ones that do not end in time."""
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+
+        for process in self.processes:
+            process.join(STOP_GRACE_TIME)
+
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+        self.processes = []
+        self.task_queues = []
+
+    def search(self, chess_board, max_depth, time_manager=None, report=None):
+        """Searches the current position of a chess game with the worker processes, starting them if needed.
+
+        :param chess_board: the chess game to search, it is never changed
+        :param max_depth: the maximum depth to search to in plies
+        :param time_manager: the time manager deciding when to stop, or None to search without a time limit
+        :param report: a function called with the search result of every new deepest iteration, or None
+        :return: the search result of the deepest iteration finished, with the nodes of every worker
+        """
+        self.start()
+
+        worker_stop_event = self.worker_stop_event
+        result_queue = self.result_queue
+        processes = self.processes
+
+        worker_stop_event.clear()
+
+        start_time = time.perf_counter()
+
+        backend = "mailbox" if chess_board.bitboards is None else "bitboard"
+        fen = chess_board.to_fen()
+
+        for task_queue in self.task_queues:
+            task_queue.put((fen, chess_board.position_counts, backend, max_depth, time_manager))
+
+        best_result = None
+        worker_nodes = [0] * self.workers
+        last_moves = {}
+
+        stop_time = None
+
+        while len(last_moves) < self.workers:
+            if stop_time is None and ((self.stop_event is not None and self.stop_event.is_set()) or
+                                      (time_manager is not None and time_manager.hard_deadline_reached())):
+                worker_stop_event.set()
+
+            if stop_time is None and worker_stop_event.is_set():
+                stop_time = time.perf_counter()
+
+            try:
+                worker_index, depth, best_move, score, nodes = result_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                stop_timed_out = stop_time is not None and time.perf_counter() - stop_time > STOP_GRACE_TIME
+
+                # A worker that ended well already sent its last message, the others died without it.
+                for worker_index, process in enumerate(processes):
+                    if worker_index not in last_moves and (not process.is_alive() or stop_timed_out):
+                        process.kill()
+                        last_moves[worker_index] = None
+
+                continue
+
+            worker_nodes[worker_index] = nodes
+
+            if depth is None:
+                last_moves[worker_index] = (best_move, score)
+
+                # A worker that failed has no move, and does not stop the others.
+                if best_move is not None:
+                    worker_stop_event.set()
+
+                continue
+
+            if best_result is None or depth > best_result.depth:
+                best_result = search.SearchResult(best_move, score, depth, sum(worker_nodes), time.perf_counter() - start_time)
+
+                if report is not None:
+                    report(best_result)
+
+        # A killed worker could have left the queues broken, so the workers are all started again before the next search.
+        if None in last_moves.values():
+            self.stop_workers()
+
+        if best_result is None:
+            best_move, score = next((last_move for last_move in last_moves.values() if last_move is not None), (None, 0))
+            best_result = search.SearchResult(best_move, score, 0, 0, 0)
+
+        return search.SearchResult(best_result.best_move, best_result.score, best_result.depth, sum(worker_nodes),
+                                   time.perf_counter() - start_time)
+
+    def close(self):
+        """Ends the worker processes and removes the shared transposition table."""
+        self.stop_workers()
+        self.transposition_table.close()
+
+
+def run_benchmark(fen, depth, max_workers, table_size_mb=const.TT_SIZE_MB, backend=const.BOARD_BACKEND):
+    """Searches a position to a fixed depth with more and more workers, printing the time to depth and the nodes per
+    second of each worker count.
+
+    :param fen: the position to search
+    :param depth: the depth to search to in plies
+    :param max_workers: the largest number of workers, the counts being the powers of two below it and itself
+    :param table_size_mb: the memory used by the transposition table in megabytes
+    :param backend: the board backend used for move generation
+    :return: a list of tuples (workers, elapsed, nodes) of the searches
+    """
+    chess_board = ce.ChessBoard("player", fen, backend)
+    worker_counts = sorted({1 << power for power in range(max_workers.bit_length()) if 1 << power <= max_workers} | {max_workers})
+    results = []
+
+    for workers in worker_counts:
+        parallel_searcher = ParallelSearcher(workers, table_size_mb)
+
+        try:
+            search_result = parallel_searcher.search(chess_board, depth)
+        finally:
+            parallel_searcher.close()
+
+        results.append((workers, search_result.elapsed, search_result.nodes))
+
+        base_elapsed, base_nodes = results[0][1], results[0][2]
+
+        print(f"workers {workers} depth {search_result.depth} time {search_result.elapsed:.3f}s nodes {search_result.nodes} "
+              f"nps {search_result.nps} time speedup {base_elapsed / search_result.elapsed:.2f}x "
+              f"nps scaling {search_result.nps * base_elapsed / base_nodes:.2f}x")
+
+    return results
+
+
+def get_arguments(arguments):
+    """Parses the command line arguments of the parallel search.
+
+    :param arguments: the list of arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Searches a position with several processes sharing a transposition table.")
+    parser.add_argument("--fen", default=const.STARTING_FEN, help="the position to search")
+    parser.add_argument("--depth", type=int, default=5, help="the depth to search to")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="the number of worker processes")
+    parser.add_argument("--hash", type=int, default=const.TT_SIZE_MB, help="the size of the transposition table in megabytes")
+    parser.add_argument("--backend", choices=const.BOARD_BACKENDS, default=const.BOARD_BACKEND, help="the board backend")
+    parser.add_argument("--benchmark", action="store_true", help="compare the searches with 1, 2, 4... up to the workers")
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    parallel_arguments = get_arguments(sys.argv[1:])
+
+    if parallel_arguments.benchmark:
+        run_benchmark(parallel_arguments.fen, parallel_arguments.depth, parallel_arguments.workers, parallel_arguments.hash,
+                      parallel_arguments.backend)
+    else:
+        main_searcher = ParallelSearcher(parallel_arguments.workers, parallel_arguments.hash)
+
+        try:
+            main_searcher.search(ce.ChessBoard("player", parallel_arguments.fen, parallel_arguments.backend),
+                                 parallel_arguments.depth, report=print)
+        finally:
+            main_searcher.close()
@@ -0,0 +1,196 @@
+import argparse
+import sys
+import time
+
+import chess_engine as ce
+import constants as const
+import format_conversions as fc
+import zobrist
+
+# Standard positions with their known leaf node counts, indexed by depth - 1.
+PERFT_SUITE = [
+    ("start position", const.STARTING_FEN, [20, 400, 8902, 197281]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862]),
+    ("en passant pins", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238]),
+    ("promotions and castle rights", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467]),
+    ("underpromotions", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379]),
+    ("middle game", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890]),
+    ("en passant discovered check", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", [18, 92, 1670, 10138, 185429, 1134888]),
+    ("en passant out of check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", [15, 126, 1928, 13931, 206379, 1440467]),
+    ("en passant pinned pawn", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1", [13, 102, 1266, 10276, 135655, 1015133]),
+    ("king side castle", "4k3/8/8/8/8/8/8/4K2R w K - 0 1", [15, 66, 1197, 7059]),
+    ("queen side castle", "4k3/8/8/8/8/8/8/R3K3 w Q - 0 1", [16, 71, 1287, 7626]),
+    ("king side castle through check", "8/8/8/8/8/8/6k1/4K2R w K - 0 1", [12, 38, 564, 2219]),
+    ("queen side castle through check", "8/8/8/8/8/8/1k6/R3K3 w Q - 0 1", [15, 65, 1018, 4573]),
+    ("all castles", "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", [26, 568, 13744, 314346]),
+    ("castle into check", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", [26, 1141, 27826, 1274206]),
+    ("castle rights lost by capture", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", [44, 1494, 50509, 1720476]),
+]
+
+# Games with the number of times their last position was reached. The double push only gives an en passant right when an
+# enemy pawn stands next to the pawn, the position after it being repeated by the knight and king moves otherwise.
+REPETITION_SUITE = [
+    ("double push without en passant", "4k3/8/8/8/8/8/4P3/4K1N1 w - - 0 1",
+     ["e2e4", "e8d8", "g1f3", "d8e8", "f3g1", "e8d8", "g1f3", "d8e8", "f3g1"], 3),
+    ("double push with en passant", "4k3/8/8/8/3p4/8/4P3/4K1N1 w - - 0 1",
+     ["e2e4", "e8d8", "g1f3", "d8e8", "f3g1", "e8d8", "g1f3", "d8e8", "f3g1"], 2),
+]
+
+
+def perft(chess_board, depth):
+    """Counts the leaf nodes of the legal move tree of a position.
+
+    :param chess_board: the chess game to count from, it is restored to the same position afterwards
+    :param depth: the depth of the tree in plies
+    :return: the number of leaf nodes
+    """
+    if depth == 0:
+        return 1
+
+    moves = chess_board.get_legal_moves()
+
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+
+    for move in moves:
+        chess_board.make_move(*move)
+        nodes += perft(chess_board, depth - 1)
+        chess_board.unmake_move()
+
+    return nodes
+
+
+def divide(chess_board, depth):
+    """Counts the leaf nodes under every legal move of a position.
+
+    :param chess_board: the chess game to count from, it is restored to the same position afterwards
+    :param depth: the depth of the tree in plies, at least 1
+    :return: a map from every move in coordinate notation to its number of leaf nodes
+    """
+    move_nodes = {}
+
+    for move in chess_board.get_legal_moves():
+        chess_board.make_move(*move)
+        move_nodes[fc.get_move_notation(move)] = perft(chess_board, depth - 1)
+        chess_board.unmake_move()
+
+    return move_nodes
+
+
+def run_perft(fen, depth, divide_mode=False, backend=const.BOARD_BACKEND):
+    """Runs perft on a position and prints the node count and the nodes per second.
+
+    :param fen: the position as a FEN string
+    :param depth: the depth of the tree in plies
+    :param divide_mode: if the node count of every root move should be printed
+    :param backend: the board backend used for move generation
+    :return: the number of leaf nodes
+    """
+    chess_board = ce.ChessBoard("player", fen, backend)
+
+    start_time = time.perf_counter()
+
+    if divide_mode:
+        move_nodes = divide(chess_board, depth)
+
+        for notation, move_count in sorted(move_nodes.items()):
+            print(f"{notation}: {move_count}")
+
+        nodes = sum(move_nodes.values())
+    else:
+        nodes = perft(chess_board, depth)
+
+    elapsed = time.perf_counter() - start_time
+
+    print(f"nodes {nodes} time {elapsed:.3f}s nps {int(nodes / elapsed) if elapsed > 0 else nodes}")
+
+    return nodes
+
+
+def run_suite(max_nodes=const.PERFT_SUITE_MAX_NODES, backend=const.BOARD_BACKEND):
+    """Runs perft on the suite positions and compares the counts with the known ones.
+
+    :param max_nodes: the depths with more known leaf nodes than this are skipped
+    :param backend: the board backend used for move generation
+    :return: if every count matched
+    """
+    all_passed = True
+    total_nodes = 0
+
+    start_time = time.perf_counter()
+
+    for name, fen, expected_counts in PERFT_SUITE:
+        for depth, expected_nodes in enumerate(expected_counts, 1):
+            if expected_nodes > max_nodes:
+                break
+
+            nodes = perft(ce.ChessBoard("player", fen, backend), depth)
+            total_nodes += nodes
+
+            passed = nodes == expected_nodes
+            all_passed = all_passed and passed
+
+            print(f"{'ok' if passed else 'FAILED'} {name} depth {depth}: {nodes} (expected {expected_nodes})")
+
+    elapsed = time.perf_counter() - start_time
+
+    print(f"nodes {total_nodes} time {elapsed:.3f}s nps {int(total_nodes / elapsed) if elapsed > 0 else total_nodes}")
+
+    return all_passed
+
+
+def run_repetitions(backend=const.BOARD_BACKEND):
+    """Plays the repetition suite games and compares the times their last position was reached with the known ones,
+    checking the hash made move by move against the one computed from scratch.
+
+    :param backend: the board backend used for the games
+    :return: if every count and every hash matched
+    """
+    all_passed = True
+
+    for name, fen, notations, expected_count in REPETITION_SUITE:
+        chess_board = ce.ChessBoard("player", fen, backend)
+
+        for notation in notations:
+            chess_board.make_move(*fc.get_move_from_notation(notation))
+
+        count = chess_board.position_counts.get(chess_board.hash, 0)
+
+        passed = count == expected_count and chess_board.hash == zobrist.hash_position(chess_board)
+        all_passed = all_passed and passed
+
+        print(f"{'ok' if passed else 'FAILED'} {name}: reached {count} times (expected {expected_count})")
+
+    return all_passed
+
+
+def get_arguments(arguments):
+    """Parses the command line arguments of the perft command.
+
+    :param arguments: the list of arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Counts the leaf nodes of the legal move tree of a chess position.")
+
+    parser.add_argument("depth", type=int, nargs="?", default=3, help="the depth of the tree in plies")
+    parser.add_argument("--fen", default=const.STARTING_FEN, help="the position to count from")
+    parser.add_argument("--divide", action="store_true", help="print the node count of every root move")
+    parser.add_argument("--backend", choices=const.BOARD_BACKENDS, default=const.BOARD_BACKEND, help="the board backend")
+    parser.add_argument("--suite", action="store_true", help="run the bundled positions and games and check their counts")
+    parser.add_argument("--max-nodes", type=int, default=const.PERFT_SUITE_MAX_NODES,
+                        help="skip the suite depths with more leaf nodes than this")
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    perft_arguments = get_arguments(sys.argv[1:])
+
+    if perft_arguments.suite:
+        suite_passed = run_suite(perft_arguments.max_nodes, perft_arguments.backend)
+
+        sys.exit(0 if run_repetitions(perft_arguments.backend) and suite_passed else 1)
+
+    run_perft(perft_arguments.fen, perft_arguments.depth, perft_arguments.divide, perft_arguments.backend)
@@ -0,0 +1,428 @@
+import argparse
+import json
+import re
+import sys
+import time
+
+import chess_engine as ce
+import constants as const
+import format_conversions as fc
+
+RESULTS = ["1-0", "0-1", "1/2-1/2", "*"]
+
+# The tags every PGN game starts with, in this order.
+SEVEN_TAG_ROSTER = ["Event", "Site", "Date", "Round", "White", "Black", "Result"]
+
+LINE_LENGTH = 80
+
+HEADER_PATTERN = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+TOKEN_PATTERN = re.compile(r'[{}();]|[^\s{}();]+')
+MOVE_NUMBER_PATTERN = re.compile(r'^\d+\.*')
+ESCAPED_CHARACTER_PATTERN = re.compile(r'\\(.)')
+
+
+class PgnGame:
+    """Class representing a game of a PGN file: its tags, its moves in SAN and its result."""
+    def __init__(self, headers=None, moves=None, result="*"):
+        """Initializes a game.
+
+        :param headers: a map from the tag names to their values
+        :param moves: a list of the moves in SAN, like ['e4', 'e5', 'Nf3']
+        :param result: '1-0', '0-1', '1/2-1/2' or '*'
+        """
+        self.headers = headers if headers is not None else {}
+        self.moves = moves if moves is not None else []
+        self.result = result
+
+    def get_fen(self):
+        """Gets the position the game starts from.
+
+        :return: the FEN tag of the game, or the standard starting position
+        """
+        return self.headers.get("FEN", const.STARTING_FEN)
+
+
+def get_san(chess_board, move, legal_moves=None):
+    """Converts a move into standard algebraic notation.
+
+    :param chess_board: the chess game the move is played in, before the move is made
+    :param move: a tuple (starting_position, desired_position, promotion)
+    :param legal_moves: the legal moves of the position, to avoid generating them again
+    :return: the move in SAN, like 'Nbd7', 'exd5', 'e8=Q+' or 'O-O'
+    """
+    starting_position, desired_position, promotion = move
+    board = chess_board.board
+    piece_type = board[starting_position[0]][starting_position[1]][2]
+    is_capture = board[desired_position[0]][desired_position[1]] is not None
+
+    if piece_type == "K" and abs(starting_position[1] - desired_position[1]) == 2:
+        san = "O-O" if desired_position[1] > starting_position[1] else "O-O-O"
+    elif piece_type == "P":
+        is_capture = starting_position[1] != desired_position[1]
+
+        san = (fc.FILE_NAMES[starting_position[1]] + "x" if is_capture else "") + fc.get_square_name(desired_position)
+        san += "=" + promotion if promotion else ""
+    else:
+        if legal_moves is None:
+            legal_moves = chess_board.get_legal_moves()
+
+        rivals = [other[0] for other in legal_moves if other[1] == desired_position and other[0] != starting_position
+                  and board[other[0][0]][other[0][1]][2] == piece_type]
+
+        disambiguation = ""
+
+        if rivals:
+            square_name = fc.get_square_name(starting_position)
+
+            if all(rival[1] != starting_position[1] for rival in rivals):
+                disambiguation = square_name[0]
+            elif all(rival[0] != starting_position[0] for rival in rivals):
+                disambiguation = square_name[1]
+            else:
+                disambiguation = square_name
+
+        san = piece_type + disambiguation + ("x" if is_capture else "") + fc.get_square_name(desired_position)
+
+    chess_board.make_move(*move)
+
+    if chess_board.king_in_check():
+        san += "+" if chess_board.get_legal_moves() else "#"
+
+    chess_board.unmake_move()
+
+    return san
+
+
+def get_move_from_san(chess_board, san, legal_moves=None):
+    """Finds the legal move written in standard algebraic notation.
+
+    :param chess_board: the chess game the move is played in
+    :param san: the move in SAN, the check, mate and annotation symbols being optional
+    :param legal_moves: the legal moves of the position, to avoid generating them again
+    :return: a tuple (starting_position, desired_position, promotion)
+    :raises ValueError: if the notation is invalid or does not match exactly one legal move
+    """
+    if legal_moves is None:
+        legal_moves = chess_board.get_legal_moves()
+
+    board = chess_board.board
+    notation = san.rstrip("+#!?")
+
+    if notation in ["O-O", "0-0", "O-O-O", "0-0-0"]:
+        file_change = 2 if len(notation) == 3 else -2
+
+        for move in legal_moves:
+            starting_position, desired_position, _ = move
+
+            if board[starting_position[0]][starting_position[1]][2] == "K" and desired_position[1] - starting_position[1] == file_change:
+                return move
+
+        raise ValueError(f"illegal castle: {san}")
+
+    promotion = None
+
+    if "=" in notation:
+        notation, promotion = notation.split("=", 1)
+    elif len(notation) > 2 and notation[-1] in const.PROMOTION_PIECES and notation[-2].isdigit():
+        notation, promotion = notation[:-1], notation[-1]
+
+    piece_type = notation[0] if notation and notation[0] in "KQRBN" else "P"
+    notation = (notation[1:] if piece_type != "P" else notation).replace("x", "").replace("-", "")
+
+    if len(notation) < 2 or notation[-2] not in fc.FILE_NAMES or notation[-1] not in "12345678":
+        raise ValueError(f"invalid SAN: {san}")
+
+    desired_position = fc.get_position(notation[-2:])
+    disambiguation = notation[:-2]
+
+    matches = []
+
+    for move in legal_moves:
+        starting_position = move[0]
+
+        if move[1] != desired_position or move[2] != promotion or board[starting_position[0]][starting_position[1]][2] != piece_type:
+            continue
+
+        square_name = fc.get_square_name(starting_position)
+
+        if all(character in square_name for character in disambiguation):
+            matches.append(move)
+
+    if len(matches) != 1:
+        raise ValueError(f"{'ambiguous' if matches else 'illegal'} move: {san}")
+
+    return matches[0]
+
+
+def read_games(pgn_file):
+    """Reads the games of a PGN file one at a time, so files of any size can be processed in constant memory.
+
+    :param pgn_file: an open text file
+    :return: a generator of the games
+    """
+    game = PgnGame()
+    in_movetext = False
+    in_comment = False
+    variation_depth = 0
+
+    for line in pgn_file:
+        if line.startswith("%"):
+            continue
+
+        stripped_line = line.strip()
+
+        if not in_comment and stripped_line.startswith("["):
+            if in_movetext:
+                yield game
+
+                game = PgnGame()
+                in_movetext = False
+
+            header = HEADER_PATTERN.match(stripped_line)
+
+            if header is not None:
+                game.headers[header.group(1)] = ESCAPED_CHARACTER_PATTERN.sub(r"\1", header.group(2))
+
+            continue
+
+        for token in TOKEN_PATTERN.findall(line):
+            if in_comment:
+                in_comment = token != "}"
+                continue
+
+            if token == "{":
+                in_comment = True
+            elif token == ";":
+                break
+            elif token == "(":
+                variation_depth += 1
+            elif token == ")":
+                variation_depth = max(0, variation_depth - 1)
+            elif variation_depth or token.startswith("$"):
+                continue
+            elif token in RESULTS:
+                game.result = token
+
+                yield game
+
+                game = PgnGame()
+                in_movetext = False
+            else:
+                move = MOVE_NUMBER_PATTERN.sub("", token)
+                in_movetext = True
+
+                if move:
+                    game.moves.append(move)
+
+    if in_movetext or game.headers:
+        yield game
+
+
+def replay_game(game, backend=const.BOARD_BACKEND):
+    """Plays the moves of a game, verifying every one of them.
+
+    :param game: the game to replay
+    :param backend: the board backend used for move generation
+    :return: the chess game in its final position
+    :raises ValueError: if the starting position or a move is invalid
+    """
+    chess_board = ce.ChessBoard("player", game.get_fen(), backend)
+
+    for ply, san in enumerate(game.moves):
+        try:
+            move = get_move_from_san(chess_board, san)
+        except ValueError as e:
+            raise ValueError(f"move {ply // 2 + 1}{'.' if ply % 2 == 0 else '...'} {e}")
+
+        chess_board.make_move(*move)
+
+    return chess_board
+
+
+def get_game_from_moves(fen, moves, headers=None, result="*"):
+    """Creates a game from moves in coordinate notation, like the ones of the self-play output.
+
+    :param fen: the position the game starts from
+    :param moves: a list of the moves in coordinate notation, like ['e2e4', 'e7e5']
+    :param headers: a map from the tag names to their values
+    :param result: '1-0', '0-1', '1/2-1/2' or '*'
+    :return: the game with its moves in SAN
+    """
+    chess_board = ce.ChessBoard("player", fen)
+    san_moves = []
+
+    for notation in moves:
+        move = fc.get_move_from_notation(notation)
+
+        san_moves.append(get_san(chess_board, move))
+        chess_board.make_move(*move)
+
+    headers = dict(headers or {})
+
+    if fen != const.STARTING_FEN:
+        headers["SetUp"] = "1"
+        headers["FEN"] = fen
+
+    return PgnGame(headers, san_moves, result)
+
+
+def escape_tag_value(value):
+    """Escapes the backslashes and the quotes of a tag value, so it can be written between quotes.
+
+    :param value: the value of the tag
+    :return: the escaped value
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def get_pgn(game):
+    """Converts a game into PGN text.
+
+    :param game: the game to convert
+    :return: the tags, the movetext wrapped at 80 characters and the result, followed by an empty line
+    """
+    headers = {tag: "?" for tag in SEVEN_TAG_ROSTER}
+    headers.update(game.headers)
+    headers["Result"] = game.result
+
+    tags = SEVEN_TAG_ROSTER + [tag for tag in game.headers if tag not in SEVEN_TAG_ROSTER]
+    lines = [f'[{tag} "{escape_tag_value(headers[tag])}"]' for tag in tags] + [""]
+
+    fen_fields = ce.get_fen_fields(game.get_fen())
+    ply = 0 if fen_fields[1] == "w" else 1
+    move_number = int(fen_fields[5])
+
+    tokens = []
+
+    for san in game.moves:
+        if ply % 2 == 0:
+            tokens.append(f"{move_number}.")
+        elif not tokens:
+            tokens.append(f"{move_number}...")
+
+        tokens.append(san)
+
+        if ply % 2 == 1:
+            move_number += 1
+
+        ply += 1
+
+    tokens.append(game.result)
+
+    line = ""
+
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+
+    lines.append(line)
+
+    return "\n".join(lines) + "\n\n"
+
+
+def write_games(pgn_file, games):
+    """Writes games to a PGN file one at a time.
+
+    :param pgn_file: an open text file
+    :param games: an iterable of games
+    :return: the number of games written
+    """
+    written_games = 0
+
+    for game in games:
+        pgn_file.write(get_pgn(game))
+        written_games += 1
+
+    return written_games
+
+
+def replay_file(pgn_path, backend=const.BOARD_BACKEND, limit=None):
+    """Replays and verifies every game of a PGN file, printing the invalid ones and the games per second.
+
+    :param pgn_path: the path of the PGN file
+    :param backend: the board backend used for move generation
+    :param limit: the number of games after which to stop, or None for the whole file
+    :return: a tuple (valid_games, invalid_games)
+    """
+    valid_games = 0
+    invalid_games = 0
+    plies = 0
+
+    start_time = time.perf_counter()
+
+    with open(pgn_path) as pgn_file:
+        for game_index, game in enumerate(read_games(pgn_file)):
+            if limit is not None and game_index >= limit:
+                break
+
+            try:
+                replay_game(game, backend)
+            except ValueError as e:
+                invalid_games += 1
+
+                print(f"game {game_index + 1} ({game.headers.get('White', '?')} - {game.headers.get('Black', '?')}): {e}")
+                continue
+
+            valid_games += 1
+            plies += len(game.moves)
+
+    elapsed = time.perf_counter() - start_time
+    games = valid_games + invalid_games
+
+    print(f"games {games} valid {valid_games} invalid {invalid_games} plies {plies} time {elapsed:.3f}s "
+          f"games/s {games / elapsed if elapsed > 0 else games:.1f} plies/s {int(plies / elapsed) if elapsed > 0 else plies}")
+
+    return valid_games, invalid_games
+
+
+def export_self_play(jsonl_path, pgn_path):
+    """Converts the games written by the self-play runner into a PGN file.
+
+    :param jsonl_path: the JSONL file of the self-play runner
+    :param pgn_path: the PGN file the games are appended to
+    :return: the number of games written
+    """
+    def get_games(jsonl_file):
+        for line in jsonl_file:
+            if line.strip():
+                game = json.loads(line)
+
+                yield get_game_from_moves(game["fen"], game["moves"], {"Event": "Self-play", "Round": str(game["game"] + 1),
+                                                                       "White": const.ENGINE_NAME, "Black": const.ENGINE_NAME,
+                                                                       "Termination": game["termination"]}, game["result"])
+
+    with open(jsonl_path) as jsonl_file, open(pgn_path, "a") as pgn_file:
+        return write_games(pgn_file, get_games(jsonl_file))
+
+
+def get_arguments(arguments):
+    """Parses the command line arguments of the PGN tools.
+
+    :param arguments: the list of arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Reads, verifies and writes PGN game records.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = subparsers.add_parser("replay", help="replay and verify every game of a PGN file")
+    replay_parser.add_argument("pgn", help="the PGN file")
+    replay_parser.add_argument("--backend", choices=const.BOARD_BACKENDS, default=const.BOARD_BACKEND, help="the board backend")
+    replay_parser.add_argument("--limit", type=int, help="stop after this many games")
+
+    export_parser = subparsers.add_parser("export", help="convert self-play games to PGN")
+    export_parser.add_argument("jsonl", help="the JSONL file of the self-play runner")
+    export_parser.add_argument("pgn", help="the PGN file the games are appended to")
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    pgn_arguments = get_arguments(sys.argv[1:])
+
+    if pgn_arguments.command == "replay":
+        sys.exit(0 if replay_file(pgn_arguments.pgn, pgn_arguments.backend, pgn_arguments.limit)[1] == 0 else 1)
+
+    print(f"games {export_self_play(pgn_arguments.jsonl, pgn_arguments.pgn)}")
@@ -0,0 +1,327 @@
+import time
+
+import evaluation
+import move_ordering
+import transposition_table as tt
+
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = 1000000
+
+STOP_CHECK_MASK = 127
+
+
+class SearchStopped(Exception):
+    """Exception raised inside a search when it is asked to stop before finishing."""
+
+
+def score_to_table(score, ply):
+    """Converts a mate score relative to the root into one relative to the stored position.
+
+    :param score: the score of the position
+    :param ply: the distance from the root in plies
+    :return: the score to store in the transposition table
+    """
+    if score > MATE_THRESHOLD:
+        return score + ply
+
+    if score < -MATE_THRESHOLD:
+        return score - ply
+
+    return score
+
+
+def score_from_table(score, ply):
+    """Converts a mate score read from the transposition table back to one relative to the root.
+
+    :param score: the stored score
+    :param ply: the distance from the root in plies
+    :return: the score of the position
+    """
+    if score > MATE_THRESHOLD:
+        return score - ply
+
+    if score < -MATE_THRESHOLD:
+        return score + ply
+
+    return score
+
+
+class SearchResult:
+    """Class holding the outcome of a search."""
+    def __init__(self, best_move, score, depth, nodes, elapsed):
+        """Initializes a search result.
+
+        :param best_move: the best move found as a tuple (starting_position, desired_position, promotion), or None
+        :param score: the score of the best move in centipawns from the point of view of the player to move
+        :param depth: the depth that was searched
+        :param nodes: the number of nodes searched
+        :param elapsed: the time the search took in seconds
+        """
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.nps = int(nodes / elapsed) if elapsed > 0 else nodes
+
+    def __str__(self):
+        return f"depth {self.depth} score cp {self.score} nodes {self.nodes} nps {self.nps} time {int(self.elapsed * 1000)}"
+
+
+class Searcher:
+    """Class searching for the best move with a negamax alpha-beta search followed by a quiescence search."""
+    def __init__(self, evaluate=evaluation.evaluate, transposition_table=None, move_orderer=None):
+        """Initializes a searcher.
+
+        :param evaluate: the static evaluation function, scoring a chess board from the point of view of the player to move
+        :param transposition_table: the table used to reuse the results of positions already searched, or None
+        :param move_orderer: the move orderer keeping the killer moves and the history, by default a new one
+        """
+        self.evaluate = evaluate
+        self.transposition_table = transposition_table
+        self.move_orderer = move_orderer if move_orderer is not None else move_ordering.MoveOrderer()
+        self.stop_event = None
+        self.time_manager = None
+        self.nodes = 0
+        self.root_best_move = None
+        self.root_best_score = -INFINITY
+
+    def check_stop(self):
+        """Stops the search if the stop event was set or the hard deadline was reached, checking it only every few
+        nodes to keep it cheap."""
+        if self.nodes & STOP_CHECK_MASK:
+            return
+
+        if (self.stop_event is not None and self.stop_event.is_set()) or \
+                (self.time_manager is not None and self.time_manager.hard_deadline_reached()):
+            raise SearchStopped()
+
+    def search(self, chess_board, depth, best_move=None):
+        """Searches the current position of a chess game to a fixed depth.
+
+        :param chess_board: the chess game to search, it is restored to the same position when the search ends
+        :param depth: the depth to search to in plies
+        :param best_move: the move to search first, by default the one of the transposition table
+        :return: the search result
+        :raises SearchStopped: if the stop event was set or the hard deadline was reached before the search finished
+        """
+        root_moves = len(chess_board.undo_stack)
+
+        try:
+            return self.search_root(chess_board, depth, best_move)
+        except SearchStopped:
+            while len(chess_board.undo_stack) > root_moves:
+                chess_board.unmake_move()
+
+            raise
+
+    def iterative_deepening(self, chess_board, max_depth, time_manager=None, report=None, start_depth=1):
+        """Searches the current position one ply deeper at a time, each iteration starting with the best move of the
+        previous one, until the maximum depth, the time manager or the stop event ends it.
+
+        :param chess_board: the chess game to search, it is restored to the same position when the search ends
+        :param max_depth: the maximum depth to search to in plies
+        :param time_manager: the time manager deciding when to stop, or None to search without a time limit
+        :param report: a function called with the search result of every finished iteration, or None
+        :param start_depth: the depth of the first iteration
+        :return: the search result with the best move found so far, the nodes of every iteration and the last
+                 depth finished
+        """
+        self.time_manager = time_manager
+        self.move_orderer.new_search()
+
+        best_move = None
+        score = 0
+        finished_depth = 0
+        total_nodes = 0
+        last_iteration_time = 0
+
+        start_time = time.perf_counter()
+
+        try:
+            for depth in range(start_depth, max_depth + 1):
+                if depth > start_depth and time_manager is not None and not time_manager.can_start_iteration(last_iteration_time):
+                    break
+
+                iteration_start_time = time.perf_counter()
+
+                try:
+                    search_result = self.search(chess_board, depth, best_move)
+                except SearchStopped:
+                    total_nodes += self.nodes
+
+                    # The previous best move is searched first, so a move that beat it is at least as good.
+                    if self.root_best_move is not None:
+                        best_move, score = self.root_best_move, self.root_best_score
+
+                    break
+
+                total_nodes += search_result.nodes
+                last_iteration_time = time.perf_counter() - iteration_start_time
+
+                if search_result.best_move is None:
+                    score = search_result.score
+                    break
+
+                best_move, score, finished_depth = search_result.best_move, search_result.score, depth
+
+                if report is not None:
+                    report(SearchResult(best_move, score, depth, total_nodes, time.perf_counter() - start_time))
+
+                if abs(score) > MATE_THRESHOLD or (time_manager is not None and len(chess_board.get_legal_moves()) == 1):
+                    break
+        finally:
+            self.time_manager = None
+
+        if best_move is None:
+            legal_moves = self.move_orderer.order_captures(chess_board, chess_board.get_legal_moves())
+            best_move = legal_moves[0] if legal_moves else None
+
+        return SearchResult(best_move, score, finished_depth, total_nodes, time.perf_counter() - start_time)
+
+    def search_root(self, chess_board, depth, best_move=None):
+        """Searches every move of the root position and keeps the best one. The best move of the moves searched so
+        far is kept in root_best_move, so it can still be played if the search is stopped.
+
+        :param chess_board: the chess game to search
+        :param depth: the depth to search to in plies
+        :param best_move: the move to search first, by default the one of the transposition table
+        :return: the search result
+        """
+        self.nodes = 1
+        self.root_best_move = None
+        self.root_best_score = -INFINITY
+
+        start_time = time.perf_counter()
+
+        moves = chess_board.get_legal_moves()
+
+        if best_move is None and self.transposition_table is not None:
+            table_entry = self.transposition_table.probe(chess_board.hash)
+            best_move = table_entry and table_entry[3]
+
+        for move in self.move_orderer.get_moves(chess_board, moves, 0, best_move):
+            chess_board.make_move(*move)
+            score = -self.negamax(chess_board, depth - 1, -INFINITY, -self.root_best_score, 1)
+            chess_board.unmake_move()
+
+            if score > self.root_best_score:
+                self.root_best_move, self.root_best_score = move, score
+
+        best_move, best_score = self.root_best_move, self.root_best_score
+
+        if best_move is None:
+            best_score = -MATE_SCORE if chess_board.king_in_check() else 0
+        elif self.transposition_table is not None:
+            self.transposition_table.store(chess_board.hash, depth, tt.EXACT, best_score, best_move)
+
+        return SearchResult(best_move, best_score, depth, self.nodes, time.perf_counter() - start_time)
+
+    def negamax(self, chess_board, depth, alpha, beta, ply):
+        """Searches a position with alpha-beta pruning.
+
+        :param chess_board: the chess game to search
+        :param depth: the remaining depth in plies
+        :param alpha: the lower bound of the score
+        :param beta: the upper bound of the score
+        :param ply: the distance from the root in plies
+        :return: the score of the position from the point of view of the player to move
+        """
+        if depth <= 0:
+            return self.quiescence(chess_board, alpha, beta, ply)
+
+        self.nodes += 1
+        self.check_stop()
+
+        if chess_board.is_repetition(2) or chess_board.is_fifty_move_draw():
+            return 0
+
+        original_alpha = alpha
+        table_move = None
+
+        if self.transposition_table is not None:
+            table_entry = self.transposition_table.probe(chess_board.hash)
+
+            if table_entry is not None:
+                table_depth, bound, table_score, table_move = table_entry
+
+                if table_depth >= depth:
+                    table_score = score_from_table(table_score, ply)
+
+                    if bound == tt.EXACT:
+                        return table_score
+
+                    if bound == tt.LOWER_BOUND:
+                        alpha = max(alpha, table_score)
+                    else:
+                        beta = min(beta, table_score)
+
+                    if alpha >= beta:
+                        return table_score
+
+        moves = chess_board.get_legal_moves()
+
+        if not moves:
+            return -MATE_SCORE + ply if chess_board.king_in_check() else 0
+
+        best_score = -INFINITY
+        best_move = None
+
+        for move_number, move in enumerate(self.move_orderer.get_moves(chess_board, moves, ply, table_move)):
+            chess_board.make_move(*move)
+            score = -self.negamax(chess_board, depth - 1, -beta, -alpha, ply + 1)
+            chess_board.unmake_move()
+
+            if score > best_score:
+                best_score, best_move = score, move
+
+            if score > alpha:
+                alpha = score
+
+            if alpha >= beta:
+                self.move_orderer.record_cutoff(chess_board, move, ply, depth, move_number)
+                break
+
+        if self.transposition_table is not None:
+            if best_score <= original_alpha:
+                bound = tt.UPPER_BOUND
+            elif best_score >= beta:
+                bound = tt.LOWER_BOUND
+            else:
+                bound = tt.EXACT
+
+            self.transposition_table.store(chess_board.hash, depth, bound, score_to_table(best_score, ply), best_move)
+
+        return best_score
+
+    def quiescence(self, chess_board, alpha, beta, ply):
+        """Searches only the captures of a position until it is quiet, so the evaluation is not done mid exchange.
+
+        :param chess_board: the chess game to search
+        :param alpha: the lower bound of the score
+        :param beta: the upper bound of the score
+        :param ply: the distance from the root in plies
+        :return: the score of the position from the point of view of the player to move
+        """
+        self.nodes += 1
+        self.check_stop()
+
+        stand_pat = self.evaluate(chess_board)
+
+        if stand_pat >= beta:
+            return stand_pat
+
+        alpha = max(alpha, stand_pat)
+
+        for move in self.move_orderer.order_captures(chess_board, chess_board.get_legal_moves(captures_only=True)):
+            chess_board.make_move(*move)
+            score = -self.quiescence(chess_board, -beta, -alpha, ply + 1)
+            chess_board.unmake_move()
+
+            if score >= beta:
+                return score
+
+            alpha = max(alpha, score)
+
+        return alpha
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import chess_engine as ce
+import constants as const
+import format_conversions as fc
+import instrumentation
+import search
+import transposition_table as tt
+
+
+def get_game_ending(chess_board):
+    """Gets how a game ended in its current position, also when it starts from a finished position.
+
+    :param chess_board: the chess game
+    :return: the reason the game ended, like 'Checkmate', or None if it goes on
+    """
+    if chess_board.game_ended is not None:
+        return chess_board.game_ended
+
+    if not chess_board.get_legal_moves():
+        return "Checkmate" if chess_board.king_in_check() else "Stalemate"
+
+    return chess_board.get_draw_reason()
+
+
+def get_game_result(chess_board):
+    """Gets the result of a game in PGN notation.
+
+    :param chess_board: the chess game
+    :return: a tuple (result, termination) like ('1-0', 'Checkmate'), with '*' for games that did not end
+    """
+    if chess_board.game_ended == "Checkmate":
+        return ("0-1" if chess_board.white_turn else "1-0"), chess_board.game_ended
+
+    if chess_board.game_ended is not None:
+        return "1/2-1/2", chess_board.game_ended
+
+    return "*", "Move limit"
+
+
+def play_game(game_index, fen, depth, max_moves, backend=const.BOARD_BACKEND, tt_size_mb=const.SELF_PLAY_TT_SIZE_MB,
+              instrument=False, random_plies=const.SELF_PLAY_RANDOM_PLIES, seed=const.SELF_PLAY_SEED):
+    """Plays a game of the engine against itself. Runs inside a worker process, which owns the board and the search.
+    The search being the same for every game, the first plies are random moves drawn from the seed and the number of the
+    game, so the games from the same position differ.
+
+    :param game_index: the number of the game
+    :param fen: the starting position as a FEN string
+    :param depth: the search depth of every move in plies
+    :param max_moves: the number of plies after which the game is stopped
+    :param backend: the board backend used for move generation
+    :param tt_size_mb: the size of the transposition table of the game in megabytes
+    :param instrument: if the engine counters and timers of the game are added to it
+    :param random_plies: the number of random moves the game starts with
+    :param seed: the seed of the random moves, combined with the number of the game
+    :return: a map describing the game, ready to be written as JSON
+    """
+    if instrument:
+        instrumentation.enable()
+
+    chess_board = ce.ChessBoard("player", fen, backend)
+    chess_board.game_ended = get_game_ending(chess_board)
+    searcher = search.Searcher(transposition_table=tt.TranspositionTable(tt_size_mb))
+    move_random = random.Random(f"{seed}:{game_index}")
+
+    moves = []
+    move_times = []
+    nodes = 0
+
+    start_time = time.perf_counter()
+
+    while chess_board.game_ended is None and len(moves) < min(random_plies, max_moves):
+        move = move_random.choice(chess_board.get_legal_moves())
+
+        chess_board.game_logic(*move)
+
+        moves.append(fc.get_move_notation(move))
+        move_times.append(0.0)
+
+    while chess_board.game_ended is None and len(moves) < max_moves:
+        move_start_time = time.perf_counter()
+
+        search_result = searcher.search(chess_board, depth)
+
+        if search_result.best_move is None:
+            break
+
+        chess_board.game_logic(*search_result.best_move)
+
+        moves.append(fc.get_move_notation(search_result.best_move))
+        move_times.append(round(time.perf_counter() - move_start_time, 4))
+        nodes += search_result.nodes
+
+    result, termination = get_game_result(chess_board)
+
+    game = {"game": game_index, "fen": fen, "moves": moves, "random_plies": min(random_plies, len(moves)),
+            "result": result, "termination": termination,
+            "final_fen": chess_board.to_fen(), "move_times": move_times, "nodes": nodes,
+            "time": round(time.perf_counter() - start_time, 4), "worker": os.getpid()}
+
+    if instrument:
+        instrumentation.disable()
+
+        game["instrumentation"] = instrumentation.get_snapshot()
+
+    return game
+
+
+def run_self_play(games, fens, output_path, workers=None, depth=const.SELF_PLAY_DEPTH, max_moves=const.SELF_PLAY_MAX_MOVES,
+                  backend=const.BOARD_BACKEND, instrument=False, random_plies=const.SELF_PLAY_RANDOM_PLIES,
+                  seed=const.SELF_PLAY_SEED):
+    """Plays engine against engine games across a pool of worker processes and streams them to a JSONL file.
+
+    :param games: the number of games to play
+    :param fens: the starting positions, used in turn by the games
+    :param output_path: the JSONL file the games are appended to as soon as they finish
+    :param workers: the number of worker processes, by default the number of processors
+    :param depth: the search depth of every move in plies
+    :param max_moves: the number of plies after which a game is stopped
+    :param backend: the board backend used for move generation
+    :param instrument: if the engine counters and timers of every game are added to it
+    :param random_plies: the number of random moves every game starts with
+    :param seed: the seed of the random moves
+    :return: a map counting the results of the games
+    """
+    results = {}
+
+    start_time = time.perf_counter()
+
+    with open(output_path, "a") as output_file, ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_game, game_index, fens[game_index % len(fens)], depth, max_moves, backend,
+                                   instrument=instrument, random_plies=random_plies, seed=seed)
+                   for game_index in range(games)]
+
+        for finished_games, future in enumerate(as_completed(futures), 1):
+            game = future.result()
+
+            output_file.write(json.dumps(game) + "\n")
+            output_file.flush()
+
+            results[game["result"]] = results.get(game["result"], 0) + 1
+
+            print(f"game {game['game']} {game['result']} ({game['termination']}) in {len(game['moves'])} plies, "
+                  f"{finished_games}/{games} done after {time.perf_counter() - start_time:.1f}s")
+
+    return results
+
+
+def read_fens(fens_path):
+    """Reads the starting positions of the games, one FEN string per line.
+
+    :param fens_path: the path of the file, or None for the standard starting position
+    :return: a list of FEN strings
+    """
+    if fens_path is None:
+        return [const.STARTING_FEN]
+
+    with open(fens_path) as fens_file:
+        fens = [line.strip() for line in fens_file if line.strip() and not line.startswith("#")]
+
+    for fen in fens:
+        ce.get_fen_fields(fen)
+
+    return fens
+
+
+def get_arguments(arguments):
+    """Parses the command line arguments of the self-play runner.
+
+    :param arguments: the list of arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Plays engine against engine games without the graphical interface.")
+
+    parser.add_argument("--games", type=int, default=os.cpu_count() or 1, help="the number of games to play")
+    parser.add_argument("--fens", help="a file with one starting FEN per line, by default the standard starting position")
+    parser.add_argument("--output", default="self_play.jsonl", help="the JSONL file the finished games are appended to")
+    parser.add_argument("--workers", type=int, help="the number of worker processes, by default one per processor")
+    parser.add_argument("--depth", type=int, default=const.SELF_PLAY_DEPTH, help="the search depth of every move")
+    parser.add_argument("--max-moves", type=int, default=const.SELF_PLAY_MAX_MOVES, help="the plies after which a game is stopped")
+    parser.add_argument("--backend", choices=const.BOARD_BACKENDS, default=const.BOARD_BACKEND, help="the board backend")
+    parser.add_argument("--instrument", action="store_true", help="add the engine counters and timers to every game")
+    parser.add_argument("--random-plies", type=int, default=const.SELF_PLAY_RANDOM_PLIES,
+                        help="the number of random moves every game starts with, so the games differ")
+    parser.add_argument("--seed", type=int, default=const.SELF_PLAY_SEED, help="the seed of the random moves")
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    self_play_arguments = get_arguments(sys.argv[1:])
+
+    game_results = run_self_play(self_play_arguments.games, read_fens(self_play_arguments.fens), self_play_arguments.output,
+                                 self_play_arguments.workers, self_play_arguments.depth, self_play_arguments.max_moves,
+                                 self_play_arguments.backend, self_play_arguments.instrument,
+                                 self_play_arguments.random_plies, self_play_arguments.seed)
+
+    print(" ".join(f"{result}: {count}" for result, count in sorted(game_results.items())))
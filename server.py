@@ -0,0 +1,690 @@
+import argparse
+import asyncio
+import collections
+import json
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import chess_engine as ce
+import constants as const
+import format_conversions as fc
+import parallel_search as ps
+import search
+import time_manager as tm
+import transposition_table as tt
+
+# The commands working on a session of the connection, given by the session field of the request.
+SESSION_COMMANDS = ["move", "ai", "state", "close"]
+
+# The searcher of a worker process of the pool, kept between the moves so its transposition table is reused.
+_worker_searcher = None
+
+
+def search_move(fen, position_counts, backend, max_depth, move_time):
+    """Searches the best move of a position. Runs inside a worker process of the pool, so the event loop of the
+    server keeps answering the other sessions.
+
+    :param fen: the position to search
+    :param position_counts: the position counts of the game, so the repetitions of the moves before it are seen
+    :param backend: the board backend used for move generation
+    :param max_depth: the maximum depth to search to in plies
+    :param move_time: the time the move can take in seconds
+    :return: a tuple (move, depth, nodes), the move in coordinate notation or None if there is no legal move
+    """
+    global _worker_searcher
+
+    if _worker_searcher is None:
+        _worker_searcher = search.Searcher(transposition_table=tt.TranspositionTable(const.SERVER_TT_SIZE_MB))
+
+    chess_board = ce.ChessBoard("player", fen, backend)
+    chess_board.position_counts = dict(position_counts)
+
+    search_result = _worker_searcher.iterative_deepening(chess_board, max_depth, tm.TimeManager.from_move_time(move_time))
+
+    if search_result.best_move is None:
+        return None, search_result.depth, search_result.nodes
+
+    return fc.get_move_notation(search_result.best_move), search_result.depth, search_result.nodes
+
+
+def get_object_size(value, seen=None):
+    """Estimates the memory used by an object and everything it holds, each object being counted once.
+
+    :param value: the object to measure
+    :param seen: the ids of the objects already counted
+    :return: the size in bytes
+    """
+    if seen is None:
+        seen = set()
+
+    if id(value) in seen:
+        return 0
+
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        size += sum(get_object_size(key, seen) + get_object_size(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(get_object_size(item, seen) for item in value)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        size += get_object_size(vars(value), seen)
+
+    return size
+
+
+def get_latency_summary(latencies):
+    """Summarizes request latencies.
+
+    :param latencies: the latencies in seconds
+    :return: a map with the count, the mean, the median, the 95th percentile and the maximum in milliseconds
+    """
+    if not latencies:
+        return {"count": 0}
+
+    latencies = sorted(latencies)
+
+    return {"count": len(latencies), "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+            "p95_ms": round(latencies[min(len(latencies) - 1, len(latencies) * 95 // 100)] * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3)}
+
+
+def get_move(request):
+    """Gets the move of a request, given in coordinate notation like {"move": "e7e8q"} or as board coordinates like
+    {"from": [6, 4], "to": [4, 4], "promotion": "Q"}.
+
+    :param request: the request map
+    :return: a tuple (starting_position, desired_position, promotion)
+    """
+    if "move" in request:
+        notation = request["move"]
+
+        if not isinstance(notation, str) or len(notation) not in [4, 5]:
+            raise ValueError(f"invalid move: {notation}")
+
+        return fc.get_move_from_notation(notation.lower())
+
+    starting_position, desired_position = tuple(request["from"]), tuple(request["to"])
+
+    for position in [starting_position, desired_position]:
+        if len(position) != 2 or not all(isinstance(value, int) and 0 <= value < const.RANKS for value in position):
+            raise ValueError(f"invalid position: {list(position)}")
+
+    return starting_position, desired_position, request.get("promotion")
+
+
+class GameSession:
+    """Class holding one game of the server, with the latencies of its requests."""
+    def __init__(self, session_id, fen=const.STARTING_FEN, backend=const.BOARD_BACKEND, ai_color=None):
+        """Initializes a session with a new game.
+
+        :param session_id: the number of the session
+        :param fen: the starting position as a FEN string
+        :param backend: the board backend used for move generation
+        :param ai_color: the color played by the engine, or None if both sides are played by the client
+        """
+        self.session_id = session_id
+        self.chess_board = ce.ChessBoard("player", fen, backend)
+
+        self.backend = backend
+        self.chess_board.ai_color = ai_color
+        self.moves = []
+        self.latencies = collections.deque(maxlen=const.SERVER_LATENCY_SAMPLES)
+        self.ai_latencies = collections.deque(maxlen=const.SERVER_LATENCY_SAMPLES)
+        self.requests = 0
+        self.created_time = time.monotonic()
+
+    def is_ai_turn(self):
+        """Checks if the engine plays the next move.
+
+        :return: if the game goes on and the side to move is played by the engine
+        """
+        return self.chess_board.game_ended is None and self.chess_board.ai_color is not None and \
+            (self.chess_board.ai_color is fc.Colors.White) == self.chess_board.white_turn
+
+    def play_move(self, move):
+        """Plays a move through the logic of the game, which only makes legal moves.
+
+        :param move: a tuple (starting_position, desired_position, promotion)
+        :return: the move in coordinate notation
+        """
+        if self.chess_board.game_ended is not None:
+            raise ValueError("the game ended")
+
+        starting_position, desired_position, promotion = move
+
+        if promotion is not None and promotion not in const.PROMOTION_PIECES:
+            raise ValueError(f"invalid promotion: {promotion}")
+
+        made_moves = len(self.chess_board.undo_stack)
+
+        self.chess_board.game_logic(starting_position, desired_position, promotion or "Q")
+
+        if len(self.chess_board.undo_stack) == made_moves:
+            raise ValueError(f"illegal move: {fc.get_move_notation(move)}")
+
+        notation = fc.get_move_notation((starting_position, desired_position, self.chess_board.undo_stack[-1].promotion))
+
+        self.moves.append(notation)
+
+        return notation
+
+    def get_memory(self):
+        """Estimates the memory held by the session.
+
+        :return: the size in bytes
+        """
+        return get_object_size(self)
+
+    def get_state(self, legal_moves=False):
+        """Describes the game of the session.
+
+        :param legal_moves: if the legal moves of the side to move are added
+        :return: a map ready to be sent as JSON
+        """
+        state = {"session": self.session_id, "fen": self.chess_board.to_fen(), "moves": len(self.moves),
+                 "game_ended": self.chess_board.game_ended}
+
+        if legal_moves:
+            state["legal_moves"] = [fc.get_move_notation(move) for move in self.chess_board.get_legal_moves()] \
+                if self.chess_board.game_ended is None else []
+
+        return state
+
+
+class GameServer:
+    """Class serving many chess games at once over local TCP connections.
+
+    Every request and every response is one line of JSON. The games live in memory as sessions owned by the
+    connection that created them, and are removed when it closes. The moves of the clients are checked by the logic
+    of the game on the event loop, while the moves of the engine are searched by a pool of worker processes.
+    """
+    def __init__(self, workers=None, max_depth=const.SERVER_AI_MAX_DEPTH, move_time=const.SERVER_AI_MOVE_TIME,
+                 max_sessions=const.SERVER_MAX_SESSIONS):
+        """Initializes the server without listening yet.
+
+        :param workers: the number of worker processes searching the moves of the engine, by default one per processor
+        :param max_depth: the maximum depth of the moves of the engine in plies
+        :param move_time: the time a move of the engine can take in seconds
+        :param max_sessions: the number of sessions the server holds at most
+        """
+        self.workers = workers
+        self.max_depth = max_depth
+        self.move_time = move_time
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.next_session_id = 1
+        self.connections = 0
+        self.finished_sessions = 0
+        self.requests = 0
+        self.latencies = collections.deque(maxlen=const.SERVER_STATS_SAMPLES)
+        self.ai_latencies = collections.deque(maxlen=const.SERVER_STATS_SAMPLES)
+        self.executor = None
+        self.server = None
+        self.start_time = time.monotonic()
+
+    async def start(self, host=const.SERVER_HOST, port=const.SERVER_PORT):
+        """Starts the worker processes and listens for connections.
+
+        :param host: the address to listen on
+        :param port: the port to listen on, 0 choosing a free one
+        :return: the port listened on
+        """
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(ps.START_METHOD))
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=const.SERVER_MAX_LINE)
+
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stops listening and stops the worker processes."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        """Answers the requests of a connection one after the other, until it closes.
+
+        :param reader: the stream the requests are read from
+        :param writer: the stream the responses are written to
+        """
+        session_ids = set()
+        self.connections += 1
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+
+                if not line:
+                    break
+
+                if not line.strip():
+                    continue
+
+                start_time = time.perf_counter()
+                request = {}
+
+                try:
+                    request = json.loads(line)
+
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be a JSON object")
+
+                    response = await self.handle_request(request, session_ids)
+                    response["ok"] = True
+                except (ValueError, KeyError, TypeError, IndexError) as e:
+                    request = request if isinstance(request, dict) else {}
+
+                    response = {"ok": False, "error": str(e) if not isinstance(e, KeyError) else f"missing field {e}"}
+
+                if "id" in request:
+                    response["id"] = request["id"]
+
+                latency = time.perf_counter() - start_time
+                session = self.sessions.get(request.get("session"))
+
+                self.requests += 1
+                self.latencies.append(latency)
+
+                if session is not None:
+                    session.requests += 1
+                    session.latencies.append(latency)
+
+                writer.write(json.dumps(response).encode() + b"\n")
+
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    break
+        finally:
+            for session_id in session_ids:
+                self.remove_session(session_id)
+
+            self.connections -= 1
+            writer.close()
+
+    def get_session(self, request, session_ids):
+        """Gets the session of a request, which must belong to the connection.
+
+        :param request: the request map
+        :param session_ids: the ids of the sessions of the connection
+        :return: the session
+        """
+        if request["session"] not in session_ids:
+            raise ValueError(f"unknown session: {request['session']}")
+
+        return self.sessions[request["session"]]
+
+    def remove_session(self, session_id):
+        """Removes a session from the memory of the server.
+
+        :param session_id: the id of the session
+        """
+        if self.sessions.pop(session_id, None) is not None:
+            self.finished_sessions += 1
+
+    async def play_ai_move(self, session):
+        """Plays the move of the engine in a session, searched by a worker process.
+
+        :param session: the session
+        :return: a map with the move of the engine, its depth and nodes
+        """
+        start_time = time.perf_counter()
+        chess_board = session.chess_board
+        hash_before = chess_board.hash
+
+        notation, depth, nodes = await asyncio.get_running_loop().run_in_executor(
+            self.executor, search_move, chess_board.to_fen(), chess_board.position_counts, session.backend,
+            self.max_depth, self.move_time)
+
+        # The requests of a connection are answered one at a time, so the game cannot have changed while searching.
+        if notation is None or chess_board.hash != hash_before:
+            return {"ai_move": None}
+
+        session.play_move(fc.get_move_from_notation(notation))
+        session.ai_latencies.append(time.perf_counter() - start_time)
+        self.ai_latencies.append(session.ai_latencies[-1])
+
+        return {"ai_move": notation, "ai_depth": depth, "ai_nodes": nodes}
+
+    async def handle_request(self, request, session_ids):
+        """Answers a request.
+
+        The commands are new (with an optional fen, backend and ai color), move (with a session and a move), ai (with
+        a session, making the engine play the side to move), state, close and stats (with an optional memory flag).
+
+        :param request: the request map
+        :param session_ids: the ids of the sessions of the connection, changed by the new and close commands
+        :return: the response map
+        """
+        command = request["command"]
+        legal_moves = bool(request.get("legal_moves", False))
+
+        if command == "new":
+            if len(self.sessions) >= self.max_sessions:
+                raise ValueError("too many sessions")
+
+            backend = request.get("backend", const.BOARD_BACKEND)
+            ai_color = request.get("ai")
+
+            if ai_color not in [None, "white", "black"]:
+                raise ValueError(f"invalid ai color: {ai_color}")
+
+            session = GameSession(self.next_session_id, request.get("fen", const.STARTING_FEN), backend,
+                                  None if ai_color is None else fc.Colors.White if ai_color == "white" else fc.Colors.Black)
+
+            self.next_session_id += 1
+
+            # The session is only kept once its position was checked and the engine played its first move, if any.
+            response = await self.play_ai_move(session) if session.is_ai_turn() else {}
+            response.update(session.get_state(legal_moves))
+
+            self.sessions[session.session_id] = session
+            session_ids.add(session.session_id)
+
+            return response
+
+        if command == "stats":
+            return self.get_stats(bool(request.get("memory", False)))
+
+        if command not in SESSION_COMMANDS:
+            raise ValueError(f"unknown command: {command}")
+
+        session = self.get_session(request, session_ids)
+
+        if command == "move":
+            if session.is_ai_turn():
+                raise ValueError("it is the turn of the engine")
+
+            response = {"move": session.play_move(get_move(request))}
+
+            if session.is_ai_turn():
+                response.update(await self.play_ai_move(session))
+
+            return {**response, **session.get_state(legal_moves)}
+
+        if command == "ai":
+            if session.chess_board.game_ended is not None:
+                raise ValueError("the game ended")
+
+            return {**(await self.play_ai_move(session)), **session.get_state(legal_moves)}
+
+        if command == "state":
+            state = session.get_state(legal_moves)
+
+            state["latency"] = get_latency_summary(session.latencies)
+            state["ai_latency"] = get_latency_summary(session.ai_latencies)
+            state["memory"] = session.get_memory()
+
+            return state
+
+        session_ids.discard(session.session_id)
+        self.remove_session(session.session_id)
+
+        return {"session": session.session_id}
+
+    def get_stats(self, memory=False):
+        """Describes the load of the server.
+
+        :param memory: if the memory of every session is measured, which takes time with many sessions
+        :return: a map with the sessions, the connections, the latencies of the last requests and engine moves and the
+                 memory of the sessions
+        """
+        stats = {"sessions": len(self.sessions), "finished_sessions": self.finished_sessions,
+                 "connections": self.connections, "requests": self.requests,
+                 "uptime": round(time.monotonic() - self.start_time, 3), "latency": get_latency_summary(self.latencies),
+                 "ai_latency": get_latency_summary(self.ai_latencies)}
+
+        if memory:
+            session_memory = [session.get_memory() for session in self.sessions.values()]
+
+            stats["memory"] = sum(session_memory)
+            stats["memory_per_session"] = round(sum(session_memory) / len(session_memory)) if session_memory else 0
+
+        return stats
+
+
+class GameClient:
+    """Class talking to the game server over one connection, measuring the latency of every request."""
+    def __init__(self, reader, writer):
+        """Initializes a client over an open connection.
+
+        :param reader: the stream the responses are read from
+        :param writer: the stream the requests are written to
+        """
+        self.reader = reader
+        self.writer = writer
+        self.next_request_id = 1
+        self.latencies = []
+
+    @staticmethod
+    async def connect(host=const.SERVER_HOST, port=const.SERVER_PORT):
+        """Opens a connection to the server.
+
+        :param host: the address of the server
+        :param port: the port of the server
+        :return: the client
+        """
+        reader, writer = await asyncio.open_connection(host, port, limit=const.SERVER_MAX_LINE)
+
+        return GameClient(reader, writer)
+
+    async def request(self, command, **fields):
+        """Sends a request and waits for its response.
+
+        :param command: the command of the request
+        :param fields: the other fields of the request
+        :return: the response map
+        """
+        request = {"id": self.next_request_id, "command": command, **fields}
+        self.next_request_id += 1
+
+        start_time = time.perf_counter()
+
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+
+        line = await self.reader.readline()
+
+        if not line:
+            raise ConnectionError("the server closed the connection")
+
+        self.latencies.append(time.perf_counter() - start_time)
+
+        return json.loads(line)
+
+    async def close(self):
+        """Closes the connection."""
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def simulate_client(host, port, sessions, max_moves, ai_share, seed, ready_clients, start_event):
+    """Plays random games on one connection. All its sessions are created first and wait for the other connections,
+    so the server holds every session at the same time, then they move in turn until every game ended or reached the
+    move limit.
+
+    :param host: the address of the server
+    :param port: the port of the server
+    :param sessions: the number of games played on the connection
+    :param max_moves: the plies after which a game is closed
+    :param ai_share: the share of the games played against the engine
+    :param seed: the seed of the random moves
+    :param ready_clients: the list the client is added to once its sessions are created
+    :param start_event: the event set when the games can start
+    :return: a tuple (client, games, plies, errors)
+    """
+    random_generator = random.Random(seed)
+    client = await GameClient.connect(host, port)
+    games = {}
+    plies = 0
+    errors = 0
+
+    for _ in range(sessions):
+        ai_color = random_generator.choice(["white", "black"]) if random_generator.random() < ai_share else None
+        response = await client.request("new", ai=ai_color, legal_moves=True)
+
+        games[response["session"]] = response
+
+    ready_clients.append(client)
+    await start_event.wait()
+
+    while games:
+        for session_id, state in list(games.items()):
+            if state["game_ended"] is not None or not state["legal_moves"] or state["moves"] >= max_moves:
+                await client.request("close", session=session_id)
+                del games[session_id]
+                continue
+
+            response = await client.request("move", session=session_id, move=random_generator.choice(state["legal_moves"]),
+                                            legal_moves=True)
+
+            if not response["ok"]:
+                errors += 1
+                await client.request("close", session=session_id)
+                del games[session_id]
+                continue
+
+            plies += 1 + (response.get("ai_move") is not None)
+            games[session_id] = response
+
+    await client.close()
+
+    return client, sessions, plies, errors
+
+
+async def run_simulation(host, port, clients, sessions, max_moves, ai_share, seed=None, local=False, workers=None):
+    """Drives concurrent random games against the server and prints the throughput, the latencies seen by the clients
+    and the statistics of the server while all the sessions are open.
+
+    :param host: the address of the server
+    :param port: the port of the server
+    :param clients: the number of concurrent connections
+    :param sessions: the number of games of every connection
+    :param max_moves: the plies after which a game is closed
+    :param ai_share: the share of the games played against the engine
+    :param seed: the seed of the random moves, or None for a random one
+    :param local: if a server is started in this process on a free port instead of connecting to a running one
+    :param workers: the number of worker processes of the local server
+    :return: the statistics of the server at the end
+    """
+    game_server = None
+
+    if local:
+        game_server = GameServer(workers)
+        port = await game_server.start(host, 0)
+
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    ready_clients = []
+    start_event = asyncio.Event()
+
+    try:
+        start_time = time.perf_counter()
+        simulation = asyncio.gather(*[simulate_client(host, port, sessions, max_moves, ai_share, seed + client_index,
+                                                      ready_clients, start_event)
+                                      for client_index in range(clients)])
+
+        # The memory is measured once every connection created its sessions, before any of them is closed.
+        monitor = await GameClient.connect(host, port)
+
+        while len(ready_clients) < clients and not simulation.done():
+            await asyncio.sleep(const.SERVER_MONITOR_INTERVAL)
+
+        peak_stats = await monitor.request("stats", memory=True)
+        start_event.set()
+
+        results = await simulation
+        elapsed = time.perf_counter() - start_time
+
+        final_stats = await monitor.request("stats")
+        await monitor.close()
+    finally:
+        if game_server is not None:
+            await game_server.close()
+
+    plies = sum(result[2] for result in results)
+
+    print(f"clients {clients} games {sum(result[1] for result in results)} plies {plies} errors "
+          f"{sum(result[3] for result in results)} time {elapsed:.3f}s plies/s {plies / elapsed:.0f}")
+    print(f"client latency {json.dumps(get_latency_summary([latency for result in results for latency in result[0].latencies]))}")
+    print(f"peak sessions {peak_stats['sessions']} memory {peak_stats.get('memory', 0)} bytes, "
+          f"{peak_stats.get('memory_per_session', 0)} per session")
+    print(f"server {json.dumps(final_stats)}")
+
+    return final_stats
+
+
+async def run_server(host, port, workers, max_depth, move_time, max_sessions):
+    """Runs the server until it is interrupted.
+
+    :param host: the address to listen on
+    :param port: the port to listen on
+    :param workers: the number of worker processes searching the moves of the engine
+    :param max_depth: the maximum depth of the moves of the engine in plies
+    :param move_time: the time a move of the engine can take in seconds
+    :param max_sessions: the number of sessions the server holds at most
+    """
+    game_server = GameServer(workers, max_depth, move_time, max_sessions)
+    listening_port = await game_server.start(host, port)
+
+    print(f"listening on {host}:{listening_port}")
+
+    try:
+        await game_server.server.serve_forever()
+    finally:
+        await game_server.close()
+
+
+def get_arguments(arguments):
+    """Parses the command line arguments of the game server.
+
+    :param arguments: the list of arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Serves many chess games at once, or simulates clients playing them.")
+    parser.add_argument("--host", default=const.SERVER_HOST, help="the address of the server")
+    parser.add_argument("--port", type=int, default=const.SERVER_PORT, help="the port of the server")
+    parser.add_argument("--workers", type=int, help="the number of worker processes, by default one per processor")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="run the server")
+    serve_parser.add_argument("--depth", type=int, default=const.SERVER_AI_MAX_DEPTH, help="the maximum depth of the engine")
+    serve_parser.add_argument("--move-time", type=float, default=const.SERVER_AI_MOVE_TIME,
+                              help="the time of a move of the engine in seconds")
+    serve_parser.add_argument("--max-sessions", type=int, default=const.SERVER_MAX_SESSIONS,
+                              help="the number of sessions held at most")
+
+    simulate_parser = subparsers.add_parser("simulate", help="play random games against a server")
+    simulate_parser.add_argument("--clients", type=int, default=10, help="the number of concurrent connections")
+    simulate_parser.add_argument("--sessions", type=int, default=10, help="the number of games of every connection")
+    simulate_parser.add_argument("--max-moves", type=int, default=40, help="the plies after which a game is closed")
+    simulate_parser.add_argument("--ai-share", type=float, default=0.0, help="the share of the games against the engine")
+    simulate_parser.add_argument("--seed", type=int, help="the seed of the random moves")
+    simulate_parser.add_argument("--local", action="store_true", help="start a server in this process on a free port")
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    server_arguments = get_arguments(sys.argv[1:])
+
+    try:
+        if server_arguments.command == "serve":
+            asyncio.run(run_server(server_arguments.host, server_arguments.port, server_arguments.workers,
+                                   server_arguments.depth, server_arguments.move_time, server_arguments.max_sessions))
+        else:
+            asyncio.run(run_simulation(server_arguments.host, server_arguments.port, server_arguments.clients,
+                                       server_arguments.sessions, server_arguments.max_moves, server_arguments.ai_share,
+                                       server_arguments.seed, server_arguments.local, server_arguments.workers))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,192 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+import constants as const
+
+# Raised whenever the layout of the cache files changes, so the old files are rebuilt.
+CACHE_VERSION = 1
+CACHE_MAGIC = b"CETABLES"
+
+# The header of a cache file: the magic, the version, the fingerprint of what the tables were built from and the
+# number of tables. Every table then has a header with its name, the offset of its values in the file and its shape,
+# and its values are 64-bit integers.
+HEADER = struct.Struct("<8sIIQ")
+TABLE_HEADER = struct.Struct("<32sQQQ")
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+_load_reports = []
+
+
+def get_cache_directory():
+    """Gets the directory of the cache files.
+
+    :return: the absolute path of the directory, relative ones being taken from the directory of the engine
+    """
+    return os.path.join(PACKAGE_DIRECTORY, const.CACHE_DIRECTORY)
+
+
+def get_fingerprint(source_path, *values):
+    """Fingerprints what a set of tables is built from, so a cache file built from something else is not used.
+
+    :param source_path: the path of the module building the tables, its size and modification time being part of it
+    :param values: the constants the tables depend on
+    :return: a 32-bit fingerprint
+    """
+    source_stat = os.stat(source_path)
+
+    return zlib.crc32(repr((CACHE_VERSION, source_stat.st_size, source_stat.st_mtime_ns) + values).encode())
+
+
+def read_tables(cache_path, fingerprint):
+    """Reads the tables of a cache file through a memory map.
+
+    :param cache_path: the path of the cache file
+    :param fingerprint: the fingerprint the tables must have been built with
+    :return: a map from the table names to their values as lists, or lists of lists for 2D tables, or None if the file
+             is missing, damaged or built from something else
+    """
+    try:
+        with open(cache_path, "rb") as cache_file, mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ) as cache_map:
+            magic, version, file_fingerprint, table_count = HEADER.unpack_from(cache_map)
+
+            if magic != CACHE_MAGIC or version != CACHE_VERSION or file_fingerprint != fingerprint:
+                return None
+
+            tables = {}
+
+            for table_index in range(table_count):
+                name, offset, rows, columns = TABLE_HEADER.unpack_from(cache_map, HEADER.size + table_index * TABLE_HEADER.size)
+
+                with memoryview(cache_map)[offset:offset + 8 * rows * max(columns, 1)] as table_view, table_view.cast('Q') as values_view:
+                    values = values_view.tolist()
+
+                tables[name.rstrip(b"\0").decode()] = [values[row * columns:(row + 1) * columns] for row in range(rows)] if columns else values
+
+            return tables
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def write_tables(cache_path, fingerprint, tables):
+    """Writes tables to a cache file. The file is written under another name and then renamed, so processes starting
+    at the same time never read a half written file.
+
+    :param cache_path: the path of the cache file
+    :param fingerprint: the fingerprint the tables were built with
+    :param tables: a map from the table names to their values as lists of 64-bit integers, or lists of such lists
+    """
+    table_headers = []
+    table_values = []
+    offset = HEADER.size + len(tables) * TABLE_HEADER.size
+
+    for name, values in tables.items():
+        if values and isinstance(values[0], list):
+            rows, columns = len(values), len(values[0])
+            values = [value for row in values for value in row]
+        else:
+            rows, columns = len(values), 0
+
+        table_headers.append(TABLE_HEADER.pack(name.encode(), offset, rows, columns))
+        table_values.append(struct.pack(f"<{len(values)}Q", *values))
+        offset += 8 * len(values)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+    temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+
+    with open(temporary_path, "wb") as cache_file:
+        cache_file.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, fingerprint, len(tables)))
+        cache_file.write(b"".join(table_headers))
+        cache_file.write(b"".join(table_values))
+
+    os.replace(temporary_path, cache_path)
+
+
+def load_tables(name, build, fingerprint):
+    """Loads a set of precomputed tables from its cache file, building and caching them when the file cannot be used.
+    A cache directory that cannot be written only means the tables are built on every start.
+
+    :param name: the name of the set of tables, naming its cache file
+    :param build: a function returning the tables as a map from their names to their values
+    :param fingerprint: the fingerprint of what the tables are built from, as returned by get_fingerprint
+    :return: the map of the tables
+    """
+    start_time = time.perf_counter()
+    cache_path = os.path.join(get_cache_directory(), f"{name}_v{CACHE_VERSION}.bin")
+
+    tables = read_tables(cache_path, fingerprint)
+    cache_hit = tables is not None
+
+    if not cache_hit:
+        tables = build()
+
+        try:
+            write_tables(cache_path, fingerprint, tables)
+        except OSError:
+            pass
+
+    _load_reports.append((name, cache_hit, time.perf_counter() - start_time))
+
+    return tables
+
+
+def get_load_reports():
+    """Gets how the tables loaded so far were obtained.
+
+    :return: a list of tuples (name, cache_hit, seconds)
+    """
+    return list(_load_reports)
+
+
+def clear_cache():
+    """Removes the cache files, so the next start builds the tables again.
+
+    :return: the number of files removed
+    """
+    removed_files = 0
+
+    if os.path.isdir(get_cache_directory()):
+        for file_name in os.listdir(get_cache_directory()):
+            if file_name.endswith(".bin"):
+                os.remove(os.path.join(get_cache_directory(), file_name))
+                removed_files += 1
+
+    return removed_files
+
+
+def get_arguments(arguments):
+    """Parses the command line arguments of the table cache.
+
+    :param arguments: the list of arguments, without the program name
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Reports how long the engine takes to import and manages its table cache.")
+    parser.add_argument("--clear", action="store_true", help="remove the cache files before importing the engine")
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    cache_arguments = get_arguments(sys.argv[1:])
+
+    if cache_arguments.clear:
+        print(f"removed {clear_cache()} cache files")
+
+    import_start_time = time.perf_counter()
+
+    import chess_engine
+
+    # The engine loads its tables through the imported module, not through this script.
+    import table_cache as tc
+
+    print(f"engine imported in {(time.perf_counter() - import_start_time) * 1000:.1f}ms, "
+          f"pygame {'imported' if 'pygame' in sys.modules else 'not imported'}")
+
+    for table_name, table_cache_hit, table_time in tc.get_load_reports():
+        print(f"tables {table_name} {'cached' if table_cache_hit else 'built'} in {table_time * 1000:.2f}ms")
@@ -0,0 +1,40 @@
+import pytest
+
+import chess_engine as ce
+import constants as const
+import format_conversions as fc
+import perft
+import zobrist
+
+# The suite depths with more known leaf nodes than this are left to perft.py --suite, so the tests stay fast on the
+# mailbox backend too.
+TEST_MAX_NODES = 10000
+
+PERFT_CASES = [(name, fen, depth, expected_nodes) for name, fen, expected_counts in perft.PERFT_SUITE
+               for depth, expected_nodes in enumerate(expected_counts, 1) if expected_nodes <= TEST_MAX_NODES]
+
+
+@pytest.mark.parametrize("backend", const.BOARD_BACKENDS)
+@pytest.mark.parametrize("name, fen, depth, expected_nodes", PERFT_CASES,
+                         ids=[f"{name} depth {depth}" for name, _, depth, _ in PERFT_CASES])
+def test_perft_suite(backend, name, fen, depth, expected_nodes):
+    chess_board = ce.ChessBoard("player", fen, backend)
+    start_hash = chess_board.hash
+
+    assert perft.perft(chess_board, depth) == expected_nodes
+    assert chess_board.hash == start_hash == zobrist.hash_position(chess_board)
+    assert chess_board.to_fen() == fen
+
+
+@pytest.mark.parametrize("backend", const.BOARD_BACKENDS)
+@pytest.mark.parametrize("name, fen, notations, expected_count", perft.REPETITION_SUITE,
+                         ids=[name for name, _, _, _ in perft.REPETITION_SUITE])
+def test_repetition_suite(backend, name, fen, notations, expected_count):
+    chess_board = ce.ChessBoard("player", fen, backend)
+
+    for notation in notations:
+        chess_board.make_move(*fc.get_move_from_notation(notation))
+
+        assert chess_board.hash == zobrist.hash_position(chess_board)
+
+    assert chess_board.position_counts.get(chess_board.hash, 0) == expected_count
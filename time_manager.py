@@ -0,0 +1,76 @@
+import time
+
+import constants as const
+
+MINIMUM_TIME = 0.01
+
+
+class TimeManager:
+    """Class deciding how long a search can run, with a soft and a hard deadline.
+
+    The soft deadline is the time the search should use: no new iteration is started after it, nor when the
+    next iteration is predicted to end after the hard deadline. The hard deadline is never crossed, the running
+    iteration is stopped when it is reached and the best move found so far is played.
+    """
+    def __init__(self, soft_limit, hard_limit=None):
+        """Initializes a time manager and starts its clock.
+
+        :param soft_limit: the time the search should use in seconds
+        :param hard_limit: the time the search must never exceed in seconds, by default the soft limit
+        """
+        self.soft_limit = max(MINIMUM_TIME, soft_limit)
+        self.hard_limit = max(self.soft_limit, hard_limit if hard_limit is not None else soft_limit)
+        self.start_time = time.perf_counter()
+
+    @staticmethod
+    def from_move_time(move_time):
+        """Creates a time manager for a fixed time per move.
+
+        :param move_time: the time of the move in seconds
+        :return: the time manager
+        """
+        move_time = max(MINIMUM_TIME, move_time - const.TIME_OVERHEAD)
+
+        return TimeManager(move_time, move_time)
+
+    @staticmethod
+    def from_clock(remaining_time, increment=0, moves_to_go=const.UCI_MOVES_TO_GO):
+        """Creates a time manager from the clock of the player to move.
+
+        :param remaining_time: the time left on the clock in seconds
+        :param increment: the time added to the clock after every move in seconds
+        :param moves_to_go: the number of moves until the next time control
+        :return: the time manager
+        """
+        maximum_time = remaining_time * const.TIME_MAX_USAGE - const.TIME_OVERHEAD
+        soft_limit = min(remaining_time / max(1, moves_to_go) + increment / 2, maximum_time)
+
+        return TimeManager(soft_limit, min(soft_limit * const.TIME_HARD_FACTOR, maximum_time))
+
+    def start(self):
+        """Restarts the clock, so the limits count from now."""
+        self.start_time = time.perf_counter()
+
+    def elapsed(self):
+        """Gets the time since the clock started.
+
+        :return: the elapsed time in seconds
+        """
+        return time.perf_counter() - self.start_time
+
+    def can_start_iteration(self, last_iteration_time):
+        """Checks if there is time for another iteration of the search.
+
+        :param last_iteration_time: the time the last iteration took in seconds
+        :return: if the next iteration should be started
+        """
+        elapsed = self.elapsed()
+
+        return elapsed < self.soft_limit and elapsed + last_iteration_time * const.TIME_BRANCHING_FACTOR <= self.hard_limit
+
+    def hard_deadline_reached(self):
+        """Checks if the search must stop now.
+
+        :return: if the hard deadline was reached
+        """
+        return self.elapsed() >= self.hard_limit
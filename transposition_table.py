@@ -0,0 +1,197 @@
+from array import array
+from multiprocessing import shared_memory
+
+import constants as const
+import move_encoding as me
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+ENTRY_BYTES = 16
+SLOTS_PER_BUCKET = 2
+
+DATA_MASK = (1 << 64) - 1
+
+
+class TranspositionTable:
+    """Class representing a fixed-size hash table of searched positions.
+
+    Every bucket holds two entries: the first one is only replaced by searches that are at least as deep,
+    the second one is always replaced. An entry is stored in two 64-bit arrays, one for the key and one for
+    the packed depth, bound, score and best move, so the memory used never grows after creation.
+    """
+    def __init__(self, size_mb=const.TT_SIZE_MB):
+        """Initializes an empty table.
+
+        :param size_mb: the memory used by the table in megabytes
+        """
+        self.bucket_count = max(1, int(size_mb * 1024 * 1024) // (ENTRY_BYTES * SLOTS_PER_BUCKET))
+        self.keys = array('Q', bytes(8 * SLOTS_PER_BUCKET * self.bucket_count))
+        self.data = array('q', bytes(8 * SLOTS_PER_BUCKET * self.bucket_count))
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        self.keys = array('Q', bytes(8 * len(self.keys)))
+        self.data = array('q', bytes(8 * len(self.data)))
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """Looks up a position.
+
+        :param key: the Zobrist hash of the position
+        :return: a tuple (depth, bound, score, move) or None if the position is not stored
+        """
+        slot = (key % self.bucket_count) * SLOTS_PER_BUCKET
+
+        for index in range(slot, slot + SLOTS_PER_BUCKET):
+            if self.keys[index] == key:
+                self.hits += 1
+
+                data = self.data[index]
+
+                return (data >> 18) & 0xFF, (data >> 16) & 0b11, data >> 26, me.decode_move(data & 0xFFFF)
+
+        self.misses += 1
+
+        if self.keys[slot] or self.keys[slot + 1]:
+            self.collisions += 1
+
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        """Stores the result of a search, replacing the entry of the bucket the scheme picks.
+
+        :param key: the Zobrist hash of the position
+        :param depth: the depth the position was searched to
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param score: the score of the position
+        :param move: the best move found, or None
+        """
+        slot = (key % self.bucket_count) * SLOTS_PER_BUCKET
+
+        if self.keys[slot] == key or (self.data[slot] >> 18) & 0xFF <= depth or not self.keys[slot]:
+            index = slot
+        else:
+            index = slot + 1
+
+        self.keys[index] = key
+        self.data[index] = score << 26 | min(depth, 0xFF) << 18 | bound << 16 | me.encode_move(move)
+        self.stores += 1
+
+    def hashfull(self):
+        """Estimates how full the table is from a sample of its first entries.
+
+        :return: the number of used entries per thousand
+        """
+        sample = min(1000, len(self.keys))
+
+        return sum(1 for index in range(sample) if self.keys[index]) * 1000 // sample
+
+    def get_stats(self):
+        """Gets the counters of the table.
+
+        :return: a map with the hits, misses, collisions, stores and hashfull of the table
+        """
+        return {"hits": self.hits, "misses": self.misses, "collisions": self.collisions, "stores": self.stores,
+                "hashfull": self.hashfull()}
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """Class representing a transposition table in shared memory, used by several search processes at once.
+
+    There is no lock: the key of an entry is stored XORed with its data, so an entry whose key and data were written
+    by two different processes no longer matches its key and is read as a miss. The counters are kept per process.
+    """
+    def __init__(self, size_mb=const.TT_SIZE_MB, name=None):
+        """Creates a new table or attaches to an existing one.
+
+        :param size_mb: the memory used by the table in megabytes, the same as the one of the table attached to
+        :param name: the name of the shared memory of the table to attach to, or None to create a new table
+        """
+        self.bucket_count = max(1, int(size_mb * 1024 * 1024) // (ENTRY_BYTES * SLOTS_PER_BUCKET))
+        self.entry_count = SLOTS_PER_BUCKET * self.bucket_count
+        self.owner = name is None
+
+        if self.owner:
+            self.shared_memory = shared_memory.SharedMemory(create=True, size=ENTRY_BYTES * self.entry_count)
+        else:
+            self.shared_memory = shared_memory.SharedMemory(name=name)
+
+        self.name = self.shared_memory.name
+        self.keys = self.shared_memory.buf[:8 * self.entry_count].cast('Q')
+        self.data = self.shared_memory.buf[8 * self.entry_count:ENTRY_BYTES * self.entry_count].cast('q')
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        self.shared_memory.buf[:ENTRY_BYTES * self.entry_count] = bytes(ENTRY_BYTES * self.entry_count)
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """Looks up a position.
+
+        :param key: the Zobrist hash of the position
+        :return: a tuple (depth, bound, score, move) or None if the position is not stored or its entry is torn
+        """
+        slot = (key % self.bucket_count) * SLOTS_PER_BUCKET
+
+        for index in range(slot, slot + SLOTS_PER_BUCKET):
+            data = self.data[index]
+
+            if self.keys[index] ^ (data & DATA_MASK) == key:
+                self.hits += 1
+
+                return (data >> 18) & 0xFF, (data >> 16) & 0b11, data >> 26, me.decode_move(data & 0xFFFF)
+
+        self.misses += 1
+
+        if self.keys[slot] or self.keys[slot + 1]:
+            self.collisions += 1
+
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        """Stores the result of a search, replacing the entry of the bucket the scheme picks.
+
+        :param key: the Zobrist hash of the position
+        :param depth: the depth the position was searched to
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param score: the score of the position
+        :param move: the best move found, or None
+        """
+        slot = (key % self.bucket_count) * SLOTS_PER_BUCKET
+        slot_data = self.data[slot]
+
+        if self.keys[slot] ^ (slot_data & DATA_MASK) == key or (slot_data >> 18) & 0xFF <= depth or not self.keys[slot]:
+            index = slot
+        else:
+            index = slot + 1
+
+        data = score << 26 | min(depth, 0xFF) << 18 | bound << 16 | me.encode_move(move)
+
+        self.data[index] = data
+        self.keys[index] = key ^ (data & DATA_MASK)
+        self.stores += 1
+
+    def close(self):
+        """Detaches from the shared memory, removing it if this table created it."""
+        self.keys.release()
+        self.data.release()
+        self.shared_memory.close()
+
+        if self.owner:
+            self.shared_memory.unlink()
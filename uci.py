@@ -0,0 +1,260 @@
+import sys
+import threading
+
+import chess_engine as ce
+import constants as const
+import format_conversions as fc
+import parallel_search as ps
+import search
+import time_manager as tm
+import transposition_table as tt
+
+
+def get_uci_score(score):
+    """Converts a search score into the score of a UCI info line.
+
+    :param score: the score in centipawns from the point of view of the player to move
+    :return: the score like 'cp 35' or 'mate -3'
+    """
+    if abs(score) > search.MATE_THRESHOLD:
+        mate_in_moves = (search.MATE_SCORE - abs(score) + 1) // 2
+
+        return f"mate {mate_in_moves if score > 0 else -mate_in_moves}"
+
+    return f"cp {score}"
+
+
+class UciEngine:
+    """Class driving a chess game through the UCI protocol, with the search running on a worker thread."""
+    def __init__(self, output=sys.stdout):
+        """Initializes the engine.
+
+        :param output: the stream the protocol answers are written to
+        """
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.chess_board = ce.ChessBoard("player")
+        self.hash_size_mb = const.TT_SIZE_MB
+        self.transposition_table = tt.TranspositionTable(self.hash_size_mb)
+        self.searcher = search.Searcher(transposition_table=self.transposition_table)
+        self.parallel_searcher = None
+        self.threads = const.SEARCH_WORKERS
+        self.stop_event = threading.Event()
+        self.search_thread = None
+
+        self.searcher.stop_event = self.stop_event
+
+    def send(self, line):
+        """Writes a line of the protocol.
+
+        :param line: the line to write
+        """
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def handle_command(self, line):
+        """Handles a command received from the graphical interface.
+
+        :param line: the command line
+        :return: False if the engine should quit, True otherwise
+        """
+        tokens = line.split()
+
+        if not tokens:
+            return True
+
+        command = tokens[0]
+
+        if command == "uci":
+            self.send(f"id name {const.ENGINE_NAME}")
+            self.send(f"id author {const.ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {const.TT_SIZE_MB} min 1 max 4096")
+            self.send(f"option name Threads type spin default {const.SEARCH_WORKERS} min 1 max 256")
+            self.send("uciok")
+        elif command == "isready":
+            if self.threads > 1:
+                self.get_parallel_searcher()
+
+            self.send("readyok")
+        elif command == "setoption":
+            self.handle_setoption(tokens[1:])
+        elif command == "ucinewgame":
+            self.stop_search()
+            self.transposition_table.clear()
+
+            if self.parallel_searcher is not None:
+                self.parallel_searcher.transposition_table.clear()
+
+            self.chess_board = ce.ChessBoard("player")
+        elif command == "position":
+            self.stop_search()
+            self.handle_position(tokens[1:])
+        elif command == "go":
+            self.stop_search()
+            self.handle_go(tokens[1:])
+        elif command == "stop":
+            self.stop_search()
+        elif command == "quit":
+            self.stop_search()
+            self.close_parallel_searcher()
+            return False
+
+        return True
+
+    def handle_setoption(self, tokens):
+        """Handles the setoption command.
+
+        :param tokens: the tokens after the command, like ['name', 'Hash', 'value', '64']
+        """
+        if len(tokens) != 4 or tokens[0] != "name" or tokens[2] != "value" or not tokens[3].isdigit():
+            return
+
+        if tokens[1].lower() == "hash":
+            self.stop_search()
+            self.close_parallel_searcher()
+            self.hash_size_mb = int(tokens[3])
+            self.transposition_table = tt.TranspositionTable(self.hash_size_mb)
+            self.searcher.transposition_table = self.transposition_table
+        elif tokens[1].lower() == "threads":
+            self.stop_search()
+            self.close_parallel_searcher()
+            self.threads = max(1, int(tokens[3]))
+
+    def get_parallel_searcher(self):
+        """Gets the parallel searcher, creating it and starting its workers if needed, so they are started once for the
+        whole session instead of at every search.
+
+        :return: the parallel searcher with its workers ready
+        """
+        if self.parallel_searcher is None:
+            self.parallel_searcher = ps.ParallelSearcher(self.threads, self.hash_size_mb)
+            self.parallel_searcher.stop_event = self.stop_event
+
+        self.parallel_searcher.start()
+
+        return self.parallel_searcher
+
+    def close_parallel_searcher(self):
+        """Removes the parallel searcher, its workers and its shared transposition table, if any, so the next search
+        creates them with the current options."""
+        if self.parallel_searcher is not None:
+            self.parallel_searcher.close()
+            self.parallel_searcher = None
+
+    def handle_position(self, tokens):
+        """Handles the position command, setting up the position and playing the moves that follow it. The moves after an
+        invalid or illegal one are not played, the position reached before it being kept.
+
+        :param tokens: the tokens after the command, like ['startpos', 'moves', 'e2e4']
+        """
+        moves_index = tokens.index("moves") if "moves" in tokens else len(tokens)
+
+        if tokens and tokens[0] == "fen":
+            fen = " ".join(tokens[1:moves_index])
+        else:
+            fen = const.STARTING_FEN
+
+        try:
+            chess_board = ce.ChessBoard("player", fen)
+        except ValueError as e:
+            self.send(f"info string error: {e}")
+            return
+
+        for notation in tokens[moves_index + 1:]:
+            try:
+                move = fc.get_move_from_notation(notation)
+            except (IndexError, ValueError):
+                self.send(f"info string error: invalid move {notation}, ignoring the moves from it")
+                break
+
+            if move not in chess_board.get_legal_moves():
+                self.send(f"info string error: illegal move {notation}, ignoring the moves from it")
+                break
+
+            chess_board.make_move(*move)
+
+        self.chess_board = chess_board
+
+    def handle_go(self, tokens):
+        """Handles the go command, starting the search on the worker thread.
+
+        :param tokens: the tokens after the command, like ['wtime', '60000', 'btime', '60000']
+        """
+        parameters = {}
+        infinite = "infinite" in tokens
+
+        for index in range(len(tokens) - 1):
+            if tokens[index] in ["depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo"] and tokens[index + 1].isdigit():
+                parameters[tokens[index]] = int(tokens[index + 1])
+
+        max_depth = parameters.get("depth", const.UCI_MAX_DEPTH)
+
+        if "movetime" in parameters:
+            time_manager = tm.TimeManager.from_move_time(parameters["movetime"] / 1000)
+        elif ("wtime" if self.chess_board.white_turn else "btime") in parameters and not infinite:
+            remaining_time = parameters["wtime" if self.chess_board.white_turn else "btime"]
+            increment = parameters.get("winc" if self.chess_board.white_turn else "binc", 0)
+            moves_to_go = parameters.get("movestogo", const.UCI_MOVES_TO_GO)
+
+            time_manager = tm.TimeManager.from_clock(remaining_time / 1000, increment / 1000, moves_to_go)
+        else:
+            time_manager = None
+
+        self.stop_event.clear()
+
+        self.search_thread = threading.Thread(target=self.run_search, args=(self.chess_board, max_depth, time_manager, infinite),
+                                              daemon=True)
+        self.search_thread.start()
+
+    def stop_search(self):
+        """Stops the running search, if any, and waits for it to report its best move."""
+        if self.search_thread is None:
+            return
+
+        self.stop_event.set()
+        self.search_thread.join()
+        self.search_thread = None
+
+    def run_search(self, chess_board, max_depth, time_manager, infinite):
+        """Searches deeper and deeper until the depth, the time or a stop command ends it, then reports the best move.
+
+        :param chess_board: the chess game to search
+        :param max_depth: the maximum depth to search to in plies
+        :param time_manager: the time manager deciding when to stop, or None
+        :param infinite: if the best move should only be reported after a stop command
+        """
+        if self.threads > 1:
+            search_result = self.get_parallel_searcher().search(chess_board, max_depth, time_manager, self.send_info)
+        else:
+            search_result = self.searcher.iterative_deepening(chess_board, max_depth, time_manager, self.send_info)
+
+            ordering_stats = self.searcher.move_orderer.get_stats()
+
+            self.send(f"info string cutoffs {ordering_stats['cutoffs']} first move {ordering_stats['first_move_cutoff_rate']:.1%}")
+
+        if infinite:
+            self.stop_event.wait()
+
+        best_move = search_result.best_move
+
+        self.send(f"bestmove {fc.get_move_notation(best_move) if best_move is not None else '0000'}")
+
+    def send_info(self, search_result):
+        """Reports a finished iteration of the search.
+
+        :param search_result: the search result of the iteration, with the nodes of every iteration so far
+        """
+        transposition_table = self.parallel_searcher.transposition_table if self.threads > 1 else self.transposition_table
+
+        self.send(f"info depth {search_result.depth} score {get_uci_score(search_result.score)} nodes {search_result.nodes} "
+                  f"nps {search_result.nps} time {int(search_result.elapsed * 1000)} "
+                  f"hashfull {transposition_table.hashfull()} pv {fc.get_move_notation(search_result.best_move)}")
+
+
+if __name__ == '__main__':
+    uci_engine = UciEngine()
+
+    for command_line in sys.stdin:
+        if not uci_engine.handle_command(command_line):
+            break
@@ -0,0 +1,102 @@
+import random
+
+import bitboards as bb
+import constants as const
+import table_cache
+
+# The version of the way a position is turned into a key, raised whenever the key of a position changes so the keys
+# stored in files, like the ones of the opening books, are not mixed with the new ones. Version 2 hashes the en passant
+# file only when a pawn can take en passant.
+KEY_VERSION = 2
+
+
+def _build_keys():
+    """Draws the random keys of the pieces on every square, the castle rights, the en passant files and the side to move.
+
+    :return: a map from the names of the key tables to their keys
+    """
+    key_random = random.Random(const.ZOBRIST_SEED)
+
+    return {
+        "PIECE_KEYS": [[key_random.getrandbits(64) for _ in range(const.RANKS * const.FILES)] for _ in bb.PIECE_NOTATIONS],
+        "CASTLE_KEYS": [key_random.getrandbits(64) for _ in range(4)],
+        "EN_PASSANT_KEYS": [key_random.getrandbits(64) for _ in range(const.FILES)],
+        "BLACK_TURN_KEY": [key_random.getrandbits(64)],
+    }
+
+
+_keys = table_cache.load_tables("zobrist", _build_keys, table_cache.get_fingerprint(__file__, const.ZOBRIST_SEED, const.RANKS,
+                                                                                     const.FILES, bb.PIECE_NOTATIONS))
+
+PIECE_KEYS = dict(zip(bb.PIECE_NOTATIONS, _keys["PIECE_KEYS"]))
+
+# One key per castle right, in the order of their bits in the castle rights mask.
+CASTLE_KEYS = _keys["CASTLE_KEYS"]
+
+# The key of every castle rights mask, the keys of its rights combined.
+CASTLE_MASK_KEYS = [0] * (const.ALL_CASTLES + 1)
+
+for _rights in range(1, const.ALL_CASTLES + 1):
+    _lowest_bit = _rights & -_rights
+    CASTLE_MASK_KEYS[_rights] = CASTLE_MASK_KEYS[_rights ^ _lowest_bit] ^ CASTLE_KEYS[_lowest_bit.bit_length() - 1]
+
+EN_PASSANT_KEYS = _keys["EN_PASSANT_KEYS"]
+
+BLACK_TURN_KEY = _keys["BLACK_TURN_KEY"][0]
+
+
+def hash_castles(rights):
+    """Hashes the castle rights of a game.
+
+    :param rights: the castle rights mask as returned by Castles.get_rights
+    :return: the key of the castle rights
+    """
+    return CASTLE_MASK_KEYS[rights]
+
+
+def hash_en_passant(en_passant, board):
+    """Hashes the en_passant possibility of a game. Like the en passant field of Polyglot, the file is only hashed when a
+    pawn of the opponent stands next to the pawn that can be taken, so the position is the same one otherwise.
+
+    :param en_passant: the position of the pawn that can be taken en passant, or None
+    :param board: the board of the game, with the pawn that can be taken on it
+    :return: the key of the en_passant file, or 0 if no pawn can take en passant
+    """
+    if en_passant is None:
+        return 0
+
+    rank_index, file_index = en_passant
+    pawn = board[rank_index][file_index]
+
+    if pawn is None:
+        return 0
+
+    capturing_pawn = "b_P" if pawn[0] == "w" else "w_P"
+
+    for adjacent_file in (file_index - 1, file_index + 1):
+        if 0 <= adjacent_file < const.FILES and board[rank_index][adjacent_file] == capturing_pawn:
+            return EN_PASSANT_KEYS[file_index]
+
+    return 0
+
+
+def hash_position(chess_board):
+    """Computes the Zobrist hash of a position from scratch.
+
+    :param chess_board: the chess game to hash
+    :return: a 64-bit integer identifying the position
+    """
+    key = 0
+
+    for rank_index, rank in enumerate(chess_board.board):
+        for file_index, piece in enumerate(rank):
+            if piece is not None:
+                key ^= PIECE_KEYS[piece][bb.square_from_position((rank_index, file_index))]
+
+    key ^= hash_castles(chess_board.castles.get_rights())
+    key ^= hash_en_passant(chess_board.en_passant, chess_board.board)
+
+    if not chess_board.white_turn:
+        key ^= BLACK_TURN_KEY
+
+    return key